@@ -0,0 +1,52 @@
+"""
+Fast JSON Responses
+===================
+高流量讀取端點（/nutrition/search、/meals、/meals/summary、/users/me/dashboard）
+的快速輸出路徑，設定 FAST_JSON_RESPONSES=true 啟用。
+
+預設路徑：端點逐項建立巢狀 Pydantic 模型，FastAPI 再依 response_model 驗證一次、
+轉為 dict 後以標準 json 編碼。
+
+快速路徑：端點直接組出與 response_model 相同欄位、相同順序的 dict / list
+（只含 JSON 原生型別，日期時間先轉為字串），以 orjson 一次編碼回傳，
+略過逐項模型驗證與 jsonable_encoder。輸出的 JSON 與預設路徑相同，
+OpenAPI 文件仍由 response_model 產生。
+
+orjson 為選用套件；未安裝時仍略過模型驗證，改以標準 json 編碼。
+"""
+
+from datetime import datetime
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 選用套件
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """編碼已整理好的 dict / list（不做型別轉換或驗證）"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content)
+
+
+def fast_json_enabled() -> bool:
+    """是否使用快速輸出路徑（每次請求讀取設定，可於執行期間切換）"""
+    return settings.FAST_JSON_RESPONSES
+
+
+def isoformat(value: Optional[datetime]) -> Optional[str]:
+    """與 Pydantic 輸出相同的日期時間字串（UTC 以 Z 結尾）"""
+    if value is None:
+        return None
+    text = value.isoformat()
+    if value.utcoffset() is not None and not value.utcoffset():
+        return text[:-6] + "Z"
+    return text
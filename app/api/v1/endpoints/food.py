@@ -5,7 +5,14 @@ from uuid import uuid4
 from fastapi import APIRouter, Query, HTTPException, UploadFile, File
 import logging
 
-from app.schemas.food import FoodAlignResponse, FoodMatch
+from app.schemas.food import (
+    FoodAlignBatchRequest,
+    FoodAlignBatchResponse,
+    FoodAlignResponse,
+    FoodMatch,
+    FoodSubstitute,
+    FoodSubstituteResponse,
+)
 from app.schemas.food_ai import (
     FoodLLMParseRequest,
     FoodLLMParseResponse,
@@ -15,6 +22,8 @@ from app.schemas.food_ai import (
     FoodVisionSuggestItem,
 )
 from app.services.food_alignment_service import get_food_alignment_service
+from app.services.food_catalog import parse_fields
+from app.services.food_substitution_service import get_food_substitution_service
 from app.services.food_vision_service import food_vision_service
 
 logger = logging.getLogger(__name__)
@@ -117,6 +126,76 @@ async def align_food(
         raise HTTPException(status_code=500, detail=f"對齊失敗: {str(e)}")
 
 
+@router.post("/align/batch", response_model=FoodAlignBatchResponse)
+def align_food_batch(payload: FoodAlignBatchRequest):
+    """
+    批次對齊（照片多品項、貼上的購物清單），結果順序與輸入相同
+
+    最多 100 筆的對齊為 CPU 密集運算，宣告為一般函式由 FastAPI 在執行緒池執行，
+    不阻塞事件迴圈上的其他請求。
+    """
+    try:
+        service = get_food_alignment_service()
+        aligned = service.align_many(payload.queries, limit=payload.limit)
+        return FoodAlignBatchResponse(
+            count=len(aligned),
+            results=[
+                FoodAlignResponse(
+                    query=q,
+                    count=len(results),
+                    results=[FoodMatch(**r) for r in results],
+                )
+                for q, results in zip(payload.queries, aligned)
+            ],
+        )
+    except Exception as e:
+        logger.error(f"批次對齊失敗: {e}")
+        raise HTTPException(status_code=500, detail=f"批次對齊失敗: {str(e)}")
+
+
+@router.get("/substitutes", response_model=FoodSubstituteResponse)
+async def food_substitutes(
+    food_id: str = Query(..., min_length=1, description="原食物整合編號"),
+    k: int = Query(5, ge=1, le=50, description="回傳筆數"),
+    lower: str | None = Query(None, description="需低於原食物的營養素，逗號分隔（如 sodium,potassium）"),
+    filters: str | None = Query(None, description="額外範圍條件（如 sodium<=100）"),
+    category: str | None = Query(None, description="限定食品分類"),
+    same_category: bool = Query(False, description="限定與原食物同分類"),
+):
+    """
+    替代食物建議（腎友 / 高血壓：相似但鈉、鉀較低）
+
+    範例：
+    - /food/substitutes?food_id=A0100101&lower=sodium,potassium
+    - /food/substitutes?food_id=J0200201&lower=sodium&same_category=true
+    """
+    try:
+        service = get_food_substitution_service()
+        try:
+            result = service.substitutes(
+                food_id,
+                k=k,
+                lower=parse_fields(lower),
+                filters=filters,
+                category=category,
+                same_category=same_category,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if result is None:
+            raise HTTPException(status_code=404, detail=f"Food not found: {food_id}")
+        return FoodSubstituteResponse(
+            food=FoodSubstitute(**result["food"]),
+            count=len(result["results"]),
+            results=[FoodSubstitute(**r) for r in result["results"]],
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"替代建議失敗: {e}")
+        raise HTTPException(status_code=500, detail=f"替代建議失敗: {str(e)}")
+
+
 @router.post("/llm/parse", response_model=FoodLLMParseResponse)
 async def parse_llm_output(payload: FoodLLMParseRequest):
     try:
@@ -166,22 +245,26 @@ async def suggest_food_from_photo(
         vision = food_vision_service.suggest_from_image(save_path, limit=limit)
         service = get_food_alignment_service()
 
+        candidates = vision.food_candidates[:limit]
+        align_error = None
+        try:
+            aligned = service.align_many([c.name for c in candidates], limit=1)
+        except Exception as align_err:
+            aligned = [[] for _ in candidates]
+            align_error = f"align_failed: {align_err}"
+
         items: list[FoodVisionSuggestItem] = []
-        for candidate in vision.food_candidates[:limit]:
+        for candidate, matches in zip(candidates, aligned):
             matched_food_id = None
             matched_name = None
             matched_category = None
-            notes = None
-
-            try:
-                matches = service.align(candidate.name, limit=1)
-                if matches:
-                    top = matches[0]
-                    matched_food_id = top["food_id"]
-                    matched_name = top["name"]
-                    matched_category = top["category"]
-            except Exception as align_err:
-                notes = f"align_failed: {align_err}"
+            notes = align_error
+
+            if matches:
+                top = matches[0]
+                matched_food_id = top["food_id"]
+                matched_name = top["name"]
+                matched_category = top["category"]
 
             grams_min, grams_max, grams_mid, label = _estimate_grams_by_category(matched_category, profile=profile)
             items.append(FoodVisionSuggestItem(
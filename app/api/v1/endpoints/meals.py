@@ -1,11 +1,17 @@
+import base64
+import binascii
+import json
 from datetime import datetime, timedelta, timezone
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import insert, tuple_
+from sqlalchemy.orm import Session, load_only, selectinload
 
 from app.api import deps
-from app.models.all_models import AuthAccount, Meal, MealItem, User
+from app.api.responses import FastJSONResponse, fast_json_enabled, isoformat
+from app.models.all_models import AuthAccount, DailyNutrientTotal, Meal, MealItem, User, generate_uuid
 from app.schemas.meal import (
     MealCreate,
     MealResponse,
@@ -16,38 +22,170 @@ from app.schemas.meal import (
     TodayMealResponse,
     TodayMealItemResponse,
 )
+from app.services.daily_totals import add_meal, nutrient_amounts, read_daily_totals, remove_meal, totals_dict
 from app.services.food_alignment_service import get_food_alignment_service
+from app.services.food_catalog import CORE_NUTRIENTS, FoodCatalog, parse_fields
 
 router = APIRouter(prefix="/meals", tags=["Meals"])
 
+NUTRIENT_KEYS = tuple(Nutrients.model_fields)
+_NUTRIENT_KEY_SET = frozenset(NUTRIENT_KEYS)
+_ZEROS = (0,) * len(NUTRIENT_KEYS)
 
-def _scale_nutrients(per_100g: dict, grams: float) -> dict:
-    factor = grams / 100.0
-    return {
-        "calories": round(per_100g.get("calories", 0) * factor, 4),
-        "protein": round(per_100g.get("protein", 0) * factor, 4),
-        "carbs": round(per_100g.get("carbs", 0) * factor, 4),
-        "fat": round(per_100g.get("fat", 0) * factor, 4),
-        "sodium": round(per_100g.get("sodium", 0) * factor, 4),
-        "fiber": round(per_100g.get("fiber", 0) * factor, 4),
-        "potassium": round(per_100g.get("potassium", 0) * factor, 4),
-    }
+# 列表 / 今日統計只載入回應需要的欄位；品項以一個 SELECT ... WHERE meal_id IN (...)
+# 批次載入，避免逐餐延遲載入（limit=100 時原本共 101 個查詢）
+_MEAL_COLUMNS = load_only(Meal.id, Meal.user_id, Meal.eaten_at, Meal.source, Meal.note, Meal.nutrients)
+_MEAL_ITEMS = selectinload(Meal.items).load_only(
+    MealItem.id, MealItem.meal_id, MealItem.food_id, MealItem.food_name,
+    MealItem.grams, MealItem.portion_label, MealItem.confidence, MealItem.nutrients,
+)
 
 
 def _sum_nutrients(items: List[dict]) -> dict:
-    total = {
-        "calories": 0,
-        "protein": 0,
-        "carbs": 0,
-        "fat": 0,
-        "sodium": 0,
-        "fiber": 0,
-        "potassium": 0,
+    if not items:
+        return {k: 0 for k in CORE_NUTRIENTS}
+    matrix = np.array([[n.get(k, 0) or 0 for k in CORE_NUTRIENTS] for n in items], dtype=np.float64)
+    return {k: round(v, 4) for k, v in zip(CORE_NUTRIENTS, matrix.sum(axis=0).tolist())}
+
+
+def _resolve_fields(catalog: FoodCatalog, fields: Optional[str]) -> List[str]:
+    """fields= 要額外投影的營養素（核心營養素已在 nutrients 中，不重複投影）"""
+    try:
+        return [f for f in catalog.resolve_fields(parse_fields(fields)) if f not in CORE_NUTRIENTS]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _project_meals(
+    catalog: FoodCatalog, meals: List[Meal], fields: List[str]
+) -> Dict[str, Tuple[List[dict], dict]]:
+    """
+    依品項 food_id / grams 計算 fields= 指定的營養素
+
+    儲存的 nutrients JSON 只有核心欄位，額外欄位由目錄一次計算所有品項，
+    再依餐加總。回傳 meal_id → (各品項, 該餐總和)。
+    """
+    if not fields:
+        return {}
+    items = [item for meal in meals for item in meal.items]
+    vectors = np.zeros((len(items), len(catalog.nutrient_columns)), dtype=np.float64)
+    rows = catalog.rows_of([item.food_id for item in items])
+    found = [i for i, row in enumerate(rows) if row is not None]
+    if found:
+        vectors[found], _ = catalog.compute_rows(
+            [rows[i] for i in found], [items[i].grams or 0 for i in found]
+        )
+
+    projected: Dict[str, Tuple[List[dict], dict]] = {}
+    start = 0
+    for meal in meals:
+        end = start + len(meal.items)
+        item_extras = catalog.project(vectors[start:end], fields)
+        total_extra = catalog.project(vectors[start:end].sum(axis=0)[None, :], fields)[0]
+        projected[meal.id] = (item_extras, total_extra)
+        start = end
+    return projected
+
+
+def _meal_response(meal: Meal, item_extras: List[dict], total_extra: dict) -> MealResponse:
+    """已儲存的一餐 → MealResponse（extras 為 fields= 指定的額外營養素）"""
+    return MealResponse(
+        meal_id=meal.id,
+        user_id=meal.user_id,
+        eaten_at=_as_utc(meal.eaten_at),
+        source=meal.source,
+        note=meal.note,
+        nutrients=Nutrients(**{**(meal.nutrients or {}), **total_extra}),
+        items=[
+            MealItemResponse(
+                meal_item_id=item.id,
+                food_id=item.food_id,
+                food_name=item.food_name,
+                grams=item.grams,
+                portion_label=item.portion_label,
+                confidence=item.confidence,
+                nutrients=Nutrients(**{**(item.nutrients or {}), **extra}),
+            )
+            for item, extra in zip(meal.items, item_extras)
+        ],
+    )
+
+
+def _nutrients_payload(values: Optional[dict], extra: Optional[dict] = None) -> dict:
+    """與 Nutrients 模型輸出相同的 dict：核心欄位依序轉 float、缺值補 0，其餘欄位接在後面"""
+    merged = {**(values or {}), **extra} if extra else (values or {})
+    payload = dict(zip(NUTRIENT_KEYS, map(float, map(merged.get, NUTRIENT_KEYS, _ZEROS))))
+    if not _NUTRIENT_KEY_SET.issuperset(merged):
+        payload.update((key, value) for key, value in merged.items() if key not in _NUTRIENT_KEY_SET)
+    return payload
+
+
+def _meal_payload(meal: Meal, item_extras: List[dict], total_extra: dict) -> dict:
+    """與 _meal_response 輸出相同 JSON 的 dict（快速輸出路徑，不建立模型）"""
+    return {
+        "meal_id": meal.id,
+        "user_id": meal.user_id,
+        "eaten_at": isoformat(_as_utc(meal.eaten_at)),
+        "source": meal.source,
+        "note": meal.note,
+        "nutrients": _nutrients_payload(meal.nutrients, total_extra),
+        "items": [
+            {
+                "meal_item_id": item.id,
+                "food_id": item.food_id,
+                "food_name": item.food_name,
+                "grams": float(item.grams),
+                "portion_label": item.portion_label,
+                "confidence": None if item.confidence is None else float(item.confidence),
+                "nutrients": _nutrients_payload(item.nutrients, extra),
+            }
+            for item, extra in zip(meal.items, item_extras)
+        ],
     }
-    for n in items:
-        for k in total:
-            total[k] += n.get(k, 0)
-    return {k: round(v, 4) for k, v in total.items()}
+
+
+def _encode_cursor(meal: Meal) -> str:
+    """一頁最後一餐的 (eaten_at, id) → 不透明的 cursor 字串"""
+    raw = json.dumps([_as_utc(meal.eaten_at).isoformat(), meal.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """cursor 字串 → (eaten_at, id)；格式錯誤時回 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        eaten_at, meal_id = json.loads(raw)
+        return _as_utc(datetime.fromisoformat(eaten_at)), str(meal_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="無效的 cursor")
+
+
+def _as_utc(value: datetime) -> datetime:
+    """
+    換算為帶時區的 UTC（無時區者視為 UTC）
+
+    eaten_at 為 timestamptz：綁定無時區的值時 Postgres 會以連線的 TimeZone 解讀，
+    寫入與回應一律使用帶時區的 UTC；SQLite 讀回的無時區值即為 UTC。
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _insert_meal(db: Session, meal: dict, items: List[dict]) -> None:
+    """
+    寫入一餐與所有品項、更新當日營養素總和並提交
+
+    id 由用戶端產生（UUID），不需 flush 取回主鍵：餐點一個 INSERT、
+    所有品項一個 executemany INSERT，提交後不再重新查詢。
+    使用資料表層級的 insert：ORM 批次寫入會略過值為 None 的欄位，
+    並依欄位組合拆成多個陳述式。核心營養素同時寫入 meals 的數值欄位。
+    """
+    db.execute(insert(Meal.__table__), [{**meal, **nutrient_amounts(meal["nutrients"])}])
+    if items:
+        db.execute(insert(MealItem.__table__), items)
+    add_meal(db, meal["user_id"], meal["eaten_at"], meal["nutrients"])
+    db.commit()
 
 
 def _ensure_user_profile(db: Session, account: AuthAccount) -> User:
@@ -68,6 +206,7 @@ def _ensure_user_profile(db: Session, account: AuthAccount) -> User:
 @router.post("", response_model=MealResponse)
 async def create_meal(
     payload: MealCreate,
+    fields: Optional[str] = Query(None, description="額外營養素欄位，逗號分隔（如 iron,calcium）"),
     account: AuthAccount = Depends(deps.get_current_account),
     db: Session = Depends(deps.get_db),
 ):
@@ -77,107 +216,106 @@ async def create_meal(
         raise HTTPException(status_code=400, detail="Meal items required")
 
     alignment_service = get_food_alignment_service()
-
-    meal = Meal(
-        user_id=user.id,
-        source=payload.source or "manual",
-        note=payload.note,
-        eaten_at=payload.eaten_at or datetime.utcnow(),
-    )
-    db.add(meal)
-    db.flush()
-
-    item_responses: List[MealItemResponse] = []
-    item_nutrients_list = []
-
-    for item in payload.items:
-        food = alignment_service.get_food_nutrients(item.food_id)
-        if not food:
+    catalog = alignment_service.catalog
+    field_list = _resolve_fields(catalog, fields)
+    rows = catalog.rows_of([item.food_id for item in payload.items])
+    for item, row in zip(payload.items, rows):
+        if row is None:
             raise HTTPException(status_code=404, detail=f"Food not found: {item.food_id}")
 
-        nutrients = _scale_nutrients(food["per_100g"], item.grams)
-        item_nutrients_list.append(nutrients)
-
-        meal_item = MealItem(
-            meal_id=meal.id,
-            food_id=food["food_id"],
-            food_name=food["name"],
-            grams=item.grams,
-            portion_label=item.portion_label,
-            confidence=item.confidence,
-            raw_text=item.raw_text,
-            nutrients=nutrients,
-        )
-        db.add(meal_item)
-        db.flush()
-
-        item_responses.append(MealItemResponse(
-            meal_item_id=meal_item.id,
-            food_id=meal_item.food_id,
-            food_name=meal_item.food_name,
-            grams=meal_item.grams,
-            portion_label=meal_item.portion_label,
-            confidence=meal_item.confidence,
-            nutrients=Nutrients(**nutrients),
-        ))
-
-    total_nutrients = _sum_nutrients(item_nutrients_list)
-    meal.nutrients = total_nutrients
-
-    db.commit()
-    db.refresh(meal)
-
-    return MealResponse(
-        meal_id=meal.id,
-        user_id=meal.user_id,
-        eaten_at=meal.eaten_at,
-        source=meal.source,
-        note=meal.note,
-        nutrients=Nutrients(**total_nutrients),
-        items=item_responses,
+    # 一次計算所有品項與總和（所有營養素欄位）
+    item_vectors, total_vector = catalog.compute_rows(rows, [item.grams for item in payload.items])
+    item_extras = catalog.project(item_vectors, field_list)
+    total_extra = catalog.project(total_vector[None, :], field_list)[0]
+
+    meal = {
+        "id": generate_uuid(),
+        "user_id": user.id,
+        "source": payload.source or "manual",
+        "note": payload.note,
+        "eaten_at": _as_utc(payload.eaten_at) if payload.eaten_at else datetime.now(timezone.utc),
+        "nutrients": catalog.core_dict(total_vector),
+    }
+    items = [
+        {
+            "id": generate_uuid(),
+            "meal_id": meal["id"],
+            "food_id": catalog.food_ids[row],
+            "food_name": catalog.names[row],
+            "grams": item.grams,
+            "portion_label": item.portion_label,
+            "confidence": item.confidence,
+            "raw_text": item.raw_text,
+            "nutrients": catalog.core_dict(vector),
+        }
+        for item, row, vector in zip(payload.items, rows, item_vectors)
+    ]
+    # 先組成並驗證回應，成功後才寫入（避免已提交的餐點回傳 500）
+    response = MealResponse(
+        meal_id=meal["id"],
+        user_id=meal["user_id"],
+        eaten_at=meal["eaten_at"],
+        source=meal["source"],
+        note=meal["note"],
+        nutrients=Nutrients(**{**meal["nutrients"], **total_extra}),
+        items=[
+            MealItemResponse(
+                meal_item_id=row["id"],
+                food_id=row["food_id"],
+                food_name=row["food_name"],
+                grams=row["grams"],
+                portion_label=row["portion_label"],
+                confidence=row["confidence"],
+                nutrients=Nutrients(**{**row["nutrients"], **extra}),
+            )
+            for row, extra in zip(items, item_extras)
+        ],
     )
+    _insert_meal(db, meal, items)
+    return response
 
 
 @router.get("", response_model=List[MealResponse])
 async def list_meals(
+    response: Response,
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="上一頁回應標頭 X-Next-Cursor 的值，取得更早的餐點"),
+    fields: Optional[str] = Query(None, description="額外營養素欄位，逗號分隔（如 iron,calcium）"),
     account: AuthAccount = Depends(deps.get_current_account),
     db: Session = Depends(deps.get_db),
 ):
-    user = _ensure_user_profile(db, account)
-    meals = (
-        db.query(Meal)
-        .filter(Meal.user_id == user.id)
-        .order_by(Meal.eaten_at.desc())
-        .limit(limit)
-        .all()
-    )
-
-    responses: List[MealResponse] = []
-    for meal in meals:
-        item_responses: List[MealItemResponse] = []
-        for item in meal.items:
-            item_responses.append(MealItemResponse(
-                meal_item_id=item.id,
-                food_id=item.food_id,
-                food_name=item.food_name,
-                grams=item.grams,
-                portion_label=item.portion_label,
-                confidence=item.confidence,
-                nutrients=Nutrients(**(item.nutrients or {})),
-            ))
-
-        responses.append(MealResponse(
-            meal_id=meal.id,
-            user_id=meal.user_id,
-            eaten_at=meal.eaten_at,
-            source=meal.source,
-            note=meal.note,
-            nutrients=Nutrients(**(meal.nutrients or {})),
-            items=item_responses,
-        ))
+    """
+    由新到舊列出餐點（依 eaten_at、id 排序）
 
-    return responses
+    還有更早的餐點時，回應標頭 X-Next-Cursor 帶下一頁的 cursor；
+    以 (eaten_at, id) 為 keyset 由索引 ix_meals_user_eaten_at_id 定位，
+    任何深度的分頁成本都與第一頁相同（不使用 OFFSET）。
+    """
+    user = _ensure_user_profile(db, account)
+    catalog = get_food_alignment_service().catalog
+    field_list = _resolve_fields(catalog, fields)
+    query = db.query(Meal).options(_MEAL_COLUMNS, _MEAL_ITEMS).filter(Meal.user_id == user.id)
+    if cursor:
+        query = query.filter(tuple_(Meal.eaten_at, Meal.id) < tuple_(*_decode_cursor(cursor)))
+    meals = query.order_by(Meal.eaten_at.desc(), Meal.id.desc()).limit(limit + 1).all()
+    next_cursor = _encode_cursor(meals[limit - 1]) if len(meals) > limit else None
+    meals = meals[:limit]
+    projected = _project_meals(catalog, meals, field_list)
+
+    if fast_json_enabled():
+        fast = FastJSONResponse([
+            _meal_payload(meal, *projected.get(meal.id, ([{}] * len(meal.items), {})))
+            for meal in meals
+        ])
+        if next_cursor:
+            fast.headers["X-Next-Cursor"] = next_cursor
+        return fast
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [
+        _meal_response(meal, *projected.get(meal.id, ([{}] * len(meal.items), {})))
+        for meal in meals
+    ]
 
 
 @router.get("/summary", response_model=MealSummaryResponse)
@@ -186,36 +324,33 @@ async def meal_summary(
     account: AuthAccount = Depends(deps.get_current_account),
     db: Session = Depends(deps.get_db),
 ):
-    user = _ensure_user_profile(db, account)
-    since = datetime.utcnow() - timedelta(days=days)
-    meals = (
-        db.query(Meal)
-        .filter(Meal.user_id == user.id, Meal.eaten_at >= since)
-        .order_by(Meal.eaten_at.asc())
-        .all()
-    )
-
-    daily = {}
-    total_items = []
-    for meal in meals:
-        day_key = meal.eaten_at.date().isoformat()
-        daily.setdefault(day_key, [])
-        nutrients = meal.nutrients or {}
-        daily[day_key].append(nutrients)
-        total_items.append(nutrients)
-
-    daily_breakdown = []
-    for day, items in daily.items():
-        daily_breakdown.append({day: Nutrients(**_sum_nutrients(items))})
-
-    total_nutrients = _sum_nutrients(total_items)
+    """
+    最近 days 個日曆日（含今天，UTC 日期）的營養素總和與每日明細
 
+    讀取 daily_nutrient_totals 每日一列（最多 365 列），不掃描 meals。
+    """
+    user = _ensure_user_profile(db, account)
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    rows = read_daily_totals(db, user.id, since)
+
+    daily_totals = {row.local_date.isoformat(): totals_dict(row) for row in rows}
+    total_nutrients = _sum_nutrients([{key: getattr(row, key) for key in CORE_NUTRIENTS} for row in rows])
+    total_meals = sum(row.meal_count for row in rows)
+
+    if fast_json_enabled():
+        return FastJSONResponse({
+            "user_id": user.id,
+            "days": days,
+            "total_meals": total_meals,
+            "total_nutrients": _nutrients_payload(total_nutrients),
+            "daily_breakdown": [{day: _nutrients_payload(totals)} for day, totals in daily_totals.items()],
+        })
     return MealSummaryResponse(
         user_id=user.id,
         days=days,
-        total_meals=len(meals),
+        total_meals=total_meals,
         total_nutrients=Nutrients(**total_nutrients),
-        daily_breakdown=daily_breakdown,
+        daily_breakdown=[{day: Nutrients(**totals)} for day, totals in daily_totals.items()],
     )
 
 
@@ -235,6 +370,7 @@ async def delete_meal(
     if not meal:
         raise HTTPException(status_code=404, detail="Meal not found")
 
+    remove_meal(db, user.id, meal.eaten_at, meal.nutrients)
     db.query(MealItem).filter(MealItem.meal_id == meal.id).delete(synchronize_session=False)
     db.delete(meal)
     db.commit()
@@ -248,6 +384,7 @@ async def delete_meal(
 
 @router.get("/summary/today", response_model=TodaySummaryResponse)
 async def today_summary(
+    fields: Optional[str] = Query(None, description="額外營養素欄位，逗號分隔（如 iron,calcium）"),
     account: AuthAccount = Depends(deps.get_current_account),
     db: Session = Depends(deps.get_db),
 ):
@@ -256,50 +393,62 @@ async def today_summary(
     
     返回今天 00:00 到目前為止的營養攝取總和
     用於 Meal Log 頁面的進度條顯示
+
+    核心營養素總和讀取 daily_nutrient_totals 今日一列；
+    fields= 的額外營養素仍由今日各餐品項計算。
     """
     user = _ensure_user_profile(db, account)
+    catalog = get_food_alignment_service().catalog
+    field_list = _resolve_fields(catalog, fields)
     
     # 取得今天的開始時間 (UTC 00:00)
     today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
     
     meals = (
         db.query(Meal)
+        .options(_MEAL_COLUMNS, _MEAL_ITEMS)
         .filter(
             Meal.user_id == user.id, 
-            Meal.eaten_at >= today_start
+            Meal.eaten_at >= today_start,
+            Meal.eaten_at < today_start + timedelta(days=1),
         )
         .order_by(Meal.eaten_at.asc())
         .all()
     )
     
     # 統計今日營養素
-    total_items = [meal.nutrients or {} for meal in meals]
-    total_nutrients = _sum_nutrients(total_items)
+    today_totals = db.get(DailyNutrientTotal, (user.id, today_start.date()))
+    total_nutrients = totals_dict(today_totals)
+    projected = _project_meals(catalog, meals, field_list)
+    for _, total_extra in projected.values():
+        for key, value in total_extra.items():
+            total_nutrients[key] = round(total_nutrients.get(key, 0) + value, 4)
     
     # 整理每餐紀錄（用於顯示最近餐點）
     meals_list: List[TodayMealResponse] = []
     for meal in meals:
+        item_extras, total_extra = projected.get(meal.id, ([{}] * len(meal.items), {}))
         items: List[TodayMealItemResponse] = []
-        for item in meal.items:
+        for item, extra in zip(meal.items, item_extras):
             items.append(TodayMealItemResponse(
                 food_name=item.food_name,
                 grams=item.grams,
                 portion_label=item.portion_label,
-                nutrients=Nutrients(**(item.nutrients or {})),
+                nutrients=Nutrients(**{**(item.nutrients or {}), **extra}),
             ))
         meals_list.append(TodayMealResponse(
             meal_id=meal.id,
-            eaten_at=meal.eaten_at,
+            eaten_at=_as_utc(meal.eaten_at),
             source=meal.source,
             note=meal.note,
-            nutrients=Nutrients(**(meal.nutrients or {})),
+            nutrients=Nutrients(**{**(meal.nutrients or {}), **total_extra}),
             items=items,
         ))
     
     return TodaySummaryResponse(
         user_id=user.id,
         date=today_start.date().isoformat(),
-        total_meals=len(meals),
+        total_meals=today_totals.meal_count if today_totals else 0,
         total_nutrients=Nutrients(**total_nutrients),
         meals=meals_list,
     )
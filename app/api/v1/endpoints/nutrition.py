@@ -6,20 +6,35 @@ Nutrition Database API Endpoints (Phase 1 MVP)
 端點設計：
 - GET /nutrition/search?q=雞胸肉 - 搜尋食物
 - GET /nutrition/calculate?food=雞胸肉&grams=150 - 計算營養
+- GET /nutrition/autocomplete?prefix=雞 - 輸入框前綴自動完成
+- GET /nutrition/query?filters=protein>=20,sodium<=100&sort=protein - 營養素範圍查詢
+- GET /nutrition/fields - 可投影的營養素欄位（fields= 參數）
 - GET /nutrition/categories - 取得分類列表
-- GET /nutrition/stats - 服務統計（含匹配率）
+- GET /nutrition/categories/counts - 各分類食物筆數
+- GET /nutrition/stats - 服務統計（含匹配率、快取、各階段延遲、記憶體）
+- GET /nutrition/metrics - Prometheus 指標
 - GET /nutrition/validate - 驗證 Top 20 匹配率
+- GET /nutrition/health - 健康檢查（含食品資料版本）
+- POST /nutrition/admin/reload - 熱更新處理該請求的 worker（需 X-Admin-Token；其他 worker 由檔案監看更新）
+
+查詢回應帶有 catalog_version（食品資料內容雜湊），熱更新期間可辨識結果來自哪一版資料。
+FAST_JSON_RESPONSES=true 時 /nutrition/search 以 orjson 直接輸出（見 app/api/responses.py）。
 
 隔離策略：
 - 此 API 失敗不會影響 /recommendation 等核心功能
 - 可獨立測試、獨立部署
 """
 
-from fastapi import APIRouter, Query, HTTPException
-from typing import Optional, List
-from pydantic import BaseModel
+from fastapi import APIRouter, Header, Query, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Any, Dict, Optional, List
+from pydantic import BaseModel, ConfigDict
+import hmac
 import logging
 
+from app.api.responses import FastJSONResponse, fast_json_enabled
+from app.core.config import settings
+from app.services.food_reload import reload_food_database
 from app.services.nutrition_db_service import get_nutrition_service
 
 logger = logging.getLogger(__name__)
@@ -30,7 +45,9 @@ router = APIRouter(prefix="/nutrition", tags=["nutrition"])
 # ============ Response Models ============
 
 class NutrientsPer100g(BaseModel):
-    """每 100g 營養成分"""
+    """每 100g 營養成分（fields= 指定的額外營養素會一併帶出）"""
+    model_config = ConfigDict(extra="allow")
+
     calories: float
     protein: float
     carbs: float
@@ -52,6 +69,7 @@ class CalculatedNutrients(BaseModel):
     name: str
     grams: float
     nutrients: NutrientsPer100g
+    catalog_version: Optional[str] = None
 
 
 class SearchResponse(BaseModel):
@@ -59,6 +77,40 @@ class SearchResponse(BaseModel):
     query: str
     count: int
     results: List[FoodNutrition]
+    catalog_version: Optional[str] = None
+
+
+class Completion(BaseModel):
+    """自動完成候選"""
+    text: str
+    food_id: str
+    name: str
+    category: str
+    matched_field: str
+
+
+class AutocompleteResponse(BaseModel):
+    """自動完成結果"""
+    prefix: str
+    count: int
+    results: List[Completion]
+    catalog_version: Optional[str] = None
+
+
+class FoodQueryResult(FoodNutrition):
+    """範圍查詢結果（含整合編號，可直接用於 /meals）"""
+    food_id: str
+
+
+class QueryResponse(BaseModel):
+    """範圍查詢結果"""
+    filters: Optional[str]
+    category: Optional[str]
+    sort: Optional[str]
+    total: int
+    count: int
+    results: List[FoodQueryResult]
+    catalog_version: Optional[str] = None
 
 
 class StatsResponse(BaseModel):
@@ -67,6 +119,24 @@ class StatsResponse(BaseModel):
     total_categories: int
     match_rate_percent: float
     status: str
+    catalog_version: Optional[str] = None
+    queries: Dict[str, int] = {}
+    cache: Dict[str, Any] = {}
+    latency: Dict[str, Any] = {}
+    stages: Dict[str, Any] = {}
+    memory: Dict[str, Any] = {}
+
+
+class ReloadResponse(BaseModel):
+    """熱更新結果（只涵蓋處理該請求的 worker）"""
+    previous_version: str
+    version: str
+    changed: bool
+    total_foods: int
+    elapsed_ms: float
+    scope: str = "worker"
+    worker_pid: int
+    shared_segment: bool
 
 
 class ValidationResult(BaseModel):
@@ -92,7 +162,9 @@ class ValidationResponse(BaseModel):
 async def search_food(
     q: str = Query(..., min_length=1, description="食物名稱"),
     limit: int = Query(5, ge=1, le=20, description="回傳筆數上限"),
-    category: Optional[str] = Query(None, description="限定食品分類")
+    category: Optional[str] = Query(None, description="限定食品分類"),
+    fields: Optional[str] = Query(None, description="額外營養素欄位，逗號分隔（如 iron,calcium,vitamin_d,vitamin_b12,folate）"),
+    ranked: bool = Query(False, description="依相關度排序（精確、前綴、別名、覆蓋率、名稱長度）")
 ):
     """
     搜尋食物營養資訊
@@ -101,20 +173,38 @@ async def search_food(
     - 精確匹配：「白飯」
     - 別名匹配：「白飯」→「蓬萊米飯」
     - 模糊匹配：「雞」→「雞胸肉」、「雞腿」...
+    - ranked=true：從索引取出所有候選並依相關度排序，而非第一個命中階段的原始資料順序
     
     範例：
     - /nutrition/search?q=雞胸肉
     - /nutrition/search?q=豆腐&category=豆類
+    - /nutrition/search?q=菠菜&fields=iron,calcium,folate
+    - /nutrition/search?q=雞&ranked=true
     """
     try:
         service = get_nutrition_service()
-        results = service.search(q, limit=limit, category=category)
-        
+        try:
+            field_list = service.resolve_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        results = service.search(q, limit=limit, category=category, fields=field_list, ranked=ranked)
+
+        if fast_json_enabled():
+            # 搜尋結果已是 {name, category, per_100g} 的 JSON 原生 dict，直接編碼
+            return FastJSONResponse({
+                "query": q,
+                "count": len(results),
+                "results": results,
+                "catalog_version": service.catalog.version,
+            })
         return SearchResponse(
             query=q,
             count=len(results),
-            results=[FoodNutrition(**r) for r in results]
+            results=[FoodNutrition(**r) for r in results],
+            catalog_version=service.catalog.version,
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"搜尋失敗: {e}")
         raise HTTPException(status_code=500, detail=f"搜尋失敗: {str(e)}")
@@ -123,7 +213,8 @@ async def search_food(
 @router.get("/calculate")
 async def calculate_nutrients(
     food: str = Query(..., min_length=1, description="食物名稱"),
-    grams: float = Query(100, gt=0, le=10000, description="克數")
+    grams: float = Query(100, gt=0, le=10000, description="克數"),
+    fields: Optional[str] = Query(None, description="額外營養素欄位，逗號分隔")
 ):
     """
     計算指定克數的營養成分
@@ -131,10 +222,15 @@ async def calculate_nutrients(
     範例：
     - /nutrition/calculate?food=白飯&grams=200
     - /nutrition/calculate?food=雞胸肉&grams=150
+    - /nutrition/calculate?food=鮭魚&grams=120&fields=vitamin_d,vitamin_b12
     """
     try:
         service = get_nutrition_service()
-        result = service.calculate_nutrients(food, grams)
+        try:
+            field_list = service.resolve_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        result = service.calculate_nutrients(food, grams, fields=field_list)
         
         if result is None:
             raise HTTPException(
@@ -145,7 +241,8 @@ async def calculate_nutrients(
         return CalculatedNutrients(
             name=result['name'],
             grams=result['grams'],
-            nutrients=NutrientsPer100g(**result['nutrients'])
+            nutrients=NutrientsPer100g(**result['nutrients']),
+            catalog_version=service.catalog.version,
         )
     except HTTPException:
         raise
@@ -154,6 +251,86 @@ async def calculate_nutrients(
         raise HTTPException(status_code=500, detail=f"計算失敗: {str(e)}")
 
 
+@router.get("/autocomplete", response_model=AutocompleteResponse)
+async def autocomplete_food(
+    prefix: str = Query(..., min_length=1, description="已輸入的文字"),
+    limit: int = Query(8, ge=1, le=20, description="回傳筆數上限")
+):
+    """
+    食物名稱前綴自動完成（輸入框逐字呼叫）
+
+    比對食物名稱、俗名與常見別名的前綴，依長度與來源排序；
+    不經過 /nutrition/search 的四階段搜尋，也不計入匹配率統計。
+
+    範例：
+    - /nutrition/autocomplete?prefix=雞
+    - /nutrition/autocomplete?prefix=三文
+    """
+    try:
+        service = get_nutrition_service()
+        results = service.autocomplete(prefix, limit=limit)
+        return AutocompleteResponse(
+            prefix=prefix,
+            count=len(results),
+            results=[Completion(**r) for r in results],
+            catalog_version=service.catalog.version,
+        )
+    except Exception as e:
+        logger.error(f"自動完成失敗: {e}")
+        raise HTTPException(status_code=500, detail=f"自動完成失敗: {str(e)}")
+
+
+@router.get("/query", response_model=QueryResponse)
+async def query_foods(
+    filters: Optional[str] = Query(None, description="每 100g 營養素條件，逗號分隔（如 protein>=20,sodium<=100）"),
+    category: Optional[str] = Query(None, description="限定食品分類"),
+    sort: Optional[str] = Query(None, description="排序鍵（如 protein）或密度（如 protein/calories）"),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="排序方向"),
+    limit: int = Query(20, ge=1, le=200, description="回傳筆數上限"),
+    fields: Optional[str] = Query(None, description="額外營養素欄位，逗號分隔")
+):
+    """
+    營養素範圍查詢
+
+    供營養師建立低鈉、腎友等食物清單；條件以每 100g 計，
+    原始資料為空值的食物不符合任何條件。
+
+    範例：
+    - /nutrition/query?filters=protein>=20,sodium<=100&category=魚貝類&sort=protein
+    - /nutrition/query?filters=potassium<=150,sodium<=50&sort=protein/calories
+    - /nutrition/query?filters=calories<=50&sort=fiber&limit=50
+    """
+    try:
+        service = get_nutrition_service()
+        try:
+            field_list = service.resolve_fields(fields)
+            result = service.query(
+                filters=filters,
+                category=category,
+                sort=sort,
+                order=order,
+                limit=limit,
+                fields=field_list,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return QueryResponse(
+            filters=filters,
+            category=category,
+            sort=sort,
+            total=result['total'],
+            count=len(result['results']),
+            results=[FoodQueryResult(**r) for r in result['results']],
+            catalog_version=service.catalog.version,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"範圍查詢失敗: {e}")
+        raise HTTPException(status_code=500, detail=f"範圍查詢失敗: {str(e)}")
+
+
 @router.get("/categories", response_model=List[str])
 async def get_categories():
     """取得所有食品分類列表"""
@@ -165,6 +342,33 @@ async def get_categories():
         raise HTTPException(status_code=500, detail=f"取得分類失敗: {str(e)}")
 
 
+@router.get("/categories/counts", response_model=Dict[str, int])
+async def get_category_counts():
+    """各食品分類的食物筆數（載入時預先計算）"""
+    try:
+        service = get_nutrition_service()
+        return service.get_category_counts()
+    except Exception as e:
+        logger.error(f"取得分類筆數失敗: {e}")
+        raise HTTPException(status_code=500, detail=f"取得分類筆數失敗: {str(e)}")
+
+
+@router.get("/fields")
+async def get_fields():
+    """
+    取得可投影的營養素欄位
+
+    回傳 API 鍵值 → 原始欄位名稱（含單位），
+    用於 /nutrition/search、/nutrition/calculate 與 /meals 的 fields= 參數。
+    """
+    try:
+        service = get_nutrition_service()
+        return service.get_fields()
+    except Exception as e:
+        logger.error(f"取得欄位失敗: {e}")
+        raise HTTPException(status_code=500, detail=f"取得欄位失敗: {str(e)}")
+
+
 @router.get("/stats", response_model=StatsResponse)
 async def get_stats():
     """
@@ -174,6 +378,10 @@ async def get_stats():
     - 總食物數
     - 總分類數
     - 查詢匹配率
+    - 查詢快取命中 / 未命中 / 淘汰數
+    - 依命中階段（exact / alias / fuzzy / partial / miss）的延遲分布
+    - 各匹配階段的嘗試次數與累計耗時
+    - 各結構的記憶體（位元組；食品目錄、搜尋索引、多 worker 共用資料段）
     - 服務狀態
     """
     try:
@@ -185,6 +393,20 @@ async def get_stats():
         raise HTTPException(status_code=500, detail=f"取得統計失敗: {str(e)}")
 
 
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus 抓取端點（text exposition format）"""
+    try:
+        service = get_nutrition_service()
+        return PlainTextResponse(
+            service.prometheus_metrics(),
+            media_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+    except Exception as e:
+        logger.error(f"取得指標失敗: {e}")
+        raise HTTPException(status_code=500, detail=f"取得指標失敗: {str(e)}")
+
+
 @router.get("/validate", response_model=ValidationResponse)
 async def validate_top20():
     """
@@ -215,6 +437,7 @@ async def health_check():
         return {
             "status": "ok" if stats['status'] == 'healthy' else "degraded",
             "total_foods": stats['total_foods'],
+            "catalog_version": stats['catalog_version'],
             "message": "Nutrition DB service is running"
         }
     except Exception as e:
@@ -222,3 +445,32 @@ async def health_check():
             "status": "error",
             "message": str(e)
         }
+
+
+@router.post("/admin/reload", response_model=ReloadResponse)
+def reload_database(
+    force: bool = Query(False, description="內容版本相同時仍重建"),
+    x_admin_token: Optional[str] = Header(None, description="管理權杖（ADMIN_API_TOKEN）")
+):
+    """
+    熱更新食品資料庫（不需重啟 worker）
+
+    在背景建立新的食品目錄與所有索引後才替換服務；
+    建立期間與進行中的請求皆由舊版本完成。
+    內容未變更時不替換（force=true 可強制重建）。
+
+    只重新載入處理此請求的 worker（回應的 scope / worker_pid）。
+    多 worker 部署時，其他 worker 由各自的檔案監看（FOOD_DB_WATCH_INTERVAL_SECONDS）
+    偵測到 CSV 變更後重新載入，並直接附加本次發布的共用資料段。
+    """
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="未設定 ADMIN_API_TOKEN，管理端點已停用")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="管理權杖錯誤")
+    try:
+        return ReloadResponse(**reload_food_database(force=force))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"熱更新失敗: {e}")
+        raise HTTPException(status_code=500, detail=f"熱更新失敗: {str(e)}")
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional, Tuple
 
 from app.api import deps
+from app.api.responses import FastJSONResponse, fast_json_enabled
 from app.models.all_models import User, HealthRecord, AuthAccount
 from app.schemas.user import (
     UserProfile,
@@ -60,46 +61,6 @@ async def get_my_nutrition_targets(
     
     return get_nutrition_targets_from_user(user)
 
-@router.get("/me/dashboard", response_model=UserDashboardResponse)
-def get_my_dashboard(
-    account: AuthAccount = Depends(deps.get_current_account),
-    db: Session = Depends(deps.get_db),
-):
-    # 如果未建立 Profile 回傳 400 錯誤
-    if not account.user_id:
-        return UserDashboardResponse(
-            user_id="guest", latest_record_date=None, health_score=None,
-            key_metrics=[], abnormal_items=[], history=[], ai_report=None
-        )
-
-    user = db.query(User).filter(User.id == account.user_id).first()
-    if not user:
-        return UserDashboardResponse(
-            user_id=account.id, latest_record_date=None, health_score=None,
-            key_metrics=[], abnormal_items=[], history=[], ai_report=None
-        )
-
-    # ... 後續複雜邏輯暫時注釋 ...
-    # 預計整合 AI 分析 API 相關功能
-    return UserDashboardResponse(
-        user_id=user.id, latest_record_date=None, health_score=None,
-        key_metrics=[], abnormal_items=[], history=[], ai_report=None
-    )
-
-@router.post("/", response_model=UserProfile)
-def create_user(
-    user_in: UserProfileCreate,
-    account: Optional[AuthAccount] = Depends(deps.get_current_account_optional),
-    db: Session = Depends(deps.get_db),
-):
-    existing_user = db.query(User).filter(User.name == user_in.name).first()
-    if existing_user:
-        existing_user.age = user_in.age
-        existing_user.weight_kg = user_in.weight_kg
-        existing_user.height_cm = user_in.height_cm
-        existing_user.health_goals = user_in.health_goals
-        if user_in.lifestyle:
-
 
 def _parse_reference_range(reference_range: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
     if not reference_range:
@@ -483,7 +444,7 @@ def get_my_dashboard(
         .order_by(HealthRecord.created_at.asc())
         .all()
     )
-    history_items: List[HealthRecordHistoryItem] = []
+    history = []
     for r in records:
         metrics = {}
         if r.clinical_data:
@@ -494,21 +455,49 @@ def get_my_dashboard(
                         val = v.get("value") if isinstance(v, dict) else None
                         if isinstance(val, (int, float)):
                             metrics[t] = val
-        history_items.append(HealthRecordHistoryItem(
+        history.append((r, metrics))
+
+    latest_record_date = latest_record.created_at.strftime("%Y-%m-%d") if latest_record else None
+    health_score = latest_record.health_score if latest_record else None
+    ai_report = latest_record.ai_analysis if latest_record else None
+
+    if fast_json_enabled():
+        # 歷史紀錄逐筆組成 dict（key_metrics / abnormal_items 筆數固定且少，沿用模型輸出）
+        return FastJSONResponse({
+            "user_id": user.id,
+            "latest_record_date": latest_record_date,
+            "health_score": health_score,
+            "key_metrics": [m.model_dump() for m in key_metrics],
+            "abnormal_items": [a.model_dump() for a in abnormal_items],
+            "history": [
+                {
+                    "record_id": r.id,
+                    "created_at": r.created_at.strftime("%Y-%m-%d"),
+                    "health_score": r.health_score,
+                    "key_metrics": {k: float(v) for k, v in metrics.items()},
+                }
+                for r, metrics in history
+            ],
+            "ai_report": ai_report,
+        })
+
+    history_items: List[HealthRecordHistoryItem] = [
+        HealthRecordHistoryItem(
             record_id=r.id,
             created_at=r.created_at.strftime("%Y-%m-%d"),
             health_score=r.health_score,
             key_metrics=metrics,
-        ))
-
+        )
+        for r, metrics in history
+    ]
     return UserDashboardResponse(
         user_id=user.id,
-        latest_record_date=latest_record.created_at.strftime("%Y-%m-%d") if latest_record else None,
-        health_score=latest_record.health_score if latest_record else None,
+        latest_record_date=latest_record_date,
+        health_score=health_score,
         key_metrics=key_metrics,
         abnormal_items=abnormal_items,
         history=history_items,
-        ai_report=latest_record.ai_analysis if latest_record else None,
+        ai_report=ai_report,
     )
 
 
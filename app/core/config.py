@@ -26,6 +26,20 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "43200"))
 
+    # 營養查詢結果快取（LRU；TTL 秒數 0 表示不過期，大小 0 表示停用）
+    NUTRITION_CACHE_SIZE: int = int(os.getenv("NUTRITION_CACHE_SIZE", "2048"))
+    NUTRITION_CACHE_TTL_SECONDS: float = float(os.getenv("NUTRITION_CACHE_TTL_SECONDS", "0"))
+
+    # 食品資料庫熱更新：管理端點的權杖（空字串表示停用端點）與 CSV 監看間隔（秒，0 表示不監看）
+    ADMIN_API_TOKEN: str = os.getenv("ADMIN_API_TOKEN", "")
+    FOOD_DB_WATCH_INTERVAL_SECONDS: float = float(os.getenv("FOOD_DB_WATCH_INTERVAL_SECONDS", "0"))
+
+    # 啟動時在背景預熱食品目錄、搜尋 / 對齊索引與知識庫，完成後 /ready 才就緒
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+    # 高流量讀取端點改以預先整理的 dict + orjson 輸出（略過逐項 Pydantic 驗證）
+    FAST_JSON_RESPONSES: bool = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
     # 允許跨域請求 (CORS)
     # 可用 env BACKEND_CORS_ORIGINS 設定：
     # - 逗號分隔字串："https://app.example.com,https://admin.example.com"
@@ -1,11 +1,45 @@
 # 初始化資料庫腳本
-from app.db.session import engine, Base
-from app.models.all_models import User, HealthRecord, Meal, MealItem, AuthAccount
+from sqlalchemy import inspect, text
+
+from app.db.session import engine, Base, SessionLocal
+from app.models.all_models import User, HealthRecord, Meal, MealItem, AuthAccount, DailyNutrientTotal
+from app.services.daily_totals import NUTRIENT_KEYS, backfill_meal_columns, rebuild_daily_totals
+
+
+def add_meal_nutrient_columns(bind=engine) -> list:
+    """既有的 meals 資料表補上營養素數值欄位（create_all 不會修改既有資料表），回傳新增的欄位"""
+    existing = {column["name"] for column in inspect(bind).get_columns(Meal.__tablename__)}
+    missing = [key for key in NUTRIENT_KEYS if key not in existing]
+    with bind.begin() as conn:
+        for key in missing:
+            conn.execute(text(f"ALTER TABLE {Meal.__tablename__} ADD COLUMN {key} FLOAT"))
+    return missing
+
 
 def init_db():
     print("Creating database tables...")
+    new_rollup = not inspect(engine).has_table(DailyNutrientTotal.__tablename__)
     Base.metadata.create_all(bind=engine)
     print("Database tables created successfully!")
 
+    # meals 營養素數值欄位：舊資料表新增欄位，並由 nutrients JSON 回填
+    added = add_meal_nutrient_columns()
+    if added:
+        print(f"Added meals columns: {', '.join(added)}")
+    with SessionLocal() as db:
+        filled = backfill_meal_columns(db)
+    if filled:
+        print(f"Backfilled meal nutrient columns: {filled} meals")
+
+    # 既有 meals 資料表補上分頁用複合索引（create_all 不會為既有資料表建立索引）
+    for index in Meal.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    # 每日營養素總和表首次建立時，由既有的 meals 回填
+    if new_rollup:
+        with SessionLocal() as db:
+            rows = rebuild_daily_totals(db)
+        print(f"Backfilled daily_nutrient_totals: {rows} rows")
+
 if __name__ == "__main__":
     init_db()
@@ -1,13 +1,31 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.core.config import settings
 from app.api.v1.endpoints import ocr, recommendation, users, chat, auth, nutrition, food, meals
+from app.services.food_reload import start_food_db_watcher, stop_food_db_watcher
+from app.services.warmup import readiness, start_warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 背景預熱食品目錄、索引與知識庫（完成前 /ready 回 503）
+    if settings.WARMUP_ON_STARTUP:
+        start_warmup()
+    # 食品資料庫檔案監看（FOOD_DB_WATCH_INTERVAL_SECONDS > 0 時啟用）
+    start_food_db_watcher(settings.FOOD_DB_WATCH_INTERVAL_SECONDS)
+    yield
+    stop_food_db_watcher()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="結合 OCR 與營養建議的健康管理系統 - Powered by Gemini 3 Pro",
     version="0.2.0 (Refactored)",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # 設定 CORS (為了未來的前端 UI)
@@ -18,6 +36,7 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
 
 @app.get("/")
@@ -32,6 +51,12 @@ async def root():
 async def health_check():
     return {"status": "ok", "gemini_model": settings.GEMINI_MODEL_NAME}
 
+@app.get("/ready")
+async def readiness_check():
+    """預熱完成才回 200（含各階段耗時，非必要階段失敗時 status 為 degraded）；預熱中或必要階段失敗回 503"""
+    report = readiness()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
 # Router 註冊
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Auth"])
 app.include_router(ocr.router, prefix="/api/v1/ocr", tags=["OCR"])
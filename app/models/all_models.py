@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, JSON, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, JSON, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
@@ -103,11 +103,24 @@ class Meal(Base):
 
     nutrients = Column(JSON, default=dict)
 
+    # 每餐核心營養素總和（與 nutrients JSON 相同），供資料庫端 SUM / GROUP BY；
+    # 既有資料由 init_db 新增欄位並回填
+    calories = Column(Float, nullable=True)
+    protein = Column(Float, nullable=True)
+    carbs = Column(Float, nullable=True)
+    fat = Column(Float, nullable=True)
+    sodium = Column(Float, nullable=True)
+    fiber = Column(Float, nullable=True)
+    potassium = Column(Float, nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     owner = relationship("User", back_populates="meals")
     items = relationship("MealItem", back_populates="meal")
 
+    # GET /meals 依 (eaten_at, id) 由新到舊分頁（keyset），每頁直接由索引定位
+    __table_args__ = (Index("ix_meals_user_eaten_at_id", "user_id", "eaten_at", "id"),)
+
 
 class MealItem(Base):
     """
@@ -130,3 +143,28 @@ class MealItem(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     meal = relationship("Meal", back_populates="items")
+
+
+class DailyNutrientTotal(Base):
+    """
+    每位使用者每日的營養素總和（/meals/summary 讀取用）
+
+    餐點新增 / 刪除時在同一個交易內增量更新；
+    可用 python -m app.services.daily_totals 由 meals 重建。
+    local_date 為 eaten_at 的 UTC 日期（與今日統計的 UTC 00:00 一致）。
+    """
+    __tablename__ = "daily_nutrient_totals"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    local_date = Column(Date, primary_key=True)
+    meal_count = Column(Integer, nullable=False, default=0)
+
+    calories = Column(Float, nullable=False, default=0)
+    protein = Column(Float, nullable=False, default=0)
+    carbs = Column(Float, nullable=False, default=0)
+    fat = Column(Float, nullable=False, default=0)
+    sodium = Column(Float, nullable=False, default=0)
+    fiber = Column(Float, nullable=False, default=0)
+    potassium = Column(Float, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 from pydantic import BaseModel, Field
 
 
@@ -14,3 +14,27 @@ class FoodAlignResponse(BaseModel):
     query: str
     count: int
     results: List[FoodMatch]
+
+
+class FoodAlignBatchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=100, description="食物名稱或描述列表")
+    limit: int = Field(5, ge=1, le=20, description="每筆回傳筆數上限")
+
+
+class FoodAlignBatchResponse(BaseModel):
+    count: int
+    results: List[FoodAlignResponse]
+
+
+class FoodSubstitute(BaseModel):
+    food_id: str = Field(..., description="資料庫整合編號")
+    name: str
+    category: str
+    distance: float = Field(..., description="標準化營養素空間中的距離（越小越相似）")
+    per_100g: Dict[str, float]
+
+
+class FoodSubstituteResponse(BaseModel):
+    food: FoodSubstitute
+    count: int
+    results: List[FoodSubstitute]
@@ -1,9 +1,12 @@
 from typing import List, Optional, Dict
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class Nutrients(BaseModel):
+    # fields= 指定的額外營養素（如 iron、calcium）會一併帶出
+    model_config = ConfigDict(extra="allow")
+
     calories: float = 0
     protein: float = 0
     carbs: float = 0
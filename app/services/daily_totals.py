@@ -0,0 +1,206 @@
+"""
+Daily Nutrient Totals
+=====================
+每位使用者每日營養素總和（daily_nutrient_totals）的增量維護與重建。
+
+- 新增餐點：在同一個交易內把該餐營養素加到 (user_id, 日期) 那一列（不存在時建立）
+- 刪除餐點：在同一個交易內扣回，該日已無餐點時刪除整列
+- /meals/summary 只讀取期間內每日一列（最多 365 列），不掃描 meals、不解析 JSON
+
+新增使用 INSERT ... ON CONFLICT DO UPDATE（SQLite / Postgres），
+同一使用者同一天的並行寫入由資料庫逐列序列化，不會遺失更新。
+
+meals 另以數值欄位（calories、protein …）儲存每餐總和，重建時直接在資料庫
+以 GROUP BY 日期 + SUM() 彙總，不需逐列解析 JSON。
+
+重建（由 meals 全部重新彙總；首次建立資料表時 init_db 會自動執行）：
+    python -m app.services.daily_totals              # 所有使用者
+    python -m app.services.daily_totals <user_id>    # 單一使用者
+"""
+
+from __future__ import annotations
+
+import logging
+import sys
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Union
+
+from sqlalchemy import Date, Row, bindparam, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.all_models import DailyNutrientTotal, Meal
+from app.services.food_catalog import CORE_NUTRIENTS
+
+logger = logging.getLogger(__name__)
+
+NUTRIENT_KEYS = list(CORE_NUTRIENTS)
+_table = DailyNutrientTotal.__table__
+
+
+def local_date(eaten_at: datetime) -> date:
+    """餐點所屬日期：有時區者換算為 UTC，無時區者視為 UTC（與 datetime.utcnow() 一致）"""
+    if eaten_at.tzinfo is not None:
+        eaten_at = eaten_at.astimezone(timezone.utc)
+    return eaten_at.date()
+
+
+def nutrient_amounts(nutrients: Optional[dict]) -> Dict[str, float]:
+    """餐點營養素 JSON → 各欄位數值（缺值與 None 視為 0，與 _sum_nutrients 相同；即 meals 的數值欄位）"""
+    nutrients = nutrients or {}
+    return {key: float(nutrients.get(key, 0) or 0) for key in NUTRIENT_KEYS}
+
+
+def add_meal(db: Session, user_id: str, eaten_at: datetime, nutrients: Optional[dict]) -> None:
+    """把一餐加到當日總和（不提交，由呼叫端與餐點一起提交）"""
+    values = {"user_id": user_id, "local_date": local_date(eaten_at), "meal_count": 1, **nutrient_amounts(nutrients)}
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite if dialect == "sqlite" else postgresql).insert(_table).values(**values)
+        increments = {key: _table.c[key] + stmt.excluded[key] for key in ["meal_count", *NUTRIENT_KEYS]}
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[_table.c.user_id, _table.c.local_date],
+            set_={**increments, "updated_at": func.now()},
+        ))
+        return
+
+    # 其他資料庫：鎖定該列後更新，不存在時新增
+    row = (
+        db.query(DailyNutrientTotal)
+        .filter(DailyNutrientTotal.user_id == user_id, DailyNutrientTotal.local_date == values["local_date"])
+        .with_for_update()
+        .first()
+    )
+    if row is None:
+        db.execute(insert(_table).values(**values))
+        return
+    db.execute(
+        update(_table)
+        .where(_table.c.user_id == user_id, _table.c.local_date == values["local_date"])
+        .values(**{key: _table.c[key] + values[key] for key in ["meal_count", *NUTRIENT_KEYS]})
+    )
+
+
+def remove_meal(db: Session, user_id: str, eaten_at: datetime, nutrients: Optional[dict]) -> None:
+    """從當日總和扣回一餐（不提交）；該日已無餐點時刪除整列"""
+    day = local_date(eaten_at)
+    amounts = nutrient_amounts(nutrients)
+    where = (_table.c.user_id == user_id, _table.c.local_date == day)
+    db.execute(
+        update(_table)
+        .where(*where)
+        .values(
+            meal_count=_table.c.meal_count - 1,
+            updated_at=func.now(),
+            **{key: _table.c[key] - amounts[key] for key in NUTRIENT_KEYS},
+        )
+    )
+    db.execute(delete(_table).where(*where, _table.c.meal_count <= 0))
+
+
+def read_daily_totals(db: Session, user_id: str, since: date) -> List[Row]:
+    """since（含）之後每日一列（local_date、meal_count 與各營養素欄位），依日期排序"""
+    return (
+        db.query(_table.c.local_date, _table.c.meal_count, *[_table.c[key] for key in NUTRIENT_KEYS])
+        .filter(DailyNutrientTotal.user_id == user_id, DailyNutrientTotal.local_date >= since)
+        .order_by(DailyNutrientTotal.local_date.asc())
+        .all()
+    )
+
+
+def totals_dict(row: Optional[Union[DailyNutrientTotal, Row]]) -> Dict[str, float]:
+    """一列 → 營養素 dict（四捨五入到 4 位，與 _sum_nutrients 相同）"""
+    if row is None:
+        return {key: 0 for key in NUTRIENT_KEYS}
+    return {key: round(getattr(row, key), 4) for key in NUTRIENT_KEYS}
+
+
+def _meal_day(dialect: str):
+    """eaten_at 的 UTC 日期（資料庫端運算式，與 local_date() 相同）"""
+    if dialect == "postgresql":
+        return func.date(func.timezone("UTC", Meal.eaten_at), type_=Date)
+    # SQLite 以無時區的 UTC 字串儲存，date() 取前 10 碼
+    return func.date(Meal.eaten_at, type_=Date)
+
+
+def aggregate_meals(db: Session, user_id: Optional[str] = None, since: Optional[date] = None) -> List[Row]:
+    """
+    由 meals 的數值欄位在資料庫端彙總每日總和（GROUP BY 使用者、日期）
+
+    Returns:
+        每列 user_id、local_date、meal_count 與各營養素欄位，依使用者、日期排序
+    """
+    day = _meal_day(db.get_bind().dialect.name).label("local_date")
+    query = (
+        select(
+            Meal.user_id,
+            day,
+            func.count().label("meal_count"),
+            *[func.coalesce(func.sum(getattr(Meal, key)), 0.0).label(key) for key in NUTRIENT_KEYS],
+        )
+        .where(Meal.eaten_at.isnot(None))
+        .group_by(Meal.user_id, day)
+        .order_by(Meal.user_id, day)
+    )
+    if user_id is not None:
+        query = query.where(Meal.user_id == user_id)
+    if since is not None:
+        query = query.where(day >= since)
+    return db.execute(query).all()
+
+
+def backfill_meal_columns(db: Session, batch_size: int = 1000) -> int:
+    """
+    由 nutrients JSON 填入 meals 的數值欄位（只處理尚未填入者）並提交
+
+    Returns:
+        更新的餐點數
+    """
+    table = Meal.__table__
+    updated = 0
+    while True:
+        rows = db.execute(
+            select(table.c.id, table.c.nutrients).where(table.c.calories.is_(None)).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.execute(
+            update(table).where(table.c.id == bindparam("meal_id")),
+            [{"meal_id": meal_id, **nutrient_amounts(nutrients)} for meal_id, nutrients in rows],
+        )
+        db.commit()
+        updated += len(rows)
+    if updated:
+        logger.info(f"✅ meals 營養素欄位回填完成: {updated} 餐")
+    return updated
+
+
+def rebuild_daily_totals(db: Session, user_id: Optional[str] = None) -> int:
+    """
+    由 meals 重新彙總每日總和並提交（資料庫端 GROUP BY，見 aggregate_meals）
+
+    Args:
+        user_id: 只重建該使用者；未指定時重建全部
+
+    Returns:
+        寫入的列數
+    """
+    rows = [row._asdict() for row in aggregate_meals(db, user_id)]
+
+    clear = delete(_table)
+    if user_id is not None:
+        clear = clear.where(_table.c.user_id == user_id)
+    db.execute(clear)
+    if rows:
+        db.execute(insert(_table), rows)
+    db.commit()
+    logger.info(f"✅ 每日營養素總和重建完成: {len(rows)} 列（{'全部使用者' if user_id is None else user_id}）")
+    return len(rows)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as session:
+        print(rebuild_daily_totals(session, sys.argv[1] if len(sys.argv) > 1 else None))
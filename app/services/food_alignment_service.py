@@ -6,19 +6,55 @@ Food Alignment Service
 
 from __future__ import annotations
 
-import os
-import re
-from typing import Dict, List, Optional, Any
-from functools import lru_cache
+import heapq
+from collections import Counter
+from typing import Dict, List, Optional, Any, Tuple
 from difflib import SequenceMatcher
 
+import numpy as np
 import pandas as pd
 
-from app.services.nutrition_db_service import get_nutrition_service
+from app.services.food_catalog import FoodCatalog, get_food_catalog, normalize_name, split_aliases
+
+
+def build_char_postings(texts: List[str]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """字元倒排索引：字元 → (含該字元的 text 編號, 該字元在 text 中的次數)"""
+    postings: Dict[str, Tuple[List[int], List[int]]] = {}
+    for text_id, text in enumerate(texts):
+        for ch, count in Counter(text).items():
+            ids, counts = postings.setdefault(ch, ([], []))
+            ids.append(text_id)
+            counts.append(count)
+    return {
+        ch: (np.array(ids, dtype=np.int32), np.array(counts, dtype=np.int32))
+        for ch, (ids, counts) in postings.items()
+    }
+
+
+def postings_from_arrays(
+    chars: np.ndarray, offsets: np.ndarray, ids: np.ndarray, counts: np.ndarray
+) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """由攤平的陣列（共用資料段）還原字元倒排索引；每個 posting 皆為原陣列的切片，不複製"""
+    bounds = offsets.tolist()
+    return {
+        chr(code): (ids[bounds[i]:bounds[i + 1]], counts[bounds[i]:bounds[i + 1]])
+        for i, code in enumerate(chars.tolist())
+    }
 
 
 class FoodAlignmentService:
-    """食物名稱對齊服務（MVP）"""
+    """
+    食物名稱對齊服務（MVP）
+
+    兩階段對齊：
+    1. 候選：以字元倒排索引計算查詢與每個名稱 / 別名的字元重疊數，
+       得到 SequenceMatcher.ratio 的上界（2 * 重疊數 / 總長度）
+    2. 重排：依上界由高到低，只對候選呼叫 _score；
+       當第 k 名的分數已高於下一個候選的上界即停止
+    """
+
+    # 重排階段最多評分的候選數（已湊滿 limit 筆時生效）
+    RERANK_LIMIT = 300
 
     REQUIRED_FIELDS = [
         "整合編號",
@@ -45,63 +81,71 @@ class FoodAlignmentService:
         "鉀(mg)",
     ]
 
-    def __init__(self, csv_path: Optional[str] = None) -> None:
-        if csv_path is None:
-            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-            csv_path = os.path.join(base_dir, "食品營養成分資料庫2024UPDATE2_clean.csv")
-            if not os.path.exists(csv_path):
-                csv_path = "食品營養成分資料庫2024UPDATE2_clean.csv"
+    def __init__(self, csv_path: Optional[str] = None, catalog: Optional[FoodCatalog] = None) -> None:
         self.csv_path = csv_path
-        self._df: Optional[pd.DataFrame] = None
+        self._catalog = catalog
         self._index: Optional[List[Dict[str, Any]]] = None
+        # 字元倒排索引：所有名稱與別名攤平成 texts，依記錄連續排列
+        self._texts: List[str] = []
+        self._text_lens: np.ndarray = np.zeros(0, dtype=np.int32)
+        self._record_offsets: np.ndarray = np.zeros(1, dtype=np.int64)
+        self._char_postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
 
     @property
-    def df(self) -> pd.DataFrame:
-        if self._df is None:
-            self._load_data()
-        return self._df
+    def catalog(self) -> FoodCatalog:
+        if self._catalog is None:
+            self._catalog = FoodCatalog(self.csv_path) if self.csv_path else get_food_catalog()
+        return self._catalog
 
-    def _load_data(self) -> None:
-        self._df = pd.read_csv(self.csv_path, encoding="utf-8")
-        for col in self.NUMERIC_FIELDS:
-            if col in self._df.columns:
-                self._df[col] = pd.to_numeric(self._df[col], errors="coerce").fillna(0)
+    @property
+    def df(self) -> pd.DataFrame:
+        return self.catalog.df
 
     def _build_index(self) -> None:
         if self._index is not None:
             return
-        self._index = []
-        df = self.df
-        for _, row in df.iterrows():
-            record = {
-                "food_id": str(row.get("整合編號", "")),
-                "category": str(row.get("食品分類", "")),
-                "name": str(row.get("樣品名稱", "")),
-                "alias": self._split_aliases(row.get("俗名", "")) + self._split_aliases(row.get("內容物描述", "")),
-                "name_norm": self._normalize(str(row.get("樣品名稱", ""))),
+        catalog = self.catalog
+        self._index = [
+            {
+                "food_id": catalog.food_ids[i],
+                "category": catalog.categories[i],
+                "name": catalog.names[i],
+                "alias": catalog.aliases[i],
+                "name_norm": catalog.name_norm[i],
+                "alias_norm": catalog.alias_norm[i],
             }
-            record["alias_norm"] = [self._normalize(a) for a in record["alias"] if a]
-            self._index.append(record)
+            for i in range(len(catalog))
+        ]
+
+        texts: List[str] = []
+        offsets = [0]
+        for record in self._index:
+            texts.append(record["name_norm"])
+            texts.extend(record["alias_norm"])
+            offsets.append(len(texts))
+        self._texts = texts
+
+        shared = catalog.shared
+        if shared:
+            # 多 worker 共用資料段：直接使用 mmap 陣列（唯讀）
+            self._text_lens = shared["text_lens"]
+            self._record_offsets = shared["record_offsets"]
+            self._char_postings = postings_from_arrays(
+                shared["posting_chars"], shared["posting_offsets"], shared["posting_ids"], shared["posting_counts"]
+            )
+            return
+
+        self._text_lens = np.array([len(t) for t in texts], dtype=np.int32)
+        self._record_offsets = np.array(offsets, dtype=np.int64)
+        self._char_postings = build_char_postings(texts)
 
     @staticmethod
     def _split_aliases(value: Any) -> List[str]:
-        if value is None:
-            return []
-        text = str(value)
-        if not text or text == "nan":
-            return []
-        parts = re.split(r"[，,;/、\n\r]+", text)
-        return [p.strip().strip("\"") for p in parts if p.strip()]
+        return split_aliases(value)
 
     @staticmethod
     def _normalize(text: str) -> str:
-        if not text:
-            return ""
-        text = text.lower().strip()
-        text = re.sub(r"\([^\)]*\)", "", text)
-        text = re.sub(r"[\s\-_/]+", "", text)
-        text = re.sub(r"[\[\]{}<>]", "", text)
-        return text
+        return normalize_name(text)
 
     @staticmethod
     def _score(query_norm: str, candidate_norm: str) -> float:
@@ -113,7 +157,127 @@ class FoodAlignmentService:
             return 0.85
         return SequenceMatcher(None, query_norm, candidate_norm).ratio()
 
+    def _upper_bounds(self, query_norms: List[str]) -> np.ndarray:
+        """
+        每個查詢對每個 text 的 _score 上界（queries × texts）
+
+        - ratio = 2M / (len(q) + len(c))，M 不超過字元多重集合的交集大小
+        - 字元重疊數 = 查詢長度時可能是子字串（0.85）；長度也相同時可能完全匹配（1.0）
+
+        多個查詢共用同一字元的 posting list，只查一次索引。
+        """
+        overlap = np.zeros((len(query_norms), len(self._texts)), dtype=np.int32)
+        char_counts: Dict[str, List[Tuple[int, int]]] = {}
+        for qi, query_norm in enumerate(query_norms):
+            for ch, q_count in Counter(query_norm).items():
+                char_counts.setdefault(ch, []).append((qi, q_count))
+
+        for ch, users in char_counts.items():
+            posting = self._char_postings.get(ch)
+            if posting is None:
+                continue
+            ids, counts = posting
+            for qi, q_count in users:
+                overlap[qi, ids] += np.minimum(counts, q_count)
+
+        query_lens = np.array([len(q) for q in query_norms], dtype=np.int32)[:, None]
+        bounds = 2.0 * overlap / (query_lens + np.maximum(self._text_lens, 1))
+        contains_all = overlap >= query_lens
+        bounds[contains_all] = np.maximum(bounds[contains_all], 0.85)
+        bounds[contains_all & (self._text_lens == query_lens)] = 1.0
+        return bounds
+
+    def _score_record(self, rec: int, query_norm: str, bounds: np.ndarray) -> Tuple[float, str]:
+        """計算單一記錄的最佳分數與匹配欄位（與逐筆掃描結果相同）"""
+        start = int(self._record_offsets[rec])
+        end = int(self._record_offsets[rec + 1])
+        name_score = 0.0
+        best_alias_score = 0.0
+        best = 0.0
+        # 先算上界高的 text；上界低於目前最佳者不影響結果，可略過
+        for text_id in sorted(range(start, end), key=lambda t: -bounds[t]):
+            if bounds[text_id] < best:
+                break
+            score = self._score(query_norm, self._texts[text_id])
+            if text_id == start:
+                name_score = score
+            elif score > best_alias_score:
+                best_alias_score = score
+            best = max(best, score)
+        matched_field = "name" if name_score >= best_alias_score else "alias"
+        return best, matched_field
+
     def align(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        return self.align_many([query], limit=limit)[0]
+
+    def align_many(self, queries: List[str], limit: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        批次對齊多個食物名稱
+
+        正規化後去除重複，共用候選產生（字元索引只查一次），
+        結果順序與輸入相同；每筆結果與單獨呼叫 align 相同。
+        """
+        self._build_index()
+        query_norms = [self._normalize(q) for q in queries]
+        unique_norms = list(dict.fromkeys(q for q in query_norms if q))
+        if not unique_norms or not self._texts:
+            return [[] for _ in queries]
+
+        bounds = self._upper_bounds(unique_norms)
+        record_bounds = np.maximum.reduceat(bounds, self._record_offsets[:-1], axis=1)
+        aligned: Dict[str, List[Dict[str, Any]]] = {}
+        for qi, query_norm in enumerate(unique_norms):
+            aligned[query_norm] = self._rerank(query_norm, bounds[qi], record_bounds[qi], limit)
+
+        # 每筆回傳獨立的 dict，避免重複查詢共用同一物件
+        return [[dict(r) for r in aligned.get(q, [])] for q in query_norms]
+
+    def _rerank(
+        self,
+        query_norm: str,
+        bounds: np.ndarray,
+        record_bounds: np.ndarray,
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        candidates = np.nonzero(record_bounds > 0)[0]
+        order = candidates[np.argsort(-record_bounds[candidates], kind="stable")]
+
+        # 目前前 limit 名，以 (分數, -列位置) 排序的 min-heap：堆頂為最末名
+        # 分數以四捨五入後比較，同分時依原始資料順序，與逐筆掃描結果相同
+        top: List[Tuple[float, int]] = []
+        scored: List[Tuple[float, int, str]] = []
+        for evaluated, rec in enumerate(order.tolist()):
+            if len(top) >= limit:
+                if (round(float(record_bounds[rec]), 4), -rec) < top[0]:
+                    break
+                if evaluated >= self.RERANK_LIMIT:
+                    break
+
+            best_score, matched_field = self._score_record(rec, query_norm, bounds)
+            if best_score <= 0:
+                continue
+            score = round(best_score, 4)
+            scored.append((score, rec, matched_field))
+            if len(top) < limit:
+                heapq.heappush(top, (score, -rec))
+            elif (score, -rec) > top[0]:
+                heapq.heapreplace(top, (score, -rec))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        results: List[Dict[str, Any]] = []
+        for score, rec, matched_field in scored[:limit]:
+            record = self._index[rec]
+            results.append({
+                "food_id": record["food_id"],
+                "name": record["name"],
+                "category": record["category"],
+                "matched_field": matched_field,
+                "score": score,
+            })
+        return results
+
+    def _align_full_scan(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """逐筆比對所有記錄（對照組，用於驗證候選剪枝不影響結果）"""
         self._build_index()
         query_norm = self._normalize(query)
         results: List[Dict[str, Any]] = []
@@ -140,29 +304,26 @@ class FoodAlignmentService:
         return results[:limit]
 
     def get_food_nutrients(self, food_id: str) -> Optional[Dict[str, Any]]:
-        if not food_id:
-            return None
-        df = self.df
-        match = df[df["整合編號"].astype(str) == str(food_id)]
-        if match.empty:
-            return None
-        row = match.iloc[0]
-        return {
-            "food_id": str(row.get("整合編號", "")),
-            "name": str(row.get("樣品名稱", "")),
-            "category": str(row.get("食品分類", "")),
-            "per_100g": {
-                "calories": float(row.get("熱量(kcal)", 0) or 0),
-                "protein": float(row.get("粗蛋白(g)", 0) or 0),
-                "carbs": float(row.get("總碳水化合物(g)", 0) or 0),
-                "fat": float(row.get("粗脂肪(g)", 0) or 0),
-                "sodium": float(row.get("鈉(mg)", 0) or 0),
-                "fiber": float(row.get("膳食纖維(g)", 0) or 0),
-                "potassium": float(row.get("鉀(mg)", 0) or 0),
-            }
-        }
+        return self.catalog.get(food_id)
+
+    def get_many(self, food_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """批次取得營養資料，順序與輸入相同（找不到為 None）"""
+        return self.catalog.get_many(food_ids)
+
+
+# 全域單例（延遲初始化）
+_food_alignment_service: Optional[FoodAlignmentService] = None
 
 
-@lru_cache(maxsize=1)
 def get_food_alignment_service() -> FoodAlignmentService:
-    return FoodAlignmentService()
+    """取得食物名稱對齊服務單例"""
+    global _food_alignment_service
+    if _food_alignment_service is None:
+        _food_alignment_service = FoodAlignmentService()
+    return _food_alignment_service
+
+
+def set_food_alignment_service(service: FoodAlignmentService) -> None:
+    """替換食物名稱對齊服務單例（熱更新用）"""
+    global _food_alignment_service
+    _food_alignment_service = service
@@ -0,0 +1,675 @@
+"""
+Food Catalog
+============
+食品營養資料的單一記憶體目錄。
+
+營養查詢（NutritionDBService）與名稱對齊（FoodAlignmentService）共用同一份
+解析結果，每個程序只解析、保存一次：
+- 資料表（DataFrame，只保留整合編號、名稱、分類、俗名與內容物描述等文字欄位；食品分類為 category）
+- 數值營養素矩陣（foods × nutrients，float64，空值補 0；與 CSV 解析值完全相同）：
+  營養素只保存這一份，建立矩陣後即從資料表捨棄數值欄位
+- 整合編號 → 列位置
+- 名稱 / 別名及其正規化字串（sys.intern，重複值共用同一物件）
+- 版本識別碼（資料內容雜湊前 12 碼），熱更新後可辨識回應來自哪一版資料
+
+已建立共用資料段（app.services.shared_catalog）時，正規化名稱與營養素矩陣
+改由唯讀 mmap 附加，多個 worker 共用同一份記憶體。
+快照新鮮時（app.services.food_snapshot）只重建文字欄位，營養素矩陣同樣以唯讀 mmap
+附加，正規化名稱直接取自快照，不再逐一正規化。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.food_snapshot import (
+    default_csv_path,
+    file_sha256,
+    load_catalog_snapshot,
+    load_food_table,
+    read_snapshot_meta,
+    snapshot_path_for,
+)
+from app.services.shared_catalog import decode_texts, load_segment
+
+logger = logging.getLogger(__name__)
+
+
+# API 使用的核心營養素鍵值 → CSV 欄位
+CORE_NUTRIENTS = {
+    "calories": "熱量(kcal)",
+    "protein": "粗蛋白(g)",
+    "carbs": "總碳水化合物(g)",
+    "fat": "粗脂肪(g)",
+    "sodium": "鈉(mg)",
+    "fiber": "膳食纖維(g)",
+    "potassium": "鉀(mg)",
+}
+
+
+# 其他營養素欄位 → API 鍵值（fields= 投影使用）
+_NAMED_FIELDS = {
+    "廢棄率(%)": "refuse_percent",
+    "修正熱量(kcal)": "calories_adjusted",
+    "水分(g)": "water",
+    "飽和脂肪(g)": "saturated_fat",
+    "灰分(g)": "ash",
+    "糖質總量(g)": "sugar",
+    "葡萄糖(g)": "glucose",
+    "果糖(g)": "fructose",
+    "半乳糖(g)": "galactose",
+    "麥芽糖(g)": "maltose",
+    "蔗糖(g)": "sucrose",
+    "乳糖(g)": "lactose",
+    "鈣(mg)": "calcium",
+    "鎂(mg)": "magnesium",
+    "鐵(mg)": "iron",
+    "鋅(mg)": "zinc",
+    "磷(mg)": "phosphorus",
+    "銅(mg)": "copper",
+    "錳(mg)": "manganese",
+    "維生素A總量(IU)": "vitamin_a_iu",
+    "視網醇當量(RE)(ug)": "vitamin_a_re",
+    "視網醇(ug)": "retinol",
+    "α-胡蘿蔔素(ug)": "alpha_carotene",
+    "β-胡蘿蔔素(ug)": "beta_carotene",
+    "維生素D總量(IU)": "vitamin_d_iu",
+    "維生素D總量(ug)": "vitamin_d",
+    "維生素D2(ug)": "vitamin_d2",
+    "維生素D3(ug)": "vitamin_d3",
+    "維生素E總量(mg)": "vitamin_e",
+    "α-維生素E當量(α-TE)(mg)": "vitamin_e_alpha_te",
+    "α-生育酚(mg)": "alpha_tocopherol",
+    "β-生育酚(mg)": "beta_tocopherol",
+    "γ-生育酚(mg)": "gamma_tocopherol",
+    "δ-生育酚(mg)": "delta_tocopherol",
+    "維生素K1(ug)": "vitamin_k1",
+    "維生素K2 (MK-4)(ug)": "vitamin_k2_mk4",
+    "維生素K2 (MK-7)(ug)": "vitamin_k2_mk7",
+    "維生素B1(mg)": "vitamin_b1",
+    "維生素B2(mg)": "vitamin_b2",
+    "菸鹼素(mg)": "niacin",
+    "維生素B6(mg)": "vitamin_b6",
+    "維生素B12(ug)": "vitamin_b12",
+    "葉酸(ug)": "folate",
+    "維生素C(mg)": "vitamin_c",
+    "脂肪酸S總量(mg)": "sfa_total",
+    "脂肪酸M總量(mg)": "mufa_total",
+    "脂肪酸P總量(mg)": "pufa_total",
+    "其他脂肪酸(mg)": "fa_other",
+    "反式脂肪(mg)": "trans_fat",
+    "水解胺基酸總量(mg)": "amino_acids_total",
+    "膽固醇(mg)": "cholesterol",
+    "酒精含量(g)": "alcohol",
+}
+
+
+def nutrient_key(column: str) -> str:
+    """
+    CSV 營養素欄位 → API 鍵值
+
+    - 核心與常用欄位：查表（如 鐵(mg) → iron）
+    - 脂肪酸：碳數比例（如 油酸(18:1)(mg) → fa_18_1）
+    - 胺基酸：縮寫（如 白胺酸(Leu)(mg) → aa_leu）
+    - 其他：沿用原欄位名稱
+    """
+    for key, col in CORE_NUTRIENTS.items():
+        if col == column:
+            return key
+    if column in _NAMED_FIELDS:
+        return _NAMED_FIELDS[column]
+    match = re.search(r"\((\d+):(\d+)\)", column)
+    if match:
+        return f"fa_{match.group(1)}_{match.group(2)}"
+    match = re.search(r"\(([A-Z][a-z]{2})\)", column)
+    if match:
+        return f"aa_{match.group(1).lower()}"
+    return column
+
+
+def parse_fields(raw: Optional[str]) -> List[str]:
+    """解析逗號分隔的 fields 參數（去除空白與重複，保留順序）"""
+    if not raw:
+        return []
+    return list(dict.fromkeys(f.strip() for f in raw.split(",") if f.strip()))
+
+
+_PREDICATE_RE = re.compile(r"^\s*([A-Za-z0-9_]+)\s*(>=|<=|==|=|>|<)\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def parse_predicates(raw: Optional[str]) -> List[Tuple[str, str, float]]:
+    """
+    解析逗號分隔的範圍條件（如 protein>=20,sodium<=100）
+
+    Returns:
+        [(API 鍵值, 運算子, 數值)]；= 與 == 視為相同
+
+    Raises:
+        ValueError: 條件格式錯誤
+    """
+    if not raw:
+        return []
+    predicates: List[Tuple[str, str, float]] = []
+    for part in raw.split(","):
+        if not part.strip():
+            continue
+        match = _PREDICATE_RE.match(part)
+        if not match:
+            raise ValueError(f"Invalid filter: {part.strip()}")
+        key, op, value = match.groups()
+        predicates.append((key, "==" if op == "=" else op, float(value)))
+    return predicates
+
+
+def split_aliases(value: Any) -> List[str]:
+    """拆解俗名 / 內容物描述為別名列表"""
+    if value is None:
+        return []
+    text = str(value)
+    if not text or text == "nan":
+        return []
+    parts = re.split(r"[，,;/、\n\r]+", text)
+    return [p.strip().strip("\"") for p in parts if p.strip()]
+
+
+def normalize_name(text: str) -> str:
+    """名稱正規化（小寫、去括號註解、去空白與分隔符）"""
+    if not text:
+        return ""
+    text = text.lower().strip()
+    text = re.sub(r"\([^\)]*\)", "", text)
+    text = re.sub(r"[\s\-_/]+", "", text)
+    text = re.sub(r"[\[\]{}<>]", "", text)
+    return text
+
+
+# 載入後保留的文字欄位（其餘非數值欄位如 P/M/S 未被使用，載入時捨棄）
+TEXT_COLUMNS = ["整合編號", "食品分類", "樣品名稱", "內容物描述", "俗名"]
+# 重複值多的文字欄位以 category 型別儲存
+CATEGORY_COLUMNS = ["食品分類"]
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    食品資料表型別化
+
+    - 營養素（數值欄位）維持 read_csv 的型別（float64）：float32 在千位數以上
+      無法保留來源的小數 4 位，會改變顯示與加總的數值
+    - CATEGORY_COLUMNS 轉為 category
+    - 只保留 TEXT_COLUMNS 與數值欄位
+    """
+    numeric = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+    keep = [col for col in df.columns if col in numeric or col in TEXT_COLUMNS]
+    dtypes: Dict[str, Any] = {col: "category" for col in CATEGORY_COLUMNS if col in keep}
+    return df[keep].astype(dtypes)
+
+
+def _column_as_str(df: pd.DataFrame, col: str) -> List[str]:
+    if col not in df.columns:
+        return [""] * len(df)
+    return ["" if pd.isna(v) else sys.intern(str(v)) for v in df[col].tolist()]
+
+
+def catalog_texts(df: pd.DataFrame) -> Dict[str, List[Any]]:
+    """
+    資料表 → 目錄使用的文字清單
+
+    Returns:
+        food_ids / names / categories（空值為 ''）、common_names（拆解後的俗名）、
+        aliases（俗名 + 內容物描述）；字串皆經 sys.intern
+    """
+    descriptions = _column_as_str(df, "內容物描述")
+    common_names = [[sys.intern(a) for a in split_aliases(c)] for c in _column_as_str(df, "俗名")]
+    return {
+        "food_ids": _column_as_str(df, "整合編號"),
+        "names": _column_as_str(df, "樣品名稱"),
+        "categories": _column_as_str(df, "食品分類"),
+        "common_names": common_names,
+        "aliases": [c + [sys.intern(a) for a in split_aliases(d)] for c, d in zip(common_names, descriptions)],
+    }
+
+
+def normalize_texts(names: List[str], aliases: List[List[str]]) -> Tuple[List[str], List[List[str]]]:
+    """名稱與別名的正規化字串（快照建立時預先計算）"""
+    return (
+        [normalize_name(n) for n in names],
+        [[normalize_name(a) for a in row if a] for row in aliases],
+    )
+
+
+def deep_sizeof(*objs: Any, seen: Optional[Set[int]] = None) -> int:
+    """
+    物件及其內含物件的記憶體估計（位元組）
+
+    numpy 陣列以 nbytes 計；seen 內的物件（已計入其他結構的共用物件）不重複計算。
+    """
+    seen = set() if seen is None else seen
+    stack = list(objs)
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            total += item.nbytes
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+def _content_version(csv_path: str) -> str:
+    """資料內容版本：CSV 的 SHA-256 前 12 碼（只有快照時取快照記錄的雜湊）"""
+    try:
+        if os.path.exists(csv_path):
+            return file_sha256(csv_path)[:12]
+        meta = read_snapshot_meta(snapshot_path_for(csv_path))
+        if meta and meta.get("csv_sha256"):
+            return str(meta["csv_sha256"])[:12]
+    except OSError as e:
+        logger.warning(f"⚠️ 無法計算資料版本: {e}")
+    return "unknown"
+
+
+class FoodCatalog:
+    """食品資料目錄（每個程序一份）"""
+
+    def __init__(self, csv_path: Optional[str] = None) -> None:
+        self.csv_path = csv_path or default_csv_path()
+        # 資料版本（CSV 內容雜湊前 12 碼）與載入時間
+        self.version: str = ""
+        self.loaded_at: float = 0.0
+
+        # 只含文字欄位（營養素在 nutrient_matrix）
+        self.df: pd.DataFrame = pd.DataFrame()
+        self.food_ids: List[str] = []
+        self.names: List[str] = []
+        self.categories: List[str] = []
+        self.aliases: List[List[str]] = []
+        # 俗名（拆解後；aliases 另含內容物描述）
+        self.common_names: List[List[str]] = []
+        self.name_norm: List[str] = []
+        self.alias_norm: List[List[str]] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.nutrient_columns: List[str] = []
+        self.nutrient_index: Dict[str, int] = {}
+        # API 鍵值 → 矩陣欄位（fields= 投影使用）
+        self.field_index: Dict[str, int] = {}
+        self.field_columns: Dict[str, str] = {}
+        self.nutrient_matrix: np.ndarray = np.zeros((0, 0), dtype=np.float64)
+        # 原始資料為空值的位置（範圍查詢時不視為 0）
+        self.nutrient_missing: np.ndarray = np.zeros((0, 0), dtype=bool)
+        # 核心營養素在矩陣中的欄位（依 CORE_NUTRIENTS 順序，缺欄為 -1）
+        self.core_columns: np.ndarray = np.zeros(0, dtype=np.int64)
+        # 食品分類分區：分類 → 列位置集合 / 布林遮罩 / 筆數（載入時建立，唯讀）
+        self.category_sets: Dict[str, FrozenSet[int]] = {}
+        self.category_bitmaps: Dict[str, np.ndarray] = {}
+        self.category_counts: Dict[str, int] = {}
+        # 多 worker 共用資料段的唯讀陣列（未附加時為空）
+        self.shared: Dict[str, np.ndarray] = {}
+
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.food_ids)
+
+    def _load(self) -> None:
+        # 新鮮的快照：只重建文字欄位，營養素矩陣維持 mmap，正規化名稱直接沿用
+        snapshot = load_catalog_snapshot(self.csv_path)
+        try:
+            self.df = apply_schema(snapshot["text"] if snapshot else load_food_table(self.csv_path))
+            logger.info(f"✅ 食品目錄載入: {len(self.df)} 筆食物")
+        except Exception as e:
+            logger.error(f"❌ 載入營養資料庫失敗: {e}")
+            snapshot = None
+            self.df = pd.DataFrame()
+        # 快照的新鮮度檢查已比對過 CSV 雜湊，不再重新計算
+        self.version = snapshot["csv_sha256"][:12] if snapshot else _content_version(self.csv_path)
+        self.loaded_at = time.time()
+
+        df = self.df
+        texts = catalog_texts(df)
+        self.food_ids = texts["food_ids"]
+        self.names = texts["names"]
+        self.categories = texts["categories"]
+        self.common_names = texts["common_names"]
+        self.aliases = texts["aliases"]
+
+        self.id_to_row = {}
+        for pos, food_id in enumerate(self.food_ids):
+            self.id_to_row.setdefault(food_id, pos)
+
+        self.nutrient_columns = snapshot["nutrient_columns"] if snapshot else [
+            col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])
+        ]
+        self.nutrient_index = {col: i for i, col in enumerate(self.nutrient_columns)}
+        self.field_columns = {nutrient_key(col): col for col in self.nutrient_columns}
+        self.field_index = {key: self.nutrient_index[col] for key, col in self.field_columns.items()}
+
+        if not self.attach_segment():
+            if snapshot:
+                self.name_norm = snapshot["name_norm"]
+                self.alias_norm = snapshot["alias_norm"]
+                self.nutrient_matrix = snapshot["matrix"]
+                self.nutrient_missing = snapshot["missing"]
+            else:
+                self.name_norm, self.alias_norm = normalize_texts(self.names, self.aliases)
+                if self.nutrient_columns:
+                    raw = df[self.nutrient_columns].to_numpy(dtype=np.float64)
+                    self.nutrient_missing = np.isnan(raw)
+                    self.nutrient_matrix = np.nan_to_num(raw, nan=0.0, copy=False)
+                else:
+                    self.nutrient_matrix = np.zeros((len(df), 0), dtype=np.float64)
+                    self.nutrient_missing = np.zeros((len(df), 0), dtype=bool)
+        # 營養素只保留矩陣一份（附加共用資料段時為各 worker 共用的 mmap），資料表只留文字欄位
+        self.df = df[[col for col in df.columns if col not in self.nutrient_index]]
+        self.core_columns = np.array(
+            [self.nutrient_index.get(col, -1) for col in CORE_NUTRIENTS.values()], dtype=np.int64
+        )
+
+        self._build_category_partitions()
+
+    def attach_segment(self) -> bool:
+        """
+        附加多 worker 共用資料段（唯讀 mmap）
+
+        取代正規化名稱、營養素矩陣與空值遮罩；名稱對齊服務另由 shared 取得字元倒排索引。
+
+        Returns:
+            是否已附加（資料段不存在或不符時為 False，維持原資料）
+        """
+        if not len(self.df):
+            return False
+        segment = load_segment(self.csv_path, self.version, len(self.df), self.nutrient_columns)
+        if segment is None:
+            return False
+        texts = decode_texts(segment)
+        offsets = segment["record_offsets"].tolist()
+        self.name_norm = [texts[offsets[row]] for row in range(len(offsets) - 1)]
+        self.alias_norm = [texts[offsets[row] + 1:offsets[row + 1]] for row in range(len(offsets) - 1)]
+        self.nutrient_matrix = segment["matrix"]
+        self.nutrient_missing = segment["missing"]
+        self.shared = segment
+        return True
+
+    def memory_usage(self, seen: Optional[Set[int]] = None) -> Dict[str, int]:
+        """
+        各結構的記憶體（位元組，Python 物件為估計值）
+
+        共用物件（如 intern 後的名稱）只計入第一個結構，seen 記錄已計入的物件；
+        附加共用資料段時，營養素矩陣與空值遮罩計入 shared_segment（各 worker 共用）。
+        """
+        seen = set() if seen is None else seen
+        shared = {id(a) for a in self.shared.values()}
+        return {
+            "dataframe": int(self.df.memory_usage(deep=True).sum()),
+            "nutrient_matrix": 0 if id(self.nutrient_matrix) in shared else self.nutrient_matrix.nbytes,
+            "nutrient_missing": 0 if id(self.nutrient_missing) in shared else self.nutrient_missing.nbytes,
+            "names": deep_sizeof(self.food_ids, self.names, self.categories, seen=seen),
+            "aliases": deep_sizeof(self.common_names, self.aliases, seen=seen),
+            "normalized_names": deep_sizeof(self.name_norm, self.alias_norm, seen=seen),
+            "id_to_row": deep_sizeof(self.id_to_row, seen=seen),
+            "category_partitions": deep_sizeof(
+                self.category_sets, self.category_bitmaps, self.category_counts, seen=seen
+            ),
+            "shared_segment": sum(a.nbytes for a in self.shared.values()),
+        }
+
+    def _build_category_partitions(self) -> None:
+        partitions: Dict[str, List[int]] = {}
+        for row, category in enumerate(self.categories):
+            if category:
+                partitions.setdefault(category, []).append(row)
+        self.category_sets = {c: frozenset(rows) for c, rows in partitions.items()}
+        self.category_counts = {c: len(rows) for c, rows in partitions.items()}
+        self.category_bitmaps = {}
+        for category, rows in partitions.items():
+            bitmap = np.zeros(len(self), dtype=bool)
+            bitmap[rows] = True
+            self.category_bitmaps[category] = bitmap
+
+    def matching_categories(self, category: str) -> List[str]:
+        """名稱包含 category 的分類（子字串比對，只比對分類名稱）"""
+        return [c for c in self.category_sets if category in c]
+
+    def category_rows(self, category: Optional[str]) -> Optional[FrozenSet[int]]:
+        """
+        分類過濾的列位置集合（由分區聯集，不掃描整欄）
+
+        Returns:
+            未指定分類時為 None（不過濾）
+        """
+        if not category:
+            return None
+        matches = self.matching_categories(category)
+        if len(matches) == 1:
+            return self.category_sets[matches[0]]
+        return frozenset().union(*(self.category_sets[c] for c in matches))
+
+    def _make_record(self, row: int, core: List[float]) -> Dict[str, Any]:
+        return {
+            "food_id": self.food_ids[row],
+            "name": self.names[row],
+            "category": self.categories[row],
+            "per_100g": dict(zip(CORE_NUTRIENTS.keys(), [round(v, 4) for v in core])),
+        }
+
+    def row_of(self, food_id: str) -> Optional[int]:
+        """整合編號 → 列位置"""
+        if not food_id:
+            return None
+        return self.id_to_row.get(str(food_id))
+
+    def get(self, food_id: str) -> Optional[Dict[str, Any]]:
+        """整合編號 → 每 100g 營養紀錄（O(1) 查表，數值取自營養素矩陣，不另存一份）"""
+        return self.get_many([food_id])[0]
+
+    def get_many(self, food_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """批次查詢，回傳順序與輸入相同（找不到為 None）；核心營養素一次由矩陣取出"""
+        rows = self.rows_of(food_ids)
+        found = [row for row in rows if row is not None]
+        if not found:
+            return [None] * len(rows)
+        core = iter(self.core_values(self.values(found)).tolist())
+        return [None if row is None else self._make_record(row, next(core)) for row in rows]
+
+    def column(self, name: str) -> np.ndarray:
+        """取得某營養素欄位（空值為 0）"""
+        idx = self.nutrient_index.get(name)
+        if idx is None:
+            return np.zeros(len(self), dtype=np.float64)
+        return self.nutrient_matrix[:, idx]
+
+    def rows_of(self, food_ids: List[str]) -> List[Optional[int]]:
+        """批次整合編號 → 列位置（找不到為 None）"""
+        return [self.row_of(fid) for fid in food_ids]
+
+    def compute(self, food_ids: List[str], grams: List[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        依克數計算多個食物的營養素（涵蓋所有營養素欄位）
+
+        Returns:
+            (items, total)：items 為 (食物數 × 營養素) 矩陣，total 為各營養素加總
+
+        Raises:
+            KeyError: 有找不到的整合編號
+        """
+        rows = self.rows_of(food_ids)
+        missing = [fid for fid, row in zip(food_ids, rows) if row is None]
+        if missing:
+            raise KeyError(f"Food not found: {', '.join(map(str, missing))}")
+        return self.compute_rows(rows, grams)
+
+    def compute_rows(self, rows: List[int], grams: List[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """同 compute，但直接使用列位置"""
+        factors = np.asarray(grams, dtype=np.float64) / 100.0
+        items = self.values(rows) * factors[:, None]
+        return items, items.sum(axis=0)
+
+    def values(self, rows: Any) -> np.ndarray:
+        """
+        取出列的營養素數值（float64）
+
+        矩陣以 float64 儲存，值與 CSV 解析結果相同；float32 在千位數以上的值
+        無法保留小數 4 位（如鉀 2561.85 會變成 2561.8501），不能用於顯示或加總。
+        """
+        return np.asarray(self.nutrient_matrix[rows], dtype=np.float64)
+
+    def core_values(self, vectors: np.ndarray) -> np.ndarray:
+        """從營養素向量（或矩陣的每一列）取出核心營養素，缺欄為 0"""
+        vectors = np.asarray(vectors)
+        values = vectors[..., np.maximum(self.core_columns, 0)]
+        return np.where(self.core_columns >= 0, values, 0.0)
+
+    def core_dict(self, vector: np.ndarray, digits: Optional[int] = 4) -> Dict[str, float]:
+        """營養素向量 → 核心營養素 dict（API 使用的英文鍵值）"""
+        values = self.core_values(vector).tolist()
+        if digits is not None:
+            values = [round(v, digits) for v in values]
+        return dict(zip(CORE_NUTRIENTS.keys(), values))
+
+    def resolve_fields(self, fields: List[str]) -> List[str]:
+        """
+        驗證 fields 投影
+
+        Raises:
+            ValueError: 有不存在的欄位
+        """
+        unknown = [f for f in fields if f not in self.field_index]
+        if unknown:
+            raise ValueError(f"Unknown nutrient fields: {', '.join(unknown)}")
+        return fields
+
+    def project(self, vectors: np.ndarray, fields: List[str], digits: Optional[int] = 4) -> List[Dict[str, float]]:
+        """
+        只取出指定營養素欄位
+
+        Args:
+            vectors: 營養素矩陣（每列一筆）
+            fields: API 鍵值（需先經 resolve_fields 驗證）
+        """
+        if not fields:
+            return [{} for _ in range(len(vectors))]
+        values = np.asarray(vectors)[:, [self.field_index[f] for f in fields]].tolist()
+        if digits is not None:
+            values = [[round(v, digits) for v in row] for row in values]
+        return [dict(zip(fields, row)) for row in values]
+
+    def field_values(self, key: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        整欄取出某營養素（API 鍵值）
+
+        Returns:
+            (values, missing)：values 為 float64（與 values() 相同精度），missing 為原始空值遮罩
+        """
+        idx = self.field_index[key]
+        values = np.asarray(self.nutrient_matrix[:, idx], dtype=np.float64)
+        return values, self.nutrient_missing[:, idx]
+
+    def category_mask(self, category: Optional[str]) -> np.ndarray:
+        """食品分類包含 category 的列（與搜尋的分類過濾相同，為子字串比對）"""
+        mask = np.zeros(len(self), dtype=bool) if category else np.ones(len(self), dtype=bool)
+        if category:
+            for match in self.matching_categories(category):
+                mask |= self.category_bitmaps[match]
+        return mask
+
+    def predicate_mask(self, predicates: List[Tuple[str, str, float]]) -> np.ndarray:
+        """符合所有範圍條件的列（原始為空值的列不符合）"""
+        mask = np.ones(len(self), dtype=bool)
+        for key, op, threshold in predicates:
+            values, missing = self.field_values(key)
+            mask &= _COMPARATORS[op](values, threshold) & ~missing
+        return mask
+
+    def query_rows(
+        self,
+        predicates: List[Tuple[str, str, float]],
+        category: Optional[str] = None,
+        sort: Optional[List[str]] = None,
+        descending: bool = True,
+        limit: int = 20,
+    ) -> Tuple[int, List[int]]:
+        """
+        營養素範圍查詢（向量化布林遮罩）
+
+        Args:
+            predicates: parse_predicates 的結果（鍵值需已驗證）；原始為空值的列不符合條件
+            category: 限定食品分類（子字串比對）
+            sort: 排序鍵；一個鍵依數值排序，兩個鍵 [a, b] 依 a / b 密度排序（b ≤ 0 或空值排最後）
+            descending: 是否由大到小
+            limit: 回傳筆數上限
+
+        Returns:
+            (符合條件總數, 前 limit 筆列位置)；同值依原始資料順序
+        """
+        rows = np.flatnonzero(self.category_mask(category) & self.predicate_mask(predicates))
+        total = len(rows)
+        if not sort or total == 0:
+            return total, rows[:limit].tolist()
+
+        values, missing = self.field_values(sort[0])
+        sort_key = values[rows]
+        invalid = missing[rows]
+        if len(sort) > 1:
+            denom, denom_missing = self.field_values(sort[1])
+            denom = denom[rows]
+            invalid = invalid | denom_missing[rows] | (denom <= 0)
+            sort_key = np.divide(sort_key, denom, out=np.zeros_like(sort_key), where=~invalid)
+        if descending:
+            sort_key = -sort_key
+        # 無法排序的列一律排最後
+        sort_key = np.where(invalid, np.inf, sort_key)
+
+        # top-k：argpartition 找出第 k 名的值，取所有不大於它的列後再穩定排序
+        if limit < total:
+            kth = np.partition(sort_key, limit - 1)[limit - 1]
+            candidates = np.flatnonzero(sort_key <= kth)
+        else:
+            candidates = np.arange(total)
+        order = candidates[np.lexsort((rows[candidates], sort_key[candidates]))][:limit]
+        return total, rows[order].tolist()
+
+    def core_nutrients(self, row: int) -> Dict[str, float]:
+        """單列的核心營養素（每 100g）；資料來源精度為小數 4 位"""
+        return self.core_dict(self.values(row), digits=4)
+
+
+_COMPARATORS = {
+    ">=": np.greater_equal,
+    "<=": np.less_equal,
+    ">": np.greater,
+    "<": np.less,
+    "==": np.equal,
+}
+
+
+# 全域單例（延遲初始化）
+_food_catalog: Optional[FoodCatalog] = None
+
+
+def get_food_catalog() -> FoodCatalog:
+    """取得食品目錄單例"""
+    global _food_catalog
+    if _food_catalog is None:
+        _food_catalog = FoodCatalog()
+    return _food_catalog
+
+
+def set_food_catalog(catalog: FoodCatalog) -> None:
+    """替換共用食品目錄（熱更新用；已取得舊目錄的呼叫端不受影響）"""
+    global _food_catalog
+    _food_catalog = catalog
@@ -0,0 +1,193 @@
+"""
+Food Database Hot Reload
+========================
+不重啟 worker 即可更新食品資料庫。
+
+- 在呼叫端執行緒（管理端點的 threadpool 或檔案監看執行緒）建立新的食品目錄，
+  並預先建好營養查詢、名稱對齊、替代建議的索引；期間請求繼續由舊版本服務
+- 全部就緒後才替換各模組的單例參考（每個參考的替換皆為單一賦值）
+- 已取得舊服務參考的請求持有舊目錄，會在舊版本上完成；之後的請求取得新版本
+- 新資料載入失敗或為空時保留舊版本
+- 檔案監看：定期比對 CSV 的修改時間與大小，變更且連續兩次檢查不再變動
+  （檔案已寫完）時自動重新載入；更新資料檔建議先寫暫存檔再 rename 取代
+
+範圍：每次重新載入只替換「執行它的 worker 程序」的服務。
+多 worker 部署時，其他 worker 由各自的檔案監看偵測 CSV 變更後重新載入；
+第一個重新載入的 worker 會發布共用資料段，其餘 worker 載入時直接附加，不再重建。
+未啟用檔案監看時，其他 worker 要到重啟才會更新。
+
+使用方式：
+    POST /api/v1/nutrition/admin/reload（需 X-Admin-Token；只重新載入處理該請求的 worker）
+    設定 FOOD_DB_WATCH_INTERVAL_SECONDS > 0 啟用檔案監看（多 worker 部署請啟用）
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.services.food_alignment_service import FoodAlignmentService, set_food_alignment_service
+from app.services.food_catalog import FoodCatalog, get_food_catalog, set_food_catalog
+from app.services.food_substitution_service import (
+    FoodSubstitutionService,
+    set_food_substitution_service,
+)
+from app.services.nutrition_db_service import get_nutrition_service, set_nutrition_service
+from app.services.shared_catalog import ensure_segment
+
+logger = logging.getLogger(__name__)
+
+# 同一時間只允許一個重新載入（建立中的版本不會互相覆蓋）
+_reload_lock = threading.Lock()
+
+
+def reload_food_database(csv_path: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+    """
+    重新載入食品資料庫並替換本 worker 程序的所有服務（不影響其他 worker）
+
+    Args:
+        csv_path: 資料檔；未指定時沿用目前目錄的路徑
+        force: 內容版本相同時仍重建
+
+    Returns:
+        {previous_version, version, changed, total_foods, elapsed_ms,
+         scope（固定為 "worker"）, worker_pid, shared_segment（新目錄是否使用共用資料段）}
+
+    Raises:
+        ValueError: 新資料載入失敗或沒有任何食物（舊版本保留）
+    """
+    with _reload_lock:
+        started = time.perf_counter()
+        current = get_food_catalog()
+        catalog = FoodCatalog(csv_path or current.csv_path)
+        if len(catalog) == 0:
+            raise ValueError(f"食品資料庫載入失敗或為空，保留版本 {current.version}")
+
+        result = {
+            'previous_version': current.version,
+            'version': catalog.version,
+            'changed': catalog.version != current.version,
+            'total_foods': len(catalog),
+            'scope': 'worker',
+            'worker_pid': os.getpid(),
+        }
+        if not result['changed'] and not force:
+            result['shared_segment'] = bool(current.shared)
+            result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            logger.info(f"ℹ️ 食品資料庫內容未變更（版本 {catalog.version}），略過替換")
+            return result
+
+        # 先建好所有索引，再替換參考；同時發布共用資料段，其他 worker 重新載入時直接附加
+        result['shared_segment'] = ensure_segment(catalog)
+        nutrition = get_nutrition_service().with_catalog(catalog)
+        alignment = FoodAlignmentService(catalog=catalog)
+        alignment._build_index()
+        substitution = FoodSubstitutionService(catalog=catalog)
+        _ = substitution.features
+
+        set_food_catalog(catalog)
+        set_nutrition_service(nutrition)
+        set_food_alignment_service(alignment)
+        set_food_substitution_service(substitution)
+
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(
+            f"🔄 食品資料庫已熱更新: {result['previous_version']} → {catalog.version}"
+            f"（{len(catalog)} 筆，{result['elapsed_ms']}ms，worker {result['worker_pid']}）"
+        )
+        return result
+
+
+def current_version() -> str:
+    """目前服務中的食品資料版本"""
+    return get_nutrition_service().catalog.version
+
+
+class FoodDatabaseWatcher:
+    """定期檢查 CSV 是否變更，變更時在監看執行緒中重新載入"""
+
+    def __init__(self, csv_path: Optional[str] = None, interval: float = 5.0) -> None:
+        self.csv_path = csv_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._pending: Optional[Tuple[int, int]] = None
+        self.reloads = 0
+
+    def _path(self) -> str:
+        return self.csv_path or get_food_catalog().csv_path
+
+    def _read_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self._path())
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def check(self) -> Optional[Dict[str, Any]]:
+        """檢查一次；檔案變更且已穩定時重新載入並回傳結果"""
+        signature = self._read_signature()
+        if signature is None or signature == self._signature:
+            self._pending = None
+            return None
+        if signature != self._pending:
+            # 可能仍在寫入：下一次檢查時間與大小不變才載入
+            self._pending = signature
+            return None
+        self._signature = signature
+        self._pending = None
+        try:
+            result = reload_food_database(self.csv_path)
+        except Exception as e:
+            logger.error(f"❌ 食品資料庫熱更新失敗（保留舊版本）: {e}")
+            return None
+        if result['changed']:
+            self.reloads += 1
+        return result
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        # 以啟動當下的檔案狀態為基準，之後的變更才觸發
+        self._signature = self._read_signature()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="food-db-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"👀 食品資料庫檔案監看已啟動（每 {self.interval:g} 秒）: {self._path()}")
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.interval + 1)
+        self._thread = None
+
+
+# 全域單例（啟用檔案監看時建立）
+_watcher: Optional[FoodDatabaseWatcher] = None
+
+
+def start_food_db_watcher(interval: float, csv_path: Optional[str] = None) -> Optional[FoodDatabaseWatcher]:
+    """啟動檔案監看（interval <= 0 時不啟動）"""
+    global _watcher
+    if interval <= 0:
+        return None
+    if _watcher is None:
+        _watcher = FoodDatabaseWatcher(csv_path, interval)
+        _watcher.start()
+    return _watcher
+
+
+def stop_food_db_watcher() -> None:
+    global _watcher
+    if _watcher is not None:
+        _watcher.stop()
+        _watcher = None
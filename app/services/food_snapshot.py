@@ -0,0 +1,272 @@
+"""
+Food Database Binary Snapshot
+=============================
+將食品營養成分 CSV 編譯為版本化的二進位快照，加速冷啟動。
+
+快照格式（目錄）：
+- meta.json        版本、CSV 內容雜湊、欄位清單與型別
+- matrix.npy       數值欄位（列 × 欄，float64，空值補 0；即食品目錄的營養素矩陣，可 mmap）
+- missing.npy      數值欄位原始為空值的位置（列 × 欄，bool，可 mmap）
+- codes.npy        字串欄位的字串表索引（欄 × 列，int32，-1 表示空值，可 mmap）
+- strings.json     每個字串欄位的字串表
+- normalized.json  正規化名稱與別名（食品目錄直接使用，不再逐一正規化）
+
+使用方式：
+    python -m app.services.food_snapshot            # 編譯預設 CSV
+    python -m app.services.food_snapshot <csv_path> # 編譯指定 CSV
+
+載入時會比對 CSV 的 SHA-256，快照不存在、版本不符或內容過期時自動退回 pd.read_csv。
+食品目錄以 load_catalog_snapshot() 載入：營養素矩陣與空值遮罩維持唯讀 mmap（不複製），
+只重建文字欄位。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 格式或名稱正規化規則變更時遞增，使舊快照失效
+SNAPSHOT_VERSION = 2
+SNAPSHOT_SUFFIX = ".snapshot"
+
+_META_FILE = "meta.json"
+_MATRIX_FILE = "matrix.npy"
+_MISSING_FILE = "missing.npy"
+_CODES_FILE = "codes.npy"
+_STRINGS_FILE = "strings.json"
+_NORMALIZED_FILE = "normalized.json"
+
+
+def default_csv_path() -> str:
+    """預設 CSV 路徑（與各服務相同的搜尋順序）"""
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    csv_path = os.path.join(base_dir, "食品營養成分資料庫2024UPDATE2_clean.csv")
+    if not os.path.exists(csv_path):
+        csv_path = "食品營養成分資料庫2024UPDATE2_clean.csv"
+    return csv_path
+
+
+def snapshot_path_for(csv_path: str) -> str:
+    """CSV 對應的快照目錄路徑"""
+    root, _ = os.path.splitext(csv_path)
+    return root + SNAPSHOT_SUFFIX
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_snapshot(csv_path: str, snapshot_path: Optional[str] = None) -> str:
+    """
+    將 CSV 編譯為二進位快照
+
+    先寫入暫存目錄再整個換名，避免其他程序讀到寫一半的快照。
+
+    Returns:
+        快照目錄路徑
+    """
+    from app.services.food_catalog import apply_schema, catalog_texts, normalize_texts
+
+    snapshot_path = snapshot_path or snapshot_path_for(csv_path)
+    df = pd.read_csv(csv_path, encoding="utf-8")
+    texts = catalog_texts(apply_schema(df))
+    name_norm, alias_norm = normalize_texts(texts["names"], texts["aliases"])
+
+    columns: List[Dict[str, Any]] = []
+    numeric_arrays: List[np.ndarray] = []
+    code_arrays: List[np.ndarray] = []
+    string_tables: List[List[str]] = []
+
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_numeric_dtype(series):
+            columns.append({"name": name, "kind": "numeric", "dtype": str(series.dtype), "index": len(numeric_arrays)})
+            numeric_arrays.append(series.to_numpy(dtype=np.float64, na_value=np.nan))
+        else:
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            columns.append({"name": name, "kind": "string", "index": len(code_arrays)})
+            code_arrays.append(codes.astype(np.int32))
+            string_tables.append([str(u) for u in uniques])
+
+    rows = len(df)
+    numeric = np.column_stack(numeric_arrays) if numeric_arrays else np.empty((rows, 0), dtype=np.float64)
+    codes = np.vstack(code_arrays) if code_arrays else np.empty((0, rows), dtype=np.int32)
+
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "csv_sha256": file_sha256(csv_path),
+        "rows": rows,
+        "columns": columns,
+    }
+
+    parent = os.path.dirname(os.path.abspath(snapshot_path))
+    tmp_dir = tempfile.mkdtemp(prefix=".snapshot-", dir=parent)
+    try:
+        os.chmod(tmp_dir, 0o755)
+        np.save(os.path.join(tmp_dir, _MATRIX_FILE), np.ascontiguousarray(np.nan_to_num(numeric, nan=0.0)))
+        np.save(os.path.join(tmp_dir, _MISSING_FILE), np.ascontiguousarray(np.isnan(numeric)))
+        np.save(os.path.join(tmp_dir, _CODES_FILE), np.ascontiguousarray(codes))
+        with open(os.path.join(tmp_dir, _STRINGS_FILE), "w", encoding="utf-8") as f:
+            json.dump(string_tables, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, _NORMALIZED_FILE), "w", encoding="utf-8") as f:
+            json.dump({"name_norm": name_norm, "alias_norm": alias_norm}, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, _META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        if os.path.isdir(snapshot_path):
+            shutil.rmtree(snapshot_path)
+        os.replace(tmp_dir, snapshot_path)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"✅ 快照建立完成: {snapshot_path} ({rows} 筆, {len(columns)} 欄)")
+    return snapshot_path
+
+
+def read_snapshot_meta(snapshot_path: str) -> Optional[Dict[str, Any]]:
+    meta_file = os.path.join(snapshot_path, _META_FILE)
+    if not os.path.exists(meta_file):
+        return None
+    try:
+        with open(meta_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"⚠️ 快照 meta 讀取失敗: {e}")
+        return None
+
+
+def is_snapshot_fresh(csv_path: str, snapshot_path: Optional[str] = None) -> bool:
+    """快照是否存在、版本相符，且與 CSV 內容雜湊一致"""
+    snapshot_path = snapshot_path or snapshot_path_for(csv_path)
+    meta = read_snapshot_meta(snapshot_path)
+    if meta is None or meta.get("version") != SNAPSHOT_VERSION:
+        return False
+    if not os.path.exists(csv_path):
+        # 部署時可能只帶快照、不帶 CSV
+        return True
+    return meta.get("csv_sha256") == file_sha256(csv_path)
+
+
+def _open_array(snapshot_path: str, filename: str) -> np.ndarray:
+    """唯讀 mmap 陣列；np.asarray 取得一般 ndarray 檢視（仍指向 mmap，不複製）"""
+    return np.asarray(np.load(os.path.join(snapshot_path, filename), mmap_mode="r"))
+
+
+def _string_frame(snapshot_path: str, meta: Dict[str, Any]) -> pd.DataFrame:
+    """由字串表重建所有字串欄位"""
+    codes = _open_array(snapshot_path, _CODES_FILE)
+    with open(os.path.join(snapshot_path, _STRINGS_FILE), "r", encoding="utf-8") as f:
+        string_tables = json.load(f)
+    frame = pd.DataFrame(index=pd.RangeIndex(meta["rows"]))
+    for col in meta["columns"]:
+        if col["kind"] == "string":
+            table = np.array(string_tables[col["index"]] + [np.nan], dtype=object)
+            frame[col["name"]] = table[codes[col["index"]]]
+    return frame
+
+
+def load_snapshot(snapshot_path: str) -> pd.DataFrame:
+    """從快照重建與 pd.read_csv 相同的 DataFrame（數值欄位會複製出 mmap）"""
+    meta = read_snapshot_meta(snapshot_path)
+    if meta is None:
+        raise FileNotFoundError(snapshot_path)
+
+    matrix = _open_array(snapshot_path, _MATRIX_FILE)
+    missing = _open_array(snapshot_path, _MISSING_FILE)
+
+    # 數值欄位一次建立為單一區塊，避免逐欄建構；空值位置還原為 NaN
+    numeric_cols = [c for c in meta["columns"] if c["kind"] == "numeric"]
+    frame = pd.DataFrame(
+        np.where(missing, np.nan, matrix)[:, [c["index"] for c in numeric_cols]],
+        columns=[c["name"] for c in numeric_cols],
+    )
+    for col in numeric_cols:
+        dtype = col.get("dtype", "float64")
+        if dtype != "float64" and not frame[col["name"]].isna().any():
+            frame[col["name"]] = frame[col["name"]].astype(dtype)
+
+    strings = _string_frame(snapshot_path, meta)
+    for name in strings.columns:
+        frame[name] = strings[name]
+
+    return frame[[c["name"] for c in meta["columns"]]]
+
+
+def load_catalog_snapshot(csv_path: str, snapshot_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    食品目錄由快照載入（快照過期或不可用時回傳 None，由呼叫端改讀 CSV）
+
+    Returns:
+        - text: 字串欄位的 DataFrame（不含數值欄位）
+        - nutrient_columns: 數值欄位名稱（依 CSV 順序，即矩陣欄位順序）
+        - matrix / missing: 營養素矩陣與空值遮罩（唯讀 mmap，不複製）
+        - name_norm / alias_norm: 正規化名稱與別名
+        - csv_sha256: 快照對應的 CSV 內容雜湊
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(csv_path)
+    if not is_snapshot_fresh(csv_path, snapshot_path):
+        if os.path.isdir(snapshot_path):
+            logger.warning("⚠️ 快照已過期或版本不符，改讀 CSV；請重新執行 python -m app.services.food_snapshot")
+        return None
+    try:
+        meta = read_snapshot_meta(snapshot_path)
+        with open(os.path.join(snapshot_path, _NORMALIZED_FILE), "r", encoding="utf-8") as f:
+            normalized = json.load(f)
+        numeric_cols = sorted((c for c in meta["columns"] if c["kind"] == "numeric"), key=lambda c: c["index"])
+        snapshot = {
+            "text": _string_frame(snapshot_path, meta),
+            "nutrient_columns": [c["name"] for c in numeric_cols],
+            "matrix": _open_array(snapshot_path, _MATRIX_FILE),
+            "missing": _open_array(snapshot_path, _MISSING_FILE),
+            "name_norm": normalized["name_norm"],
+            "alias_norm": normalized["alias_norm"],
+            "csv_sha256": meta["csv_sha256"],
+        }
+    except Exception as e:
+        logger.warning(f"⚠️ 快照載入失敗，改讀 CSV: {e}")
+        return None
+    logger.info(f"✅ 由快照載入食品目錄: {meta['rows']} 筆（營養素矩陣以 mmap 附加）")
+    return snapshot
+
+
+def load_food_table(csv_path: str, snapshot_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    載入食品資料表：優先使用新鮮的快照，否則退回 CSV
+
+    Raises:
+        與 pd.read_csv 相同（CSV 與快照皆不可用時）
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(csv_path)
+    if is_snapshot_fresh(csv_path, snapshot_path):
+        try:
+            df = load_snapshot(snapshot_path)
+            logger.info(f"✅ 由快照載入營養資料庫: {len(df)} 筆")
+            return df
+        except Exception as e:
+            logger.warning(f"⚠️ 快照載入失敗，改讀 CSV: {e}")
+    elif os.path.isdir(snapshot_path):
+        logger.warning("⚠️ 快照已過期（CSV 內容已變更），改讀 CSV；請重新執行 python -m app.services.food_snapshot")
+
+    return pd.read_csv(csv_path, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    target = sys.argv[1] if len(sys.argv) > 1 else default_csv_path()
+    print(build_snapshot(target))
@@ -0,0 +1,148 @@
+"""
+Food Substitution Service
+=========================
+「換成相似但鈉 / 鉀較低的食物」：在標準化營養素空間中找最近鄰。
+
+- 特徵：核心營養素（熱量、三大營養素、纖維、鈉、鉀），先取 log1p 壓縮長尾
+  （如鹽、醬油的鈉），再做 z-score，避免單一營養素主導距離
+- 標準化矩陣在載入時預先算好（foods × features，float32）
+- 查詢時先以條件遮罩篩掉不合格的列，再對剩餘列一次算出歐氏距離，
+  以 partition 取前 k 名
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.services.food_catalog import CORE_NUTRIENTS, FoodCatalog, get_food_catalog, parse_predicates
+
+logger = logging.getLogger(__name__)
+
+
+class FoodSubstitutionService:
+    """食物替代建議（營養素向量最近鄰）"""
+
+    FEATURES = list(CORE_NUTRIENTS.keys())
+
+    def __init__(self, catalog: Optional[FoodCatalog] = None) -> None:
+        self._catalog = catalog
+        self._features: Optional[np.ndarray] = None
+
+    @property
+    def catalog(self) -> FoodCatalog:
+        if self._catalog is None:
+            self._catalog = get_food_catalog()
+        return self._catalog
+
+    @property
+    def features(self) -> np.ndarray:
+        """標準化營養素矩陣（延遲建立）"""
+        if self._features is None:
+            self._build_features()
+        return self._features
+
+    def _build_features(self) -> None:
+        catalog = self.catalog
+        columns = [catalog.field_index[k] for k in self.FEATURES if k in catalog.field_index]
+        raw = np.log1p(np.maximum(catalog.nutrient_matrix[:, columns].astype(np.float64), 0.0))
+        if len(raw):
+            std = raw.std(axis=0)
+            std[std == 0] = 1.0
+            raw = (raw - raw.mean(axis=0)) / std
+        self._features = raw.astype(np.float32)
+        logger.info(f"✅ 替代建議特徵矩陣建立完成: {self._features.shape[0]} 筆 × {self._features.shape[1]} 維")
+
+    def substitutes(
+        self,
+        food_id: str,
+        k: int = 5,
+        lower: Optional[List[str]] = None,
+        filters: Optional[str] = None,
+        category: Optional[str] = None,
+        same_category: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        找出營養組成最接近的 k 個食物
+
+        Args:
+            food_id: 原食物整合編號
+            k: 回傳筆數
+            lower: 必須嚴格低於原食物的營養素（API 鍵值，如 sodium、potassium）；
+                   原始資料為空值的食物無法確認，不列入
+            filters: 額外範圍條件（同 /nutrition/query，如 sodium<=100）
+            category: 限定食品分類（子字串比對）
+            same_category: 限定與原食物同分類
+
+        Returns:
+            {'food': 原食物, 'results': [...]}；找不到原食物時為 None
+
+        Raises:
+            ValueError: lower / filters 的欄位或格式不合法
+        """
+        catalog = self.catalog
+        lower = list(lower or [])
+        predicates = parse_predicates(filters)
+        catalog.resolve_fields(lower + [key for key, _, _ in predicates])
+
+        source = catalog.row_of(food_id)
+        if source is None:
+            return None
+
+        features = self.features
+        if same_category:
+            category = catalog.categories[source]
+        mask = catalog.category_mask(category) & catalog.predicate_mask(predicates)
+        mask[source] = False
+        for key in lower:
+            values, missing = catalog.field_values(key)
+            mask &= (values < values[source]) & ~missing
+
+        rows = np.flatnonzero(mask)
+        results: List[Dict[str, Any]] = []
+        if len(rows):
+            diff = features[rows] - features[source]
+            distances = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+            if k < len(rows):
+                kth = np.partition(distances, k - 1)[k - 1]
+                candidates = np.flatnonzero(distances <= kth)
+            else:
+                candidates = np.arange(len(rows))
+            order = candidates[np.lexsort((rows[candidates], distances[candidates]))][:k]
+            for i in order.tolist():
+                results.append(self._describe(int(rows[i]), float(distances[i])))
+
+        return {
+            "food": self._describe(source, 0.0),
+            "results": results,
+        }
+
+    def _describe(self, row: int, distance: float) -> Dict[str, Any]:
+        catalog = self.catalog
+        return {
+            "food_id": catalog.food_ids[row],
+            "name": catalog.names[row],
+            "category": catalog.categories[row],
+            "distance": round(distance, 4),
+            "per_100g": catalog.core_nutrients(row),
+        }
+
+
+# 全域單例（延遲初始化）
+_food_substitution_service: Optional[FoodSubstitutionService] = None
+
+
+def get_food_substitution_service() -> FoodSubstitutionService:
+    """取得食物替代建議服務單例"""
+    global _food_substitution_service
+    if _food_substitution_service is None:
+        _food_substitution_service = FoodSubstitutionService()
+    return _food_substitution_service
+
+
+def set_food_substitution_service(service: FoodSubstitutionService) -> None:
+    """替換食物替代建議服務單例（熱更新用）"""
+    global _food_substitution_service
+    _food_substitution_service = service
@@ -13,13 +13,28 @@ Taiwan Food Nutrition Database Service (Phase 1 MVP)
 - 查詢響應時間 < 100ms
 """
 
+import numpy as np
 import pandas as pd
-import os
-from typing import Optional, List, Dict, Any
-from functools import lru_cache
+from bisect import bisect_left
+from typing import AbstractSet, Optional, List, Dict, Any, Set, Iterable, Tuple
 import re
+import threading
+import time
 import logging
 
+from app.core.config import settings
+from app.services.food_catalog import (
+    CORE_NUTRIENTS,
+    FoodCatalog,
+    deep_sizeof,
+    get_food_catalog,
+    normalize_name,
+    parse_fields,
+    parse_predicates,
+)
+from app.services.query_cache import QueryCache
+from app.services.query_metrics import SearchMetrics, prometheus_counter
+
 logger = logging.getLogger(__name__)
 
 
@@ -70,73 +85,241 @@ class NutritionDBService:
         '奇異果': ['奇異果', '獼猴桃'],
     }
     
-    def __init__(self, csv_path: Optional[str] = None):
-        """初始化服務"""
-        if csv_path is None:
-            # 預設路徑 - 支援多種執行環境
-            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-            csv_path = os.path.join(base_dir, '食品營養成分資料庫2024UPDATE2_clean.csv')
-            
-            # 如果預設路徑不存在，嘗試從工作目錄找
-            if not os.path.exists(csv_path):
-                csv_path = '食品營養成分資料庫2024UPDATE2_clean.csv'
-        
+    def __init__(self, csv_path: Optional[str] = None, catalog: Optional[FoodCatalog] = None):
+        """
+        初始化服務
+
+        Args:
+            csv_path: 指定資料檔（測試用）；未指定時使用程序共用的食品目錄
+            catalog: 直接注入食品目錄
+        """
         self.csv_path = csv_path
-        self._df: Optional[pd.DataFrame] = None
+        self._catalog = catalog
         self._simplified_df: Optional[pd.DataFrame] = None
-        self._search_stats = {
-            'total_queries': 0,
-            'successful_matches': 0,
-            'failed_matches': 0,
-        }
+        # 建立精簡視圖與索引時持有；_simplified_df 在全部索引完成後才指定（代表已就緒）
+        self._index_lock = threading.Lock()
+        # 名稱倒排索引（載入時建立，查詢改為集合運算）
+        self._exact_index: Dict[str, List[int]] = {}
+        self._char_index: Dict[str, Set[int]] = {}
+        self._bigram_index: Dict[str, Set[int]] = {}
+        self._names: List[str] = []
+        self._alias_lookup: Dict[str, List[str]] = {}
+        # 自動完成：正規化鍵值排序後的前綴陣列（名稱、俗名、別名表）
+        self._prefix_keys: List[str] = []
+        self._prefix_texts: List[str] = []
+        self._prefix_kinds: List[str] = []
+        self._prefix_rows: np.ndarray = np.zeros(0, dtype=np.int64)
+        self._prefix_rank: np.ndarray = np.zeros(0, dtype=np.int64)
+        # 排序搜尋：正規化名稱（numpy 字串陣列，向量化比對）與長度
+        self._name_norm_array: np.ndarray = np.zeros(0, dtype=str)
+        self._name_norm_len: np.ndarray = np.zeros(0, dtype=np.int64)
+        # 查詢數與各匹配階段延遲（執行緒分片計數，熱路徑不上鎖）
+        self._metrics = SearchMetrics()
+        # 記憶體報告（目錄與索引建立後不再變動，計算一次）
+        self._memory_report: Optional[Dict[str, Any]] = None
+        # 格式化後的 search / calculate 結果（目錄重新載入時清空）
+        self._cache = QueryCache(
+            maxsize=settings.NUTRITION_CACHE_SIZE,
+            ttl=settings.NUTRITION_CACHE_TTL_SECONDS,
+        )
+    
+    @property
+    def catalog(self) -> FoodCatalog:
+        """延遲取得食品目錄（預設與其他服務共用）"""
+        if self._catalog is None:
+            self._catalog = FoodCatalog(self.csv_path) if self.csv_path else get_food_catalog()
+        return self._catalog
     
     @property
     def df(self) -> pd.DataFrame:
-        """延遲載入完整資料"""
-        if self._df is None:
-            self._load_data()
-        return self._df
+        """完整資料（由食品目錄持有）"""
+        return self.catalog.df
     
     @property
     def simplified_df(self) -> pd.DataFrame:
-        """精簡版資料（只有核心欄位）"""
-        if self._simplified_df is None:
-            self._create_simplified_view()
-        return self._simplified_df
-    
-    def _load_data(self):
-        """載入 CSV 資料"""
-        try:
-            self._df = pd.read_csv(self.csv_path, encoding='utf-8')
-            logger.info(f"✅ 載入營養資料庫: {len(self._df)} 筆食物")
-        except Exception as e:
-            logger.error(f"❌ 載入營養資料庫失敗: {e}")
-            self._df = pd.DataFrame()
+        """精簡版資料（只有核心欄位）；首次存取時建立，並確保名稱索引已完成"""
+        view = self._simplified_df
+        if view is None:
+            with self._index_lock:
+                if self._simplified_df is None:
+                    self._create_simplified_view()
+                view = self._simplified_df
+        return view
     
     def _create_simplified_view(self):
-        """建立精簡視圖（只保留核心欄位）"""
-        available_cols = [col for col in self.CORE_FIELDS.keys() if col in self.df.columns]
-        self._simplified_df = self.df[available_cols].copy()
-        
-        # 重新命名為英文（方便 API 使用）
-        rename_map = {k: v for k, v in self.CORE_FIELDS.items() if k in available_cols}
-        self._simplified_df = self._simplified_df.rename(columns=rename_map)
-        
-        # 清理數值欄位（處理空值）
-        numeric_cols = ['calories', 'protein', 'carbs', 'fat', 'sodium', 'fiber', 'potassium']
-        for col in numeric_cols:
-            if col in self._simplified_df.columns:
-                self._simplified_df[col] = pd.to_numeric(
-                    self._simplified_df[col], errors='coerce'
-                ).fillna(0)
+        """
+        建立精簡視圖（只保留核心欄位，數值取自目錄的營養素矩陣）與名稱索引
+
+        呼叫端須持有 _index_lock。背景預熱與請求可能同時觸發建立，
+        視圖在所有索引建立完成後才指定給 _simplified_df，
+        其他執行緒不會看到半成品的索引。
+        """
+        catalog = self.catalog
+        df = catalog.df
+        available_cols = [
+            col for col in self.CORE_FIELDS.keys() if col in catalog.nutrient_index or col in df.columns
+        ]
         
-        logger.info(f"✅ 精簡視圖建立完成: {len(self._simplified_df)} 筆, {len(available_cols)} 欄")
+        # 重新命名為英文（方便 API 使用）；數值欄位取自營養素矩陣（已補 0），目錄資料表只有文字欄位
+        view = pd.DataFrame(index=df.index)
+        for col in available_cols:
+            key = self.CORE_FIELDS[col]
+            if col in catalog.nutrient_index:
+                view[key] = catalog.column(col)
+            else:
+                view[key] = df[col]
+
+        self._build_search_index()
+
+        self._simplified_df = view
+        logger.info(f"✅ 精簡視圖建立完成: {len(view)} 筆, {len(available_cols)} 欄")
+
+    def _build_search_index(self):
+        """
+        建立名稱的字元 n-gram 倒排索引
+
+        - 精確索引：名稱 → 列位置
+        - 單字元 / 雙字元索引：n-gram → 列位置集合
+        - 別名查表：任一別名 → 展開後的別名列表
+
+        子字串查詢改為 posting list 交集後再驗證，不再對整欄做 str.contains。
+        """
+        self._exact_index = {}
+        self._char_index = {}
+        self._bigram_index = {}
+        # 名稱字串直接沿用目錄持有的列表（空值為 ''）
+        self._names = self.catalog.names
+
+        for pos, name in enumerate(self._names):
+            if not name:
+                continue
+            self._exact_index.setdefault(name, []).append(pos)
+            for ch in set(name):
+                self._char_index.setdefault(ch, set()).add(pos)
+            for i in range(len(name) - 1):
+                self._bigram_index.setdefault(name[i:i+2], set()).add(pos)
+
+        self._alias_lookup = {}
+        for canonical, alias_list in self.FOOD_ALIASES.items():
+            for term in [canonical] + alias_list:
+                # 與原本線性掃描一致：第一個命中的別名群組優先
+                self._alias_lookup.setdefault(term, [canonical] + alias_list)
+
+        logger.info(
+            f"✅ 名稱索引建立完成: {len(self._char_index)} 單字元, {len(self._bigram_index)} 雙字元"
+        )
+
+        self._build_prefix_index()
+
+        self._name_norm_array = np.array(self.catalog.name_norm, dtype=str)
+        self._name_norm_len = np.char.str_len(self._name_norm_array).astype(np.int64)
+
+    # 自動完成來源的排序優先序（同長度時）
+    _PREFIX_KIND_ORDER = {'name': 0, 'common_name': 1, 'alias': 2}
+
+    def _build_prefix_index(self):
+        """
+        建立自動完成的排序前綴陣列
+
+        每個候選為 (正規化鍵值, 顯示文字, 來源, 列位置)，依鍵值排序後，
+        前綴查詢只需兩次二分搜尋取得區間；區間內依預先算好的排名
+        （鍵值長度 → 來源 → 顯示文字長度 → 原始資料順序）取前幾名。
+        """
+        catalog = self.catalog
+        entries = []
+        for row, name in enumerate(self._names):
+            if name and catalog.name_norm[row]:
+                entries.append((catalog.name_norm[row], name, 'name', row))
+        for row, common_names in enumerate(catalog.common_names):
+            for common in common_names:
+                key = normalize_name(common)
+                if key:
+                    entries.append((key, common, 'common_name', row))
+        for term in self._alias_lookup:
+            rows = self._alias_rows(term)
+            key = normalize_name(term)
+            if rows and key:
+                entries.append((key, term, 'alias', rows[0]))
+
+        entries.sort(key=lambda e: (e[0], self._PREFIX_KIND_ORDER[e[2]], e[3]))
+        self._prefix_keys = [e[0] for e in entries]
+        self._prefix_texts = [e[1] for e in entries]
+        self._prefix_kinds = [e[2] for e in entries]
+        self._prefix_rows = np.array([e[3] for e in entries], dtype=np.int64)
+        ranking = sorted(
+            range(len(entries)),
+            key=lambda i: (
+                len(entries[i][0]),
+                self._PREFIX_KIND_ORDER[entries[i][2]],
+                len(entries[i][1]),
+                entries[i][3],
+                entries[i][0],
+            ),
+        )
+        self._prefix_rank = np.empty(len(entries), dtype=np.int64)
+        self._prefix_rank[ranking] = np.arange(len(entries))
+
+        logger.info(f"✅ 自動完成索引建立完成: {len(entries)} 個候選")
+
+    def _prefix_range(self, key: str) -> Tuple[int, int]:
+        """前綴陣列中以 key 開頭的區間 [lo, hi)"""
+        if not key:
+            return 0, 0
+        lo = bisect_left(self._prefix_keys, key)
+        hi = bisect_left(self._prefix_keys, key + '\U0010ffff', lo)
+        return lo, hi
+
+    def _alias_rows(self, term: str) -> List[int]:
+        """別名表詞彙 → 列位置（先找同群組的精確名稱，再找包含該詞的名稱）"""
+        group = [term] + self._alias_lookup.get(term, [])
+        for candidate in group:
+            if candidate in self._exact_index:
+                return self._exact_index[candidate]
+        for candidate in group:
+            rows = self._substring_rows(candidate)
+            if rows:
+                return rows
+        return []
+
+    def _substring_rows(self, term: str, allowed: Optional[AbstractSet[int]] = None) -> List[int]:
+        """
+        回傳名稱包含 term 的列位置（依原始資料順序）
+
+        allowed（分類分區）直接加入 posting list 交集，不逐列檢查。
+        """
+        if not term:
+            rows: Iterable[int] = (i for i, name in enumerate(self._names) if name)
+            if allowed is not None:
+                rows = (i for i in rows if i in allowed)
+        elif len(term) == 1:
+            posting = self._char_index.get(term)
+            if not posting:
+                return []
+            rows = posting if allowed is None else posting & allowed
+        else:
+            postings: List[AbstractSet[int]] = []
+            for i in range(len(term) - 1):
+                posting = self._bigram_index.get(term[i:i+2])
+                if not posting:
+                    return []
+                postings.append(posting)
+            if allowed is not None:
+                postings.append(allowed)
+            postings.sort(key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            if len(term) > 2:
+                candidates = {i for i in candidates if term in self._names[i]}
+            rows = candidates
+
+        return sorted(rows)
     
     def search(
         self, 
         query: str, 
         limit: int = 5,
-        category: Optional[str] = None
+        category: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        ranked: bool = False
     ) -> List[Dict[str, Any]]:
         """
         搜尋食物營養資訊
@@ -145,87 +328,253 @@ class NutritionDBService:
             query: 食物名稱（支援模糊匹配）
             limit: 回傳筆數上限
             category: 限定食品分類（可選）
+            fields: 額外營養素欄位（API 鍵值，如 iron、calcium）
+            ranked: 依相關度排序（預設為第一個命中階段、原始資料順序）
             
         Returns:
-            營養資訊列表
+            營養資訊列表（可能來自快取，呼叫端不可修改）；空白查詢回傳空列表
         """
-        self._search_stats['total_queries'] += 1
-        
-        df = self.simplified_df.copy()
+        # 查詢字串原樣比對（與未快取前相同，不去除前後空白）；
+        # 空字串會被子字串比對視為命中所有食物，空白查詢一律視為未命中、不快取
+        if not query.strip():
+            self._record_query(False)
+            return []
+        _ = self.simplified_df  # 索引就緒後才查詢與快取
+        category = category or None
+        key = ('search', query, category, limit, tuple(fields or ()), ranked)
+        find_rows = self._ranked_rows if ranked else self._search_rows
+        results = self._cache.get_or_compute(
+            key, lambda: self._format_results(find_rows(query, limit, category), fields)
+        )
+        self._record_query(bool(results))
+        return results
+    
+    def _search_rows(
+        self,
+        query: str,
+        limit: int = 5,
+        category: Optional[str] = None
+    ) -> List[int]:
+        """依四階段匹配回傳命中的列位置（最多 limit 筆，依原始資料順序），並記錄各階段耗時"""
+        _ = self.simplified_df  # 確保名稱索引已建立
+        metrics = self._metrics
+        started = lap = time.perf_counter()
         
-        # 類別過濾
-        if category and 'category' in df.columns:
-            df = df[df['category'].str.contains(category, na=False)]
+        # 類別過濾（載入時建立的分類分區，不掃描整欄）
+        allowed = self.catalog.category_rows(category)
         
         # 1. 精確匹配
-        exact_matches = df[df['name'] == query]
-        if not exact_matches.empty:
-            self._search_stats['successful_matches'] += 1
-            return self._format_results(exact_matches.head(limit))
+        exact_rows = self._exact_index.get(query, [])
+        if allowed is not None:
+            exact_rows = [i for i in exact_rows if i in allowed]
+        lap = metrics.lap('exact', lap)
+        if exact_rows:
+            metrics.observe('exact', started)
+            return exact_rows[:limit]
         
         # 2. 別名匹配
         expanded_queries = self._expand_aliases(query)
         for alias in expanded_queries:
-            alias_matches = df[df['name'].str.contains(alias, na=False, regex=False)]
-            if not alias_matches.empty:
-                self._search_stats['successful_matches'] += 1
-                return self._format_results(alias_matches.head(limit))
+            alias_rows = self._substring_rows(alias, allowed)
+            if alias_rows:
+                metrics.lap('alias', lap)
+                metrics.observe('alias', started)
+                return alias_rows[:limit]
+        lap = metrics.lap('alias', lap)
         
         # 3. 模糊匹配（包含查詢字串）
-        fuzzy_matches = df[df['name'].str.contains(query, na=False, regex=False)]
-        if not fuzzy_matches.empty:
-            self._search_stats['successful_matches'] += 1
-            return self._format_results(fuzzy_matches.head(limit))
+        fuzzy_rows = self._substring_rows(query, allowed)
+        lap = metrics.lap('fuzzy', lap)
+        if fuzzy_rows:
+            metrics.observe('fuzzy', started)
+            return fuzzy_rows[:limit]
         
         # 4. 分詞匹配（拆解查詢）
         if len(query) >= 2:
             for i in range(len(query) - 1):
                 partial = query[i:i+2]
-                partial_matches = df[df['name'].str.contains(partial, na=False, regex=False)]
-                if not partial_matches.empty:
-                    self._search_stats['successful_matches'] += 1
-                    return self._format_results(partial_matches.head(limit))
+                partial_rows = self._substring_rows(partial, allowed)
+                if partial_rows:
+                    metrics.lap('partial', lap)
+                    metrics.observe('partial', started)
+                    return partial_rows[:limit]
+            metrics.lap('partial', lap)
         
         # 無匹配
-        self._search_stats['failed_matches'] += 1
+        metrics.observe('miss', started)
         return []
     
+    # 排序搜尋的特徵權重
+    RANK_WEIGHTS = {
+        'exact': 100.0,     # 正規化名稱完全相同
+        'prefix': 20.0,     # 名稱以查詢開頭
+        'contains': 10.0,   # 名稱包含查詢
+        'alias': 15.0,      # 名稱包含別名表詞彙，或俗名 / 別名以查詢開頭
+        'match': 10.0,      # 查詢的雙字元在名稱中出現的比例
+        'coverage': 10.0,   # 查詢佔名稱長度的比例
+        'length': 0.1,      # 名稱長度（越短越好）
+    }
+    
+    def _ranked_rows(
+        self,
+        query: str,
+        limit: int = 5,
+        category: Optional[str] = None
+    ) -> List[int]:
+        """
+        依相關度排序的搜尋
+
+        1. 候選：由索引取得（精確、子字串、別名表、雙字元、俗名前綴），不掃描全表
+        2. 評分：對所有候選一次以 numpy 計算特徵加權分數
+        3. 取前 k：argpartition 後只排序前 k 名；同分依原始資料順序
+        """
+        _ = self.simplified_df  # 確保名稱索引已建立
+        started = time.perf_counter()
+        allowed = self.catalog.category_rows(category)
+        query_norm = normalize_name(query)
+        if not query_norm:
+            self._metrics.observe('miss', started)
+            return []
+
+        # 1. 候選
+        candidates: Set[int] = set(self._exact_index.get(query, []))
+        candidates.update(self._substring_rows(query, allowed))
+        alias_terms = [a for a in self._alias_lookup.get(query, []) if a != query]
+        for alias in alias_terms:
+            candidates.update(self._substring_rows(alias, allowed))
+        bigrams = [query[i:i+2] for i in range(len(query) - 1)]
+        for bigram in bigrams:
+            candidates.update(self._substring_rows(bigram, allowed))
+        lo, hi = self._prefix_range(query_norm)
+        common_rows = {
+            int(self._prefix_rows[i]) for i in range(lo, hi) if self._prefix_kinds[i] != 'name'
+        }
+        if allowed is not None:
+            common_rows &= allowed
+        candidates.update(common_rows)
+        if allowed is not None:
+            candidates &= allowed
+        if not candidates:
+            self._metrics.observe('miss', started)
+            return []
+
+        # 2. 向量化評分
+        rows = np.fromiter(sorted(candidates), dtype=np.int64, count=len(candidates))
+        names = self._name_norm_array[rows]
+        lengths = np.maximum(self._name_norm_len[rows], 1)
+        exact = names == query_norm
+        prefix = np.char.startswith(names, query_norm)
+        contains = np.char.find(names, query_norm) >= 0
+        alias = np.zeros(len(self._names), dtype=bool)
+        alias[list(common_rows)] = True
+        alias = alias[rows]
+        for term in alias_terms:
+            term_norm = normalize_name(term)
+            if term_norm:
+                alias |= np.char.find(names, term_norm) >= 0
+        if bigrams:
+            hits = np.zeros(len(rows), dtype=np.float64)
+            for bigram in bigrams:
+                hits += np.char.find(names, bigram) >= 0
+            match = np.where(contains, 1.0, hits / len(bigrams))
+        else:
+            match = contains.astype(np.float64)
+        coverage = np.minimum(len(query_norm) / lengths, 1.0) * match
+
+        w = self.RANK_WEIGHTS
+        scores = (
+            w['exact'] * exact
+            + w['prefix'] * prefix
+            + w['contains'] * contains
+            + w['alias'] * alias
+            + w['match'] * match
+            + w['coverage'] * coverage
+            - w['length'] * lengths
+        )
+
+        # 3. 前 k 名
+        if limit < len(rows):
+            kth = np.partition(-scores, limit - 1)[limit - 1]
+            top = np.flatnonzero(-scores <= kth)
+        else:
+            top = np.arange(len(rows))
+        order = top[np.lexsort((rows[top], -scores[top]))][:limit]
+        self._metrics.observe('ranked', started)
+        return rows[order].tolist()
+    
+    def _record_query(self, matched: bool) -> None:
+        """更新匹配率統計（快取命中也計入）"""
+        self._metrics.record_query(matched)
+    
     def _expand_aliases(self, query: str) -> List[str]:
         """展開食物別名"""
         aliases = [query]
         
-        # 檢查是否在別名表中
-        for canonical, alias_list in self.FOOD_ALIASES.items():
-            if query == canonical or query in alias_list:
-                aliases.extend([canonical] + alias_list)
-                break
+        # 檢查是否在別名表中（預先建立的查表）
+        aliases.extend(self._alias_lookup.get(query, []))
         
         return list(set(aliases))
     
-    def _format_results(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        """格式化搜尋結果"""
+    def autocomplete(self, prefix: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """
+        前綴自動完成（輸入框逐字查詢用，不經過四階段搜尋）
+
+        Args:
+            prefix: 使用者已輸入的文字
+            limit: 回傳筆數上限（同一食物只回傳排名最高的一筆）
+
+        Returns:
+            [{'text', 'food_id', 'name', 'category', 'matched_field'}]
+        """
+        _ = self.simplified_df
+        lo, hi = self._prefix_range(normalize_name(prefix))
+        if lo == hi:
+            return []
+
+        catalog = self.catalog
         results = []
-        for _, row in df.iterrows():
-            result = {
-                'name': row.get('name', ''),
-                'category': row.get('category', ''),
-                'per_100g': {
-                    'calories': round(float(row.get('calories', 0)), 1),
-                    'protein': round(float(row.get('protein', 0)), 1),
-                    'carbs': round(float(row.get('carbs', 0)), 1),
-                    'fat': round(float(row.get('fat', 0)), 1),
-                    'sodium': round(float(row.get('sodium', 0)), 1),
-                    'fiber': round(float(row.get('fiber', 0)), 1),
-                    'potassium': round(float(row.get('potassium', 0)), 1),
-                }
-            }
-            results.append(result)
+        seen: Set[int] = set()
+        for i in (lo + np.argsort(self._prefix_rank[lo:hi])).tolist():
+            row = int(self._prefix_rows[i])
+            if row in seen:
+                continue
+            seen.add(row)
+            results.append({
+                'text': self._prefix_texts[i],
+                'food_id': catalog.food_ids[row],
+                'name': catalog.names[row],
+                'category': catalog.categories[row],
+                'matched_field': self._prefix_kinds[i],
+            })
+            if len(results) >= limit:
+                break
+        return results
+    
+    def _format_results(self, rows: List[int], fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """格式化搜尋結果（一次取出所有命中列的核心營養素與指定欄位）"""
+        if not rows:
+            return []
+        catalog = self.catalog
+        vectors = catalog.values(rows)
+        values = catalog.core_values(vectors).tolist()
+        extras = catalog.project(vectors, fields or [], digits=1)
+        keys = list(CORE_NUTRIENTS.keys())
+        results = []
+        for row, row_values, extra in zip(rows, values, extras):
+            per_100g = {k: round(v, 1) for k, v in zip(keys, row_values)}
+            per_100g.update(extra)
+            results.append({
+                'name': catalog.names[row],
+                'category': catalog.categories[row],
+                'per_100g': per_100g,
+            })
         return results
     
     def calculate_nutrients(
         self, 
         food_name: str, 
-        grams: float = 100
+        grams: float = 100,
+        fields: Optional[List[str]] = None
     ) -> Optional[Dict[str, Any]]:
         """
         計算指定克數的營養成分
@@ -233,44 +582,148 @@ class NutritionDBService:
         Args:
             food_name: 食物名稱
             grams: 克數（預設 100g）
+            fields: 額外營養素欄位（API 鍵值）
             
         Returns:
-            營養成分字典（按比例計算）
+            營養成分字典（按比例計算；可能來自快取，呼叫端不可修改）；空白名稱回傳 None
         """
-        results = self.search(food_name, limit=1)
-        if not results:
+        if not food_name.strip():
+            self._record_query(False)
+            return None
+        _ = self.simplified_df  # 索引就緒後才查詢與快取
+        key = ('calculate', food_name, float(grams), tuple(fields or ()))
+        result = self._cache.get_or_compute(key, lambda: self._calculate(food_name, grams, fields))
+        self._record_query(result is not None)
+        return result
+    
+    def _calculate(
+        self,
+        food_name: str,
+        grams: float,
+        fields: Optional[List[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        rows = self._search_rows(food_name, limit=1)
+        if not rows:
             return None
         
-        base = results[0]['per_100g']
-        ratio = grams / 100.0
+        catalog = self.catalog
+        _, total = catalog.compute_rows(rows, [grams])
+        nutrients = catalog.core_dict(total, digits=1)
+        nutrients.update(catalog.project(total[None, :], fields or [], digits=1)[0])
         
         return {
-            'name': results[0]['name'],
+            'name': catalog.names[rows[0]],
             'grams': grams,
-            'nutrients': {
-                'calories': round(base['calories'] * ratio, 1),
-                'protein': round(base['protein'] * ratio, 1),
-                'carbs': round(base['carbs'] * ratio, 1),
-                'fat': round(base['fat'] * ratio, 1),
-                'sodium': round(base['sodium'] * ratio, 1),
-                'fiber': round(base['fiber'] * ratio, 1),
-                'potassium': round(base['potassium'] * ratio, 1),
-            }
+            'nutrients': nutrients,
         }
     
+    def query(
+        self,
+        filters: Optional[str] = None,
+        category: Optional[str] = None,
+        sort: Optional[str] = None,
+        order: str = "desc",
+        limit: int = 20,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        營養素範圍查詢（營養師建立低鈉、腎友食物清單用）
+
+        Args:
+            filters: 逗號分隔的條件（每 100g），如 protein>=20,sodium<=100
+            category: 限定食品分類
+            sort: 排序鍵，如 protein；或密度 protein/calories
+            order: asc / desc
+            limit: 回傳筆數上限
+            fields: 額外營養素欄位（條件與排序用到的欄位會自動帶出）
+
+        Returns:
+            {'total': 符合總數, 'results': [...]}
+
+        Raises:
+            ValueError: 條件、排序鍵或欄位不合法
+        """
+        catalog = self.catalog
+        predicates = parse_predicates(filters)
+        sort_keys = [k.strip() for k in sort.split("/")] if sort else []
+        if len(sort_keys) > 2 or any(not k for k in sort_keys):
+            raise ValueError(f"Invalid sort: {sort}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Invalid order: {order}")
+        catalog.resolve_fields([key for key, _, _ in predicates] + sort_keys)
+
+        total, rows = catalog.query_rows(
+            predicates,
+            category=category,
+            sort=sort_keys,
+            descending=order == "desc",
+            limit=limit,
+        )
+        extra_fields = [
+            f for f in dict.fromkeys(list(fields or []) + [key for key, _, _ in predicates] + sort_keys)
+            if f not in CORE_NUTRIENTS
+        ]
+        results = self._format_results(rows, extra_fields)
+        for row, result in zip(rows, results):
+            result['food_id'] = catalog.food_ids[row]
+        return {'total': total, 'results': results}
+    
+    def resolve_fields(self, raw: Optional[str]) -> List[str]:
+        """
+        解析並驗證 fields 參數（逗號分隔的營養素鍵值）
+
+        Raises:
+            ValueError: 有不存在的欄位
+        """
+        return self.catalog.resolve_fields(parse_fields(raw))
+    
+    def get_fields(self) -> Dict[str, str]:
+        """可投影的營養素欄位（API 鍵值 → 原始欄位名稱，含單位）"""
+        return dict(self.catalog.field_columns)
+    
     def get_categories(self) -> List[str]:
-        """取得所有食品分類"""
-        if 'category' in self.simplified_df.columns:
-            return sorted(self.simplified_df['category'].dropna().unique().tolist())
-        return []
+        """取得所有食品分類（由目錄載入時建立的分區取得）"""
+        return sorted(self.catalog.category_counts)
+    
+    def get_category_counts(self) -> Dict[str, int]:
+        """各食品分類的食物筆數（依分類名稱排序）"""
+        counts = self.catalog.category_counts
+        return {c: counts[c] for c in sorted(counts)}
+    
+    def reload(self, catalog: Optional[FoodCatalog] = None) -> None:
+        """
+        切換食品目錄並清空查詢快取
+
+        Args:
+            catalog: 新的食品目錄；未指定時下次存取重新取得（共用目錄或 csv_path）
+        """
+        with self._index_lock:
+            self._catalog = catalog
+            self._simplified_df = None
+            self._memory_report = None
+            self._cache.clear()
+        logger.info("🔄 營養服務已切換食品目錄，查詢快取已清空")
+    
+    def with_catalog(self, catalog: FoodCatalog) -> "NutritionDBService":
+        """
+        建立使用新食品目錄的服務（熱更新用）
+
+        新服務沿用本服務的查詢統計，快取為全新，並預先建立索引；
+        本服務不受影響，進行中的請求可在舊目錄上完成。
+        """
+        service = NutritionDBService(catalog=catalog)
+        service._metrics = self._metrics
+        _ = service.simplified_df
+        return service
     
     def get_stats(self) -> Dict[str, Any]:
         """取得服務統計資訊"""
+        queries = self._metrics.query_stats()
         match_rate = 0
-        if self._search_stats['total_queries'] > 0:
+        if queries['total_queries'] > 0:
             match_rate = (
-                self._search_stats['successful_matches'] / 
-                self._search_stats['total_queries'] * 100
+                queries['successful_matches'] / 
+                queries['total_queries'] * 100
             )
         
         # 確保資料已載入
@@ -279,11 +732,77 @@ class NutritionDBService:
         return {
             'total_foods': len(self._simplified_df) if self._simplified_df is not None else 0,
             'total_categories': len(self.get_categories()),
-            'queries': self._search_stats.copy(),
+            'catalog_version': self.catalog.version,
+            'queries': queries,
+            'cache': self._cache.get_stats(),
+            'latency': self._metrics.latency.summary(),
+            'stages': self._metrics.stage_breakdown(),
+            'memory': self.memory_report(),
             'match_rate_percent': round(match_rate, 1),
-            'status': 'healthy' if self._df is not None and len(self._df) > 0 else 'no_data'
+            'status': 'healthy' if len(self.df) > 0 else 'no_data'
         }
     
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        各結構的記憶體（位元組）
+
+        - catalog：共用食品目錄（資料表、營養素矩陣、名稱、每 100g 紀錄等）
+        - search_index：本服務的名稱索引、自動完成與排序搜尋陣列
+        - shared_segment_bytes：多 worker 共用資料段（mmap，不計入 private_bytes）
+        名稱字串由目錄與索引共用，只計入目錄。
+        """
+        if self._memory_report is None:
+            _ = self.simplified_df
+            seen: Set[int] = set()
+            catalog = self.catalog.memory_usage(seen)
+            shared_bytes = catalog.pop("shared_segment")
+            index = {
+                "simplified_view": int(self._simplified_df.memory_usage(deep=True).sum()),
+                "exact_index": deep_sizeof(self._exact_index, seen=seen),
+                "char_index": deep_sizeof(self._char_index, seen=seen),
+                "bigram_index": deep_sizeof(self._bigram_index, seen=seen),
+                "alias_lookup": deep_sizeof(self._alias_lookup, seen=seen),
+                "prefix_index": deep_sizeof(
+                    self._prefix_keys, self._prefix_texts, self._prefix_kinds,
+                    self._prefix_rows, self._prefix_rank, seen=seen,
+                ),
+                "ranked_arrays": self._name_norm_array.nbytes + self._name_norm_len.nbytes,
+            }
+            self._memory_report = {
+                'catalog': catalog,
+                'search_index': index,
+                'shared_segment_bytes': shared_bytes,
+                'private_bytes': sum(catalog.values()) + sum(index.values()),
+            }
+        return self._memory_report
+    
+    def prometheus_metrics(self) -> str:
+        """Prometheus text 格式（exposition format 0.0.4）的查詢與快取統計"""
+        cache = self._cache.get_stats()
+        lines = self._metrics.prometheus()
+        lines += prometheus_counter(
+            "nutrition_cache_requests_total",
+            "Nutrition result cache lookups.",
+            {"hit": cache['hits'], "miss": cache['misses']},
+            label_name="result",
+        )
+        lines += prometheus_counter(
+            "nutrition_cache_evictions_total",
+            "Entries evicted from the nutrition result cache (LRU).",
+            {"": cache['evictions']},
+        )
+        lines += prometheus_counter(
+            "nutrition_cache_entries",
+            "Entries currently in the nutrition result cache.",
+            {"": cache['size']},
+        )
+        lines += prometheus_counter(
+            "nutrition_foods",
+            "Foods in the loaded catalog.",
+            {"": len(self.catalog)},
+        )
+        return "\n".join(lines) + "\n"
+    
     def validate_top20_foods(self) -> Dict[str, Any]:
         """
         驗證 Top 20 常見食物的匹配率
@@ -328,3 +847,9 @@ def get_nutrition_service() -> NutritionDBService:
     if _nutrition_service is None:
         _nutrition_service = NutritionDBService()
     return _nutrition_service
+
+
+def set_nutrition_service(service: NutritionDBService) -> None:
+    """替換營養服務單例（熱更新用）"""
+    global _nutrition_service
+    _nutrition_service = service
@@ -0,0 +1,94 @@
+"""
+Query Result Cache
+==================
+有上限的 LRU 快取（可選 TTL），附命中 / 未命中 / 淘汰統計。
+
+營養查詢流量高度集中（白飯、雞蛋、雞胸肉），格式化後的結果可直接重用。
+快取的值視為唯讀，呼叫端不可修改。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class QueryCache:
+    """執行緒安全的 LRU 快取"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        """
+        Args:
+            maxsize: 最多保留的項目數（0 表示停用快取）
+            ttl: 項目存活秒數（None 或 0 表示不過期）
+        """
+        self.maxsize = max(0, int(maxsize))
+        self.ttl = ttl or None
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # clear() 時遞增；清空前開始計算的結果不寫回快取
+        self._generation = 0
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """命中時回傳快取值，否則計算後存入"""
+        if self.maxsize == 0:
+            return compute()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self.ttl is None or now - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return value
+                del self._data[key]
+                self._stats['expirations'] += 1
+            self._stats['misses'] += 1
+            generation = self._generation
+
+        # 在鎖外計算，避免慢查詢阻塞其他命中
+        value = compute()
+
+        with self._lock:
+            if generation != self._generation:
+                return value
+            self._data[key] = (now, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+        return value
+
+    def clear(self) -> None:
+        """清空快取（資料重新載入時呼叫）"""
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+            self._stats['invalidations'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            size = len(self._data)
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'size': size,
+            'maxsize': self.maxsize,
+            'ttl_seconds': self.ttl,
+            'hit_rate_percent': round(stats['hits'] / lookups * 100, 1) if lookups else 0.0,
+        })
+        return stats
@@ -0,0 +1,226 @@
+"""
+Query Metrics
+=============
+低開銷、執行緒安全的查詢統計（計數器與延遲直方圖）。
+
+- 每個執行緒寫入自己的分片（threading.local），熱路徑不需上鎖；
+  讀取時才在鎖內加總所有分片
+- 直方圖採固定桶（秒），可直接輸出 Prometheus text 格式
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+# 延遲直方圖的桶上限（秒）：10µs ~ 100ms
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+)
+
+
+class ShardedCounters:
+    """依執行緒分片的一組計數器（數值可為浮點數）"""
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self._names = list(names)
+        self._index = {name: i for i, name in enumerate(self._names)}
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _shard(self) -> List[float]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = [0] * len(self._names)
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def add(self, name: str, value: float = 1) -> None:
+        self._shard()[self._index[name]] += value
+
+    def add_at(self, index: int, value: float = 1) -> None:
+        self._shard()[index] += value
+
+    def index_of(self, name: str) -> int:
+        return self._index[name]
+
+    def snapshot(self) -> Dict[str, float]:
+        """加總所有分片（結束的執行緒其分片仍保留）"""
+        with self._lock:
+            shards = list(self._shards)
+        totals = [sum(values) for values in zip(*shards)] if shards else [0] * len(self._names)
+        return dict(zip(self._names, totals))
+
+
+class LatencyHistogram:
+    """依標籤分組的延遲直方圖"""
+
+    def __init__(self, labels: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.labels = list(labels)
+        self.buckets = tuple(buckets)
+        # 每個標籤：len(buckets) + 1 個桶（最後為 +Inf）、總和
+        self._width = len(self.buckets) + 2
+        names = [
+            f"{label}:{slot}" for label in self.labels for slot in range(self._width)
+        ]
+        self._offsets = {label: i * self._width for i, label in enumerate(self.labels)}
+        self._counters = ShardedCounters(names)
+
+    def observe(self, label: str, seconds: float) -> None:
+        offset = self._offsets[label]
+        self._counters.add_at(offset + bisect_left(self.buckets, seconds))
+        self._counters.add_at(offset + self._width - 1, seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """每個標籤的 {count, sum, buckets（非累積）}"""
+        totals = list(self._counters.snapshot().values())
+        result: Dict[str, Dict[str, Any]] = {}
+        for label, offset in self._offsets.items():
+            counts = [int(c) for c in totals[offset:offset + self._width - 1]]
+            result[label] = {
+                "count": sum(counts),
+                "sum": float(totals[offset + self._width - 1]),
+                "buckets": counts,
+            }
+        return result
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """API 用摘要：次數、平均與由桶估計的 p50 / p99（毫秒）"""
+        result: Dict[str, Dict[str, Any]] = {}
+        for label, data in self.snapshot().items():
+            count = data["count"]
+            result[label] = {
+                "count": count,
+                "total_ms": round(data["sum"] * 1000, 3),
+                "avg_ms": round(data["sum"] / count * 1000, 4) if count else 0.0,
+                "p50_ms": self._quantile_ms(data["buckets"], 0.50),
+                "p99_ms": self._quantile_ms(data["buckets"], 0.99),
+            }
+        return result
+
+    def _quantile_ms(self, counts: List[int], q: float) -> float:
+        """分位數估計（回傳該分位數所在桶的上限；落在 +Inf 桶時回傳最後一個上限）"""
+        total = sum(counts)
+        if total == 0:
+            return 0.0
+        target = q * total
+        running = 0
+        for i, count in enumerate(counts):
+            running += count
+            if running >= target:
+                bound = self.buckets[min(i, len(self.buckets) - 1)]
+                return round(bound * 1000, 4)
+        return round(self.buckets[-1] * 1000, 4)
+
+    def prometheus(self, name: str, label_name: str, help_text: str) -> List[str]:
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for label, data in self.snapshot().items():
+            running = 0
+            for bound, count in zip(list(self.buckets) + [float("inf")], data["buckets"]):
+                running += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{name}_bucket{{{label_name}="{label}",le="{le}"}} {running}')
+            lines.append(f'{name}_sum{{{label_name}="{label}"}} {data["sum"]!r}')
+            lines.append(f'{name}_count{{{label_name}="{label}"}} {data["count"]}')
+        return lines
+
+
+def prometheus_counter(name: str, help_text: str, samples: Dict[str, float], label_name: str = "") -> List[str]:
+    """
+    Prometheus counter / gauge 行
+
+    Args:
+        samples: 標籤值 → 數值；label_name 為空時 samples 只能有一筆（鍵值忽略）
+    """
+    kind = "counter" if name.endswith("_total") else "gauge"
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for label, value in samples.items():
+        labels = f'{{{label_name}="{label}"}}' if label_name else ""
+        lines.append(f"{name}{labels} {value!r}" if isinstance(value, float) else f"{name}{labels} {value}")
+    return lines
+
+
+class SearchMetrics:
+    """
+    營養搜尋的統計
+
+    - 查詢數 / 成功 / 失敗（含快取命中）
+    - 依最終命中階段分組的端到端延遲直方圖（exact / alias / fuzzy / partial / miss，
+      排序搜尋為 ranked；不含快取命中）
+    - 每個階段的嘗試次數與累計耗時（未命中而繼續往下的階段也計入）
+    """
+
+    STAGES = ("exact", "alias", "fuzzy", "partial")
+    OUTCOMES = STAGES + ("miss", "ranked")
+
+    def __init__(self) -> None:
+        self.queries = ShardedCounters(["total_queries", "successful_matches", "failed_matches"])
+        self.stage_time = ShardedCounters(
+            [f"{s}_attempts" for s in self.STAGES] + [f"{s}_seconds" for s in self.STAGES]
+        )
+        self.latency = LatencyHistogram(self.OUTCOMES)
+
+    def record_query(self, matched: bool) -> None:
+        self.queries.add("total_queries")
+        self.queries.add("successful_matches" if matched else "failed_matches")
+
+    def lap(self, stage: str, since: float) -> float:
+        """記錄一個階段的耗時，回傳目前時間（作為下一階段起點）"""
+        now = time.perf_counter()
+        self.stage_time.add(f"{stage}_attempts")
+        self.stage_time.add(f"{stage}_seconds", now - since)
+        return now
+
+    def observe(self, outcome: str, started: float) -> None:
+        self.latency.observe(outcome, time.perf_counter() - started)
+
+    def query_stats(self) -> Dict[str, int]:
+        return {k: int(v) for k, v in self.queries.snapshot().items()}
+
+    def stage_breakdown(self) -> Dict[str, Dict[str, Any]]:
+        totals = self.stage_time.snapshot()
+        breakdown: Dict[str, Dict[str, Any]] = {}
+        for stage in self.STAGES:
+            attempts = int(totals[f"{stage}_attempts"])
+            seconds = totals[f"{stage}_seconds"]
+            breakdown[stage] = {
+                "attempts": attempts,
+                "total_ms": round(seconds * 1000, 3),
+                "avg_ms": round(seconds / attempts * 1000, 4) if attempts else 0.0,
+            }
+        return breakdown
+
+    def prometheus(self) -> List[str]:
+        queries = self.query_stats()
+        totals = self.stage_time.snapshot()
+        lines: List[str] = []
+        lines += prometheus_counter(
+            "nutrition_search_queries_total",
+            "Nutrition search and calculate lookups (including cache hits).",
+            {"matched": queries["successful_matches"], "unmatched": queries["failed_matches"]},
+            label_name="result",
+        )
+        lines += prometheus_counter(
+            "nutrition_search_stage_attempts_total",
+            "Times each match stage was evaluated.",
+            {s: int(totals[f"{s}_attempts"]) for s in self.STAGES},
+            label_name="stage",
+        )
+        lines += prometheus_counter(
+            "nutrition_search_stage_seconds_total",
+            "Time spent inside each match stage, including stages that did not match.",
+            {s: float(totals[f"{s}_seconds"]) for s in self.STAGES},
+            label_name="stage",
+        )
+        lines += self.latency.prometheus(
+            "nutrition_search_latency_seconds",
+            "stage",
+            "End-to-end match latency by the stage that produced the result (cache misses only).",
+        )
+        return lines
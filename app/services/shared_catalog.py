@@ -0,0 +1,278 @@
+"""
+Shared Food Catalog Segment
+===========================
+多個 uvicorn / gunicorn worker 共用的食品目錄資料段。
+
+由主程序（啟動前的 prestart 指令）建立一次，各 worker 以唯讀 mmap 附加：
+同一份檔案的分頁由作業系統 page cache 共用，worker 數增加時這些陣列
+不再各自佔用記憶體，也省去逐一正規化名稱、建立字元倒排索引的啟動時間。
+
+資料段格式（目錄 <CSV 檔名>.shared/<資料版本>/）：
+- meta.json           格式版本、資料版本、筆數、營養素欄位
+- matrix.npy          營養素矩陣（foods × nutrients，float64，空值補 0）
+- missing.npy         原始資料為空值的位置（bool）
+- texts.npy           正規化名稱與別名（UTF-8 位元組串接）
+- text_offsets.npy    每個 text 在解碼後字串中的起點（字元位置，int64）
+- record_offsets.npy  每筆食物的第一個 text（名稱）編號，其後為別名（int64）
+- text_lens.npy       每個 text 的長度（int32）
+- posting_*.npy       名稱對齊的字元倒排索引（字元碼位、起點、text 編號、次數）
+
+Python 字串與 dict（名稱清單、每筆營養紀錄）無法跨程序共用，仍由各 worker
+自行建立，但改由資料段解碼而非重新正規化。
+
+使用方式：
+    python -m app.services.shared_catalog            # 為預設 CSV 建立（含過期的快照）
+    python -m app.services.shared_catalog <csv_path>
+
+資料版本為 CSV 內容雜湊；CSV 更新後舊資料段不會被附加，熱更新時重新建立。
+
+發布可由多個 worker 同時執行：同一版本已有完整資料段時直接沿用，
+否則寫入暫存目錄後換名，換名時已被其他 worker 搶先發布也視為成功。
+移除其他版本與附加資料段分別持有 <根目錄>/.lock 的獨占 / 共用檔案鎖，
+不會在其他 worker 附加途中刪除檔案。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import errno
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.services.food_snapshot import build_snapshot, default_csv_path, is_snapshot_fresh
+
+try:
+    import fcntl
+except ImportError:  # Windows：無 flock，僅依換名的原子性
+    fcntl = None
+
+if TYPE_CHECKING:
+    from app.services.food_catalog import FoodCatalog
+
+logger = logging.getLogger(__name__)
+
+# 正規化或索引規則變更時遞增，使舊資料段失效
+SEGMENT_VERSION = 2
+SEGMENT_SUFFIX = ".shared"
+
+_META_FILE = "meta.json"
+_LOCK_FILE = ".lock"
+_ARRAYS = (
+    "matrix",
+    "missing",
+    "texts",
+    "text_offsets",
+    "record_offsets",
+    "text_lens",
+    "posting_chars",
+    "posting_offsets",
+    "posting_ids",
+    "posting_counts",
+)
+
+
+def segment_root_for(csv_path: str) -> str:
+    """CSV 對應的資料段根目錄（底下每個資料版本一個子目錄）"""
+    root, _ = os.path.splitext(csv_path)
+    return root + SEGMENT_SUFFIX
+
+
+def segment_path_for(csv_path: str, version: str) -> str:
+    return os.path.join(segment_root_for(csv_path), version)
+
+
+@contextlib.contextmanager
+def _segment_lock(root: str, exclusive: bool) -> Iterator[None]:
+    """資料段根目錄的檔案鎖（跨程序）：移除版本時獨占，附加時共用"""
+    if fcntl is None:
+        yield
+        return
+    try:
+        handle = open(os.path.join(root, _LOCK_FILE), "a+")
+    except OSError:
+        if exclusive:
+            raise
+        # 資料段目錄對 worker 唯讀（由 prestart 建立）時不會有人移除版本，直接附加
+        yield
+        return
+    with handle:
+        fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _read_meta(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(path, _META_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _meta_matches(meta: Optional[Dict[str, Any]], version: str, rows: int, columns: List[str]) -> bool:
+    return bool(meta) and (
+        meta.get("segment_version") == SEGMENT_VERSION
+        and meta.get("catalog_version") == version
+        and meta.get("rows") == rows
+        and meta.get("nutrient_columns") == columns
+    )
+
+
+def load_segment(csv_path: str, version: str, rows: int, columns: List[str]) -> Optional[Dict[str, np.ndarray]]:
+    """
+    附加資料段（唯讀 mmap）
+
+    Returns:
+        陣列名稱 → 唯讀陣列；資料段不存在或與目前資料不符時為 None
+    """
+    path = segment_path_for(csv_path, version)
+    if not os.path.exists(os.path.join(path, _META_FILE)):
+        return None
+    try:
+        with _segment_lock(segment_root_for(csv_path), exclusive=False):
+            if not _meta_matches(_read_meta(path), version, rows, columns):
+                logger.warning(f"⚠️ 共用資料段與目前資料不符，略過: {path}")
+                return None
+            # np.asarray 取得一般 ndarray 檢視（仍指向 mmap，不複製；解鎖後刪除檔案也不影響）
+            arrays = {
+                name: np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+                for name in _ARRAYS
+            }
+    except Exception as e:
+        logger.warning(f"⚠️ 共用資料段附加失敗: {e}")
+        return None
+    logger.info(f"✅ 已附加共用食品資料段: {path}")
+    return arrays
+
+
+def build_segment(catalog: "FoodCatalog") -> str:
+    """
+    由已載入的食品目錄發布資料段（可由多個 worker 同時呼叫）
+
+    同一版本已有完整資料段時直接回傳；否則寫入暫存目錄再換名，
+    換名時目標已存在（其他 worker 搶先發布）視為成功。最後在獨占鎖內
+    移除其他版本（已附加舊版本的 worker 仍持有對應的 mmap，不受影響）。
+
+    Returns:
+        資料段目錄路徑
+    """
+    from app.services.food_alignment_service import build_char_postings
+
+    root = segment_root_for(catalog.csv_path)
+    path = segment_path_for(catalog.csv_path, catalog.version)
+    if _meta_matches(_read_meta(path), catalog.version, len(catalog), catalog.nutrient_columns):
+        return path
+
+    texts: List[str] = []
+    record_offsets = [0]
+    for name_norm, alias_norm in zip(catalog.name_norm, catalog.alias_norm):
+        texts.append(name_norm)
+        texts.extend(alias_norm)
+        record_offsets.append(len(texts))
+    text_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    text_offsets[1:] = np.cumsum([len(t) for t in texts])
+
+    postings = build_char_postings(texts)
+    chars = list(postings)
+    posting_offsets = np.zeros(len(chars) + 1, dtype=np.int64)
+    posting_offsets[1:] = np.cumsum([len(postings[ch][0]) for ch in chars])
+
+    empty = np.zeros(0, dtype=np.int32)
+    arrays = {
+        "matrix": np.ascontiguousarray(catalog.nutrient_matrix, dtype=np.float64),
+        "missing": np.ascontiguousarray(catalog.nutrient_missing, dtype=bool),
+        "texts": np.frombuffer("".join(texts).encode("utf-8"), dtype=np.uint8),
+        "text_offsets": text_offsets,
+        "record_offsets": np.array(record_offsets, dtype=np.int64),
+        "text_lens": np.array([len(t) for t in texts], dtype=np.int32),
+        "posting_chars": np.array([ord(ch) for ch in chars], dtype=np.int32),
+        "posting_offsets": posting_offsets,
+        "posting_ids": np.concatenate([postings[ch][0] for ch in chars]) if chars else empty,
+        "posting_counts": np.concatenate([postings[ch][1] for ch in chars]) if chars else empty,
+    }
+    meta = {
+        "segment_version": SEGMENT_VERSION,
+        "catalog_version": catalog.version,
+        "rows": len(catalog),
+        "nutrient_columns": catalog.nutrient_columns,
+    }
+
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".segment-", dir=root)
+    try:
+        os.chmod(tmp_dir, 0o755)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        # meta 最後寫入：換名後的目錄一定是完整的資料段
+        with open(os.path.join(tmp_dir, _META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        with _segment_lock(root, exclusive=True):
+            _publish(tmp_dir, path)
+            for entry in os.listdir(root):
+                if entry != catalog.version and not entry.startswith("."):
+                    shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    logger.info(f"✅ 共用食品資料段已發布: {path} ({len(catalog)} 筆, {len(texts)} 個名稱/別名)")
+    return path
+
+
+def _publish(tmp_dir: str, path: str) -> None:
+    """暫存目錄換名為資料段（需持有獨占鎖）；目標已有相同版本的完整資料段時視為成功"""
+    meta = _read_meta(tmp_dir)
+    existing = _read_meta(path)
+    if existing == meta:
+        return
+    if existing is not None or os.path.isdir(path):
+        # 同一資料版本但格式不符（如舊的 SEGMENT_VERSION）：獨占鎖內沒有 worker 正在附加
+        shutil.rmtree(path)
+    try:
+        os.rename(tmp_dir, path)
+    except OSError as e:
+        if e.errno not in (errno.EEXIST, errno.ENOTEMPTY) or _read_meta(path) != meta:
+            raise
+
+
+def decode_texts(arrays: Dict[str, np.ndarray]) -> List[str]:
+    """由資料段還原正規化名稱與別名（依 record_offsets 排列）"""
+    joined = arrays["texts"].tobytes().decode("utf-8")
+    bounds = arrays["text_offsets"].tolist()
+    return [joined[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+
+def ensure_segment(catalog: "FoodCatalog") -> bool:
+    """
+    確保目錄使用共用資料段：尚未附加時建立並附加
+
+    Returns:
+        是否已附加
+    """
+    if catalog.shared:
+        return True
+    try:
+        build_segment(catalog)
+    except Exception as e:
+        logger.warning(f"⚠️ 無法建立共用資料段，各 worker 將自行建立索引: {e}")
+        return False
+    return catalog.attach_segment()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from app.services.food_catalog import FoodCatalog
+
+    target = sys.argv[1] if len(sys.argv) > 1 else default_csv_path()
+    if os.path.exists(target) and not is_snapshot_fresh(target):
+        build_snapshot(target)
+    print(build_segment(FoodCatalog(target)))
@@ -0,0 +1,170 @@
+"""
+Startup Warm-up
+===============
+啟動時預先載入食品目錄、建立營養搜尋與名稱對齊索引、載入知識庫，
+全部完成後 /ready 才回報就緒（/health 只代表程序存活）。
+
+- 由 lifespan 在背景執行緒依序執行各階段，uvicorn 照常接受連線與 /health
+- 每個階段記錄耗時與結果（筆數、版本等），/ready 一併回傳
+- 某階段失敗時記錄錯誤並繼續後續階段；必要階段（目錄與索引）失敗時整體為 failed、不會就緒，
+  非必要階段（替代食物特徵、知識庫）失敗時為 degraded，仍回報就緒（該功能改回第一次請求時載入）
+
+設定 WARMUP_ON_STARTUP=false 可停用（各服務改回第一次請求時建立，/ready 直接就緒）。
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import AbstractSet, Any, Callable, Dict, List, Optional, Tuple
+
+from app.services.food_alignment_service import get_food_alignment_service
+from app.services.food_catalog import get_food_catalog
+from app.services.food_substitution_service import get_food_substitution_service
+from app.services.knowledge_service import knowledge_service
+from app.services.nutrition_db_service import get_nutrition_service
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_catalog() -> Dict[str, Any]:
+    catalog = get_food_catalog()
+    return {
+        'foods': len(catalog),
+        'catalog_version': catalog.version,
+        'shared_segment': bool(catalog.shared),
+    }
+
+
+def _warm_search_index() -> Dict[str, Any]:
+    service = get_nutrition_service()
+    view = service.simplified_df  # 建立精簡視圖、n-gram 與前綴索引
+    return {'foods': len(view), 'prefix_keys': len(service._prefix_keys)}
+
+
+def _warm_alignment_index() -> Dict[str, Any]:
+    service = get_food_alignment_service()
+    service._build_index()
+    return {'texts': len(service._texts)}
+
+
+def _warm_substitution() -> Dict[str, Any]:
+    features = get_food_substitution_service().features
+    return {'features': list(features.shape)}
+
+
+def _warm_knowledge_base() -> Dict[str, Any]:
+    if not knowledge_service._cache:
+        knowledge_service._load_cache()
+    return {'documents': len(knowledge_service._cache)}
+
+
+# (階段名稱, 執行函式)；依序執行
+WARMUP_STAGES: List[Tuple[str, Callable[[], Dict[str, Any]]]] = [
+    ('catalog', _warm_catalog),
+    ('search_index', _warm_search_index),
+    ('alignment_index', _warm_alignment_index),
+    ('substitution', _warm_substitution),
+    ('knowledge_base', _warm_knowledge_base),
+]
+
+# 失敗時只降級、不影響就緒的階段
+OPTIONAL_STAGES = frozenset({'substitution', 'knowledge_base'})
+
+
+class Warmup:
+    """依序執行預熱階段並記錄各階段耗時"""
+
+    def __init__(
+        self,
+        stages: Optional[List[Tuple[str, Callable[[], Dict[str, Any]]]]] = None,
+        optional: Optional[AbstractSet[str]] = None,
+    ) -> None:
+        self.stages = list(WARMUP_STAGES if stages is None else stages)
+        self.optional = OPTIONAL_STAGES if optional is None else frozenset(optional)
+        self.status = 'pending'  # pending | warming_up | ready | degraded | failed
+        self.results: List[Dict[str, Any]] = []
+        self.total_ms: Optional[float] = None
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status in ('ready', 'degraded')
+
+    def run(self) -> bool:
+        """在目前執行緒執行所有階段；回傳是否就緒（必要階段皆成功）"""
+        self.status = 'warming_up'
+        started = time.perf_counter()
+        for name, stage in self.stages:
+            stage_started = time.perf_counter()
+            result: Dict[str, Any] = {'stage': name, 'optional': name in self.optional}
+            try:
+                result['detail'] = stage()
+                result['status'] = 'ok'
+            except Exception as e:
+                logger.error(f"❌ 預熱階段 {name} 失敗: {e}")
+                result['status'] = 'failed'
+                result['error'] = str(e)
+            result['elapsed_ms'] = round((time.perf_counter() - stage_started) * 1000, 1)
+            self.results.append(result)
+
+        self.total_ms = round((time.perf_counter() - started) * 1000, 1)
+        failed = [r for r in self.results if r['status'] != 'ok']
+        if not failed:
+            self.status = 'ready'
+        elif all(r['optional'] for r in failed):
+            self.status = 'degraded'
+        else:
+            self.status = 'failed'
+        self._done.set()
+        timings = ', '.join(f"{r['stage']} {r['elapsed_ms']}ms" for r in self.results)
+        if self.status == 'ready':
+            logger.info(f"✅ 預熱完成（{self.total_ms}ms）: {timings}")
+        elif self.status == 'degraded':
+            logger.warning(f"⚠️ 預熱完成但部分功能降級（{self.total_ms}ms）: {timings}")
+        else:
+            logger.error(f"❌ 預熱未完成（{self.total_ms}ms）: {timings}")
+        return self.ready
+
+    def start(self) -> None:
+        """在背景執行緒執行（lifespan 用，不阻塞啟動）"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+        self._thread.start()
+        logger.info(f"🔥 開始預熱: {', '.join(name for name, _ in self.stages)}")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待預熱結束；回傳是否就緒"""
+        self._done.wait(timeout)
+        return self.ready
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'status': self.status,
+            'ready': self.ready,
+            'total_ms': self.total_ms,
+            'stages': list(self.results),
+        }
+
+
+# 全域單例（lifespan 啟動時建立）
+_warmup: Optional[Warmup] = None
+
+
+def start_warmup() -> Warmup:
+    """建立並在背景啟動預熱（重複呼叫回傳同一個）"""
+    global _warmup
+    if _warmup is None:
+        _warmup = Warmup()
+        _warmup.start()
+    return _warmup
+
+
+def readiness() -> Dict[str, Any]:
+    """/ready 的回應內容；未啟用預熱時直接就緒"""
+    if _warmup is None:
+        return {'status': 'disabled', 'ready': True, 'total_ms': None, 'stages': []}
+    return _warmup.report()
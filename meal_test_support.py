@@ -0,0 +1,142 @@
+"""
+飲食紀錄測試共用工具
+====================
+test_meal_bulk_insert.py、test_daily_totals.py、test_meal_query_count.py、
+test_meal_pagination.py 共用的暫存資料庫、API 用戶端、註冊與建立餐點工具；
+check() 與 report() 另供其他 test_*.py 共用輸出格式。
+
+use_temp_database() 必須在 import app 之前呼叫（資料庫連線於 import 時建立），
+因此本模組不在頂層 import app，需要時才在函式內載入。
+
+使用方式：
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from meal_test_support import use_temp_database
+    _workdir = use_temp_database("meal_bulk_")
+
+    from meal_test_support import FOODS, check, make_client, register, ...
+"""
+
+import os
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+FOODS = ['白飯', '雞胸肉', '高麗菜', '豆腐', '鮭魚', '蘋果', '地瓜葉', '牛奶']
+
+
+def use_temp_database(prefix: str) -> str:
+    """以暫存目錄中的 SQLite 作為 DATABASE_URL，回傳暫存目錄"""
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'test.db')}"
+    os.environ.setdefault("GEMINI_API_KEY", "dummy")
+    return workdir
+
+
+def check(label: str, ok: bool) -> bool:
+    print(f"   {'✅' if ok else '❌'} {label}")
+    return ok
+
+
+def report(results: List[bool]) -> int:
+    """輸出通過數並回傳結束代碼"""
+    print("\n" + "=" * 60)
+    passed = all(results)
+    print(f"{'🎉 全部通過' if passed else '❌ 有項目未通過'} ({sum(results)}/{len(results)})")
+    print("=" * 60)
+    return 0 if passed else 1
+
+
+def best_of(fn: Callable[[], Any], rounds: int = 5) -> float:
+    """執行多次取最短耗時（秒），僅供輸出參考"""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def make_client():
+    """建立資料表並回傳掛載 auth 與 meals 路由的 TestClient"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api.v1.endpoints import auth, meals
+    from app.db.session import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    api = FastAPI()
+    api.include_router(auth.router, prefix="/api/v1/auth")
+    api.include_router(meals.router, prefix="/api/v1")
+    return TestClient(api)
+
+
+def register(client, name: str) -> Tuple[Dict[str, str], str]:
+    """註冊新帳號並建立使用者檔案，回傳 (headers, user_id)"""
+    response = client.post("/api/v1/auth/register", json={
+        "email": f"{name.lower()}{uuid.uuid4().hex[:8]}@example.com", "password": "pass1234", "name": name})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return headers, client.get("/api/v1/meals/summary", headers=headers).json()['user_id']
+
+
+def food_ids(names: List[str] = FOODS) -> List[str]:
+    """食物名稱 → 對齊後的第一個整合編號"""
+    from app.services.food_alignment_service import get_food_alignment_service
+
+    alignment = get_food_alignment_service()
+    return [alignment.align(name, limit=1)[0]['food_id'] for name in names]
+
+
+def meal_rows(catalog, user_id: str, rows: List[int], grams: List[float], eaten_at,
+              meal_id: Optional[str] = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    依目錄列位置組成一餐的寫入資料（與 POST /meals 相同格式）
+
+    Returns:
+        (meal, items)：可直接傳給 meals._insert_meal
+    """
+    vectors, total = catalog.compute_rows(rows, grams)
+    meal_id = meal_id or str(uuid.uuid4())
+    meal = {"id": meal_id, "user_id": user_id, "source": "manual", "note": None,
+            "eaten_at": eaten_at, "nutrients": catalog.core_dict(total)}
+    items = [
+        {"id": str(uuid.uuid4()), "meal_id": meal_id, "food_id": catalog.food_ids[row],
+         "food_name": catalog.names[row], "grams": g, "portion_label": None, "confidence": None,
+         "raw_text": None, "nutrients": catalog.core_dict(vector)}
+        for row, g, vector in zip(rows, grams, vectors)
+    ]
+    return meal, items
+
+
+class StatementRecorder:
+    """記錄引擎執行的 SQL 陳述式與參數"""
+
+    def __init__(self, target):
+        from sqlalchemy import event
+
+        self.statements: List[str] = []
+        self.parameters: List[Any] = []
+        event.listen(target, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        self.parameters.append(parameters)
+
+    def reset(self) -> None:
+        self.statements = []
+        self.parameters = []
+
+    def kinds(self) -> List[str]:
+        """各陳述式的第一個關鍵字（SELECT、INSERT…）"""
+        return [s.lstrip().split(None, 1)[0].upper() for s in self.statements]
+
+    def selects(self) -> List[str]:
+        return [s for s, kind in zip(self.statements, self.kinds()) if kind == "SELECT"]
+
+    def run(self, request: Callable[[], Any]) -> Tuple[Any, List[str]]:
+        """執行請求，回傳 (回應, 期間執行的 SELECT)"""
+        self.reset()
+        response = request()
+        return response, self.selects()
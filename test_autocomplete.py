@@ -0,0 +1,118 @@
+"""
+食物名稱自動完成驗證測試
+========================
+驗證 /nutrition/autocomplete 的前綴比對、排序、筆數上限與空值處理
+
+成功指標：
+- 結果與逐一掃描全部候選（名稱、俗名、別名）再依
+  鍵值長度 → 來源 → 顯示文字長度 → 原始資料順序 排序的結果相同
+- 每筆結果正規化後皆以輸入前綴開頭，同一食物只出現一次
+- 精確名稱排第一；別名前綴（三文 → 三文魚）對應到正確食物
+- 回傳筆數不超過 limit，較小 limit 的結果為較大 limit 的前段
+- 空字串、空白、無法正規化與不存在的前綴回傳空列表
+- API 回應與服務結果相同，參數錯誤回 422；不計入匹配率統計
+
+執行方式：
+python test_autocomplete.py
+"""
+
+import sys
+import os
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import nutrition
+from app.services.food_catalog import normalize_name
+from app.services.nutrition_db_service import get_nutrition_service
+from meal_test_support import check, report
+
+
+PREFIXES = ['雞', '牛', '白飯', '豆腐', '三文', '鮭', '地瓜', '蘋果', '乳', '米']
+EMPTY_PREFIXES = ['', '  ', '　', '(x)', '不存在的食物xyz']
+
+
+def scan_completions(service, prefix, limit):
+    """參考實作：逐一掃描全部候選，依文件排序規則取每個食物排名最高的一筆"""
+    key = normalize_name(prefix)
+    if not key:
+        return []
+    kind_order = service._PREFIX_KIND_ORDER
+    entries = [
+        (k, text, kind, int(row))
+        for k, text, kind, row in zip(service._prefix_keys, service._prefix_texts,
+                                      service._prefix_kinds, service._prefix_rows)
+        if k.startswith(key)
+    ]
+    entries.sort(key=lambda e: (len(e[0]), kind_order[e[2]], len(e[1]), e[3], e[0]))
+    results, seen = [], set()
+    for _, text, kind, row in entries:
+        if row in seen:
+            continue
+        seen.add(row)
+        results.append((text, service.catalog.food_ids[row], kind))
+        if len(results) >= limit:
+            break
+    return results
+
+
+def main():
+    print("=" * 60)
+    print("食物名稱自動完成驗證測試")
+    print("=" * 60)
+
+    service = get_nutrition_service()
+    results = []
+
+    print("\n🔤 前綴比對與排序...")
+    same_as_scan, all_prefixed, unique = True, True, True
+    for prefix in PREFIXES:
+        completions = service.autocomplete(prefix, limit=8)
+        expected = scan_completions(service, prefix, 8)
+        print(f"   {prefix}: {[c['text'] for c in completions]}")
+        same_as_scan &= [(c['text'], c['food_id'], c['matched_field']) for c in completions] == expected
+        all_prefixed &= all(normalize_name(c['text']).startswith(normalize_name(prefix)) for c in completions)
+        unique &= len({c['food_id'] for c in completions}) == len(completions)
+    results.append(check("與逐一掃描全部候選的排序結果相同", same_as_scan))
+    results.append(check("每筆結果皆以前綴開頭", all_prefixed))
+    results.append(check("同一食物只出現一次", unique))
+
+    first = service.autocomplete('白飯', limit=8)[0]
+    salmon = service.autocomplete('三文', limit=8)
+    results.append(check("精確名稱排第一（白飯）", first['text'] == '白飯' and first['matched_field'] == 'name'))
+    results.append(check("別名前綴 三文 → 三文魚（鮭魚）", bool(salmon) and salmon[0]['text'] == '三文魚'
+                         and salmon[0]['matched_field'] == 'alias' and '鮭魚' in salmon[0]['name']))
+
+    print("\n📏 筆數上限...")
+    counts = {limit: service.autocomplete('雞', limit=limit) for limit in (1, 3, 8, 20)}
+    results.append(check("回傳筆數等於 limit（候選足夠時）",
+                         all(len(counts[limit]) == limit for limit in counts)))
+    results.append(check("較小 limit 為較大 limit 的前段",
+                         counts[3] == counts[8][:3] and counts[8] == counts[20][:8]))
+
+    print("\n🚫 空值與不存在的前綴...")
+    results.append(check(f"回傳空列表: {EMPTY_PREFIXES}",
+                         all(service.autocomplete(prefix) == [] for prefix in EMPTY_PREFIXES)))
+
+    print("\n🌐 API...")
+    api = FastAPI()
+    api.include_router(nutrition.router, prefix="/api/v1")
+    client = TestClient(api)
+    before = service.get_stats()['queries']['total_queries']
+    body = client.get("/api/v1/nutrition/autocomplete", params={"prefix": "牛", "limit": 5}).json()
+    results.append(check("回應與服務結果相同",
+                         body['prefix'] == '牛' and body['count'] == 5
+                         and body['results'] == service.autocomplete('牛', limit=5)))
+    invalid = [client.get("/api/v1/nutrition/autocomplete", params=params).status_code
+               for params in ({"prefix": ""}, {"prefix": "雞", "limit": 0}, {"prefix": "雞", "limit": 21}, {})]
+    results.append(check("參數錯誤回 422", invalid == [422, 422, 422, 422]))
+    results.append(check("不計入匹配率統計", service.get_stats()['queries']['total_queries'] == before))
+
+    return report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""
+每日營養素總和驗證測試
+======================
+驗證 daily_nutrient_totals 隨餐點新增 / 刪除在同一交易內更新，
+/meals/summary 只讀取每日總和，結果與逐餐彙總相同
+
+成功指標：
+- /meals/summary 與 /meals/summary/today 的總和、餐數、每日明細與逐餐彙總相同
+- /meals/summary 不查詢 meals 資料表
+- eaten_at 以帶時區的 UTC 寫入與回應（+08:00 輸入換算為同一時間點）
+- fields= 含核心營養素（calories）時不重複計入：新增餐點成功，今日總和與未指定時相同
+- 刪除餐點後扣回，該日無餐點時刪除整列；寫入失敗時總和不變
+- 增量維護的結果與重建（rebuild_daily_totals，資料庫端 GROUP BY）相同
+- meals 的營養素數值欄位與 nutrients JSON 相同；舊資料表可新增欄位並回填
+- 365 天摘要（每天 4 餐）只讀取每日一列（而非逐餐），查詢數與 7 天摘要相同；
+  兩種讀取的耗時只列出供參考，不作為通過條件
+
+執行方式：
+python test_daily_totals.py
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 使用暫存資料庫（需在 import app 之前設定）
+from meal_test_support import use_temp_database
+_workdir = use_temp_database("daily_totals_")
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import IntegrityError
+
+from app.api.v1.endpoints import meals
+from app.db.session import SessionLocal, engine
+from app.init_db import add_meal_nutrient_columns
+from app.models.all_models import DailyNutrientTotal, Meal
+from app.services.daily_totals import (
+    NUTRIENT_KEYS, aggregate_meals, backfill_meal_columns, local_date, read_daily_totals,
+    rebuild_daily_totals, totals_dict,
+)
+from app.services.food_alignment_service import get_food_alignment_service
+from meal_test_support import (
+    StatementRecorder, best_of, check, food_ids as aligned_food_ids, make_client, meal_rows, register, report,
+)
+
+
+YEAR_MEALS_PER_DAY = 4
+
+
+def reference_summary(db, user_id, days):
+    """對照組：逐餐讀取 nutrients JSON 彙總（舊做法，以相同的日曆日區間）"""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    daily = {}
+    for meal in db.query(Meal).filter(Meal.user_id == user_id).order_by(Meal.eaten_at.asc()).all():
+        day = local_date(meal.eaten_at)
+        if day >= since:
+            daily.setdefault(day.isoformat(), []).append(meal.nutrients or {})
+    every = [n for items in daily.values() for n in items]
+    return {
+        "total_meals": len(every),
+        "total_nutrients": meals._sum_nutrients(every),
+        "daily_breakdown": [{day: meals._sum_nutrients(items)} for day, items in daily.items()],
+    }
+
+
+def same_summary(response, expected):
+    breakdown = response['daily_breakdown']
+    return (
+        response['total_meals'] == expected['total_meals']
+        and all(abs(response['total_nutrients'][k] - expected['total_nutrients'][k]) < 1e-3 for k in NUTRIENT_KEYS)
+        and [list(e) for e in breakdown] == [list(e) for e in expected['daily_breakdown']]
+        and all(abs(got[day][k] - want[day][k]) < 1e-3
+                for got, want in zip(breakdown, expected['daily_breakdown'])
+                for day in got for k in NUTRIENT_KEYS)
+    )
+
+
+def snapshot(db, user_id):
+    rows = db.query(DailyNutrientTotal).filter(DailyNutrientTotal.user_id == user_id).all()
+    return {
+        (r.local_date, r.meal_count): tuple(round(getattr(r, k), 6) for k in NUTRIENT_KEYS)
+        for r in rows
+    }
+
+
+def main():
+    print("=" * 60)
+    print("每日營養素總和驗證測試")
+    print("=" * 60)
+
+    client = make_client()
+    recorder = StatementRecorder(engine)
+
+    results = []
+    alignment = get_food_alignment_service()
+    food_ids = aligned_food_ids()
+
+    print("\n🍱 新增餐點（跨 10 天，含帶時區的時間）...")
+    headers, user_id = register(client, "Daily")
+    now = datetime.utcnow()
+    created, sent = [], []
+    for i in range(24):
+        eaten_at = now - timedelta(hours=11 * i)
+        if i % 5 == 0:
+            eaten_at = eaten_at.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=8)))
+        payload = {
+            "items": [{"food_id": food_ids[(i + j) % len(food_ids)], "grams": 60 + 25 * j} for j in range(1 + i % 3)],
+            "eaten_at": eaten_at.isoformat(),
+        }
+        meal = client.post("/api/v1/meals", json=payload, headers=headers).json()
+        created.append(meal['meal_id'])
+        sent.append((meal['eaten_at'], eaten_at.replace(tzinfo=eaten_at.tzinfo or timezone.utc)))
+    listed = {m['meal_id']: m['eaten_at'] for m in client.get(
+        "/api/v1/meals", headers=headers, params={"limit": 100}).json()}
+    results.append(check("eaten_at 回應為帶時區的 UTC（新增與列表相同）", all(
+        returned.endswith("Z") and datetime.fromisoformat(returned) == instant
+        and listed[meal_id] == returned for meal_id, (returned, instant) in zip(created, sent))))
+
+    with SessionLocal() as db:
+        for days in (1, 3, 30):
+            expected = reference_summary(db, user_id, days)
+            recorder.reset()
+            summary = client.get("/api/v1/meals/summary", headers=headers, params={"days": days}).json()
+            results.append(check(f"days={days} 與逐餐彙總相同", same_summary(summary, expected)))
+        results.append(check("/meals/summary 不查詢 meals", not any("FROM meals" in s for s in recorder.statements)))
+
+        today = client.get("/api/v1/meals/summary/today", headers=headers).json()
+        expected = reference_summary(db, user_id, 1)
+        results.append(check("今日總和與餐數相同", today['total_meals'] == expected['total_meals'] == len(today['meals'])
+                             and all(abs(today['total_nutrients'][k] - expected['total_nutrients'][k]) < 1e-3
+                                     for k in NUTRIENT_KEYS)))
+
+        projected = client.get("/api/v1/meals/summary/today", headers=headers,
+                               params={"fields": "calories,iron"}).json()
+        results.append(check("fields=calories 時今日總和不重複計入核心營養素",
+                             all(projected['total_nutrients'][k] == today['total_nutrients'][k] for k in NUTRIENT_KEYS)
+                             and 'iron' in projected['total_nutrients']))
+
+    print("\n🧾 fields= 含核心營養素時新增餐點...")
+    core_headers, _ = register(client, "CoreFields")
+    payload = {"items": [{"food_id": food_ids[0], "grams": 150}, {"food_id": food_ids[1], "grams": 80}]}
+    plain = client.post("/api/v1/meals", json=payload, headers=headers)
+    with_core = client.post("/api/v1/meals", json=payload, headers=core_headers, params={"fields": "calories,iron"})
+    body = with_core.json() if with_core.status_code == 200 else {}
+    results.append(check("fields=calories,iron 新增成功且熱量與未指定時相同",
+                         with_core.status_code == 200
+                         and body['nutrients']['calories'] == plain.json()['nutrients']['calories']
+                         and all('iron' in item['nutrients'] for item in body['items'])))
+    client.delete(f"/api/v1/meals/{plain.json()['meal_id']}", headers=headers)
+
+    print("\n🗑️  刪除餐點...")
+    for meal_id in created[::2]:
+        client.delete(f"/api/v1/meals/{meal_id}", headers=headers)
+    with SessionLocal() as db:
+        expected = reference_summary(db, user_id, 30)
+        summary = client.get("/api/v1/meals/summary", headers=headers, params={"days": 30}).json()
+        results.append(check("刪除後與逐餐彙總相同", same_summary(summary, expected)))
+
+        lone = client.post("/api/v1/meals", headers=headers, json={
+            "items": [{"food_id": food_ids[0], "grams": 100}],
+            "eaten_at": (now - timedelta(days=20)).isoformat()}).json()
+        day = local_date(now - timedelta(days=20))
+        had_row = db.get(DailyNutrientTotal, (user_id, day)) is not None
+        client.delete(f"/api/v1/meals/{lone['meal_id']}", headers=headers)
+        db.expire_all()
+        results.append(check("該日無餐點時刪除整列", had_row and db.get(DailyNutrientTotal, (user_id, day)) is None))
+
+        before = snapshot(db, user_id)
+        duplicate = {"id": created[1], "user_id": user_id, "source": "manual", "note": None,
+                     "eaten_at": now, "nutrients": {"calories": 500.0}}
+        try:
+            meals._insert_meal(db, duplicate, [])
+            failed = False
+        except IntegrityError:
+            db.rollback()
+            failed = True
+        results.append(check("寫入失敗時總和不變", failed and snapshot(db, user_id) == before))
+
+        stored = db.query(Meal).filter(Meal.user_id == user_id).all()
+        results.append(check("meals 數值欄位與 nutrients JSON 相同", all(
+            abs(getattr(meal, k) - (meal.nutrients.get(k) or 0)) < 1e-9 for meal in stored for k in NUTRIENT_KEYS)))
+
+        grouped = {(row.local_date, row.meal_count): tuple(round(getattr(row, k), 6) for k in NUTRIENT_KEYS)
+                   for row in aggregate_meals(db, user_id)}
+        results.append(check("資料庫端 GROUP BY 與每日總和相同", grouped == snapshot(db, user_id)))
+
+        incremental = snapshot(db, user_id)
+        rebuilt_rows = rebuild_daily_totals(db, user_id)
+        results.append(check("增量維護與重建結果相同", snapshot(db, user_id) == incremental
+                             and rebuilt_rows == len(incremental)))
+
+    print(f"\n⏱️  365 天摘要（每天 {YEAR_MEALS_PER_DAY} 餐）...")
+    headers, year_user = register(client, "Daily")
+    catalog = alignment.catalog
+    rows = catalog.rows_of(food_ids)
+    with SessionLocal() as db:
+        for day in range(365):
+            for n in range(YEAR_MEALS_PER_DAY):
+                picked = [rows[(day + n + j) % len(rows)] for j in range(3)]
+                meals._insert_meal(db, *meal_rows(catalog, year_user, picked, [120.0, 80.0, 50.0],
+                                                  now - timedelta(days=day, hours=3 * n)))
+
+        expected = reference_summary(db, year_user, 365)
+        since = datetime.utcnow().date() - timedelta(days=364)
+        daily_rows = len(read_daily_totals(db, year_user, since))
+        scan = best_of(lambda: reference_summary(db, year_user, 365))
+        rollup = best_of(lambda: [totals_dict(row) for row in read_daily_totals(db, year_user, since)])
+    summary = client.get("/api/v1/meals/summary", headers=headers, params={"days": 365}).json()
+    print(f"   讀取資料列: 逐餐 {expected['total_meals']} 餐 → 每日總和 {daily_rows} 列")
+    print(f"   逐餐讀取 JSON 彙總 {scan * 1000:.1f}ms → 讀取每日總和 {rollup * 1000:.1f}ms（僅供參考）")
+    results.append(check("365 天結果相同", same_summary(summary, expected)
+                         and len(summary['daily_breakdown']) <= 365))
+    results.append(check("每日只讀取一列（列數為天數，不隨每日餐數增加）",
+                         daily_rows == len(summary['daily_breakdown']) <= 365
+                         and expected['total_meals'] > daily_rows * (YEAR_MEALS_PER_DAY - 1)))
+    queries = {}
+    for days in (7, 365):
+        recorder.reset()
+        client.get("/api/v1/meals/summary", headers=headers, params={"days": days})
+        queries[days] = len(recorder.statements)
+    print(f"   GET /meals/summary 陳述式數: 7 天 {queries[7]} / 365 天 {queries[365]}")
+    results.append(check("365 天與 7 天的查詢數相同", queries[7] == queries[365]))
+
+    print("\n🧱 舊 meals 資料表遷移...")
+    legacy_engine = create_engine(f"sqlite:///{os.path.join(_workdir, 'legacy.db')}")
+    with legacy_engine.begin() as conn:
+        conn.execute(text("CREATE TABLE meals (id VARCHAR PRIMARY KEY, user_id VARCHAR, source VARCHAR, "
+                          "note VARCHAR, eaten_at DATETIME, nutrients JSON, created_at DATETIME)"))
+        for i in range(2500):
+            conn.execute(text("INSERT INTO meals (id, user_id, eaten_at, nutrients) VALUES (:id, 'u', :at, :n)"),
+                         {"id": f"m{i}", "at": now - timedelta(hours=i),
+                          "n": '{"calories": %d, "protein": 1.5, "sodium": null}' % i})
+    added = add_meal_nutrient_columns(legacy_engine)
+    with sessionmaker(bind=legacy_engine)() as db:
+        filled = backfill_meal_columns(db)
+        again = backfill_meal_columns(db)
+        sums = db.execute(text("SELECT SUM(calories), SUM(protein), SUM(sodium), COUNT(*) FROM meals")).one()
+    results.append(check("新增欄位並回填所有餐點（重複執行不再更新）",
+                         added == NUTRIENT_KEYS and filled == 2500 and again == 0
+                         and add_meal_nutrient_columns(legacy_engine) == []))
+    results.append(check("回填數值與 JSON 相同", tuple(sums) == (sum(range(2500)), 1.5 * 2500, 0.0, 2500)))
+    legacy_engine.dispose()
+
+    engine.dispose()
+    return report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
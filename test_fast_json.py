@@ -0,0 +1,199 @@
+"""
+快速 JSON 輸出路徑驗證測試
+==========================
+驗證 FAST_JSON_RESPONSES=true 時高流量讀取端點輸出與預設（Pydantic）路徑相同，
+並列出每 1,000 餐的序列化時間（僅供參考，不作為通過條件）
+
+成功指標：
+- /meals（含 fields=）、/meals/summary、/nutrition/search、/users/me/dashboard
+  兩種路徑回應的位元組完全相同（預設路徑為標準 json 編碼）
+- 1,000 餐序列化兩種路徑的位元組完全相同
+
+執行方式：
+python test_fast_json.py
+"""
+
+import sys
+import os
+import json
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+# 使用暫存資料庫（需在 import app 之前設定）
+_workdir = tempfile.mkdtemp(prefix="fast_json_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ.setdefault("GEMINI_API_KEY", "dummy")
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.models.all_models  # noqa: F401  註冊資料表
+from app.api import responses
+from app.api.responses import FastJSONResponse
+from app.api.v1.endpoints import auth, meals, nutrition, users
+from app.core.config import settings
+from app.db.session import Base, SessionLocal, engine
+from app.models.all_models import HealthRecord, Meal, MealItem
+from app.schemas.meal import MealResponse
+from app.services.food_alignment_service import get_food_alignment_service
+from meal_test_support import check, report
+
+
+BENCH_MEALS = 1000
+ITEMS_PER_MEAL = 3
+ROUNDS = 10
+FOODS = ['白飯', '雞胸肉', '高麗菜', '豆腐', '鮭魚', '蘋果', '地瓜葉', '牛奶']
+SEARCHES = [('雞', {}), ('白飯', {'fields': 'iron,calcium'}), ('雞', {'ranked': 'true', 'limit': 20}), ('不存在的食物', {})]
+
+
+def both_paths(client, url, headers=None, params=None):
+    """同一請求分別以預設與快速路徑取得（狀態碼, 回應位元組）"""
+    outputs = []
+    for fast in (False, True):
+        settings.FAST_JSON_RESPONSES = fast
+        response = client.get(url, headers=headers, params=params)
+        outputs.append((response.status_code, response.content))
+    settings.FAST_JSON_RESPONSES = False
+    return outputs
+
+
+def add_health_records(user_id):
+    """建立 3 筆健檢紀錄（含異常值、非數值與無參考範圍的欄位）"""
+    with SessionLocal() as db:
+        for i in range(3):
+            db.add(HealthRecord(
+                user_id=user_id, health_score=70 + i,
+                created_at=datetime(2026, 1, 1 + i, 8, 0, 0),
+                clinical_data={
+                    "GLUCOSE": {"value": 95 + 20 * i, "unit": "mg/dL", "reference_range": "70-100"},
+                    "HbA1c": {"value": 5.4 + 0.3 * i, "unit": "%", "reference_range": "<5.7", "status": "normal"},
+                    "TG": {"value": 180, "unit": "mg/dL", "reference_range": "<150", "status": "high"},
+                    "LDL": {"value": "陰性", "unit": None},
+                    "eGFR": {"value": 88.5},
+                },
+                ai_analysis={"summary": f"第 {i + 1} 次報告", "score": 70 + i} if i == 2 else {},
+            ))
+        db.commit()
+
+
+def build_bench_meals(catalog) -> List[Meal]:
+    """建立 1,000 餐（不寫入資料庫），營養素與實際儲存格式相同"""
+    rows = catalog.rows_of([get_food_alignment_service().align(name, limit=1)[0]['food_id'] for name in FOODS])
+    now = datetime(2026, 1, 1, 12, 0, 0)
+    bench = []
+    for i in range(BENCH_MEALS):
+        picked = [rows[(i + j) % len(rows)] for j in range(ITEMS_PER_MEAL)]
+        grams = [50.0 + (i * 7 + j * 13) % 200 for j in range(ITEMS_PER_MEAL)]
+        vectors, total = catalog.compute_rows(picked, grams)
+        meal = Meal(id=str(uuid.uuid4()), user_id="bench-user", eaten_at=now - timedelta(minutes=37 * i),
+                    source="manual", note=None if i % 3 else "午餐", nutrients=catalog.core_dict(total))
+        meal.items = [
+            MealItem(id=str(uuid.uuid4()), meal_id=meal.id, food_id=catalog.food_ids[row],
+                     food_name=catalog.names[row], grams=g, portion_label=None,
+                     confidence=0.9 if j == 0 else None, nutrients=catalog.core_dict(vector))
+            for j, (row, g, vector) in enumerate(zip(picked, grams, vectors))
+        ]
+        bench.append(meal)
+    return bench
+
+
+def best_of(client, urls):
+    """交錯執行各路徑，回傳每個路徑的最佳時間與最後一次回應"""
+    timings = {url: [] for url in urls}
+    responses = {}
+    for _ in range(ROUNDS):
+        for url in urls:
+            start = time.perf_counter()
+            responses[url] = client.get(url)
+            timings[url].append(time.perf_counter() - start)
+    return [(min(timings[url]), responses[url]) for url in urls]
+
+
+def main():
+    print("=" * 60)
+    print("快速 JSON 輸出路徑驗證測試")
+    print("=" * 60)
+    print(f"   orjson: {'已安裝' if responses.orjson is not None else '未安裝（改用標準 json）'}")
+
+    Base.metadata.create_all(bind=engine)
+    api = FastAPI()
+    api.include_router(auth.router, prefix="/api/v1/auth")
+    api.include_router(nutrition.router, prefix="/api/v1")
+    api.include_router(meals.router, prefix="/api/v1")
+    api.include_router(users.router, prefix="/api/v1/users")
+    client = TestClient(api)
+
+    results = []
+
+    print("\n🔍 兩種路徑輸出一致...")
+    register = client.post("/api/v1/auth/register", json={
+        "email": f"fast{uuid.uuid4().hex[:8]}@example.com", "password": "pass1234", "name": "Fast"})
+    headers = {"Authorization": f"Bearer {register.json()['access_token']}"}
+    alignment = get_food_alignment_service()
+    food_ids = [alignment.align(name, limit=1)[0]['food_id'] for name in FOODS]
+    for i in range(30):
+        payload = {
+            "items": [{"food_id": food_ids[(i + j) % len(food_ids)], "grams": 80 + 15 * j,
+                       "confidence": 0.8 if j else None} for j in range(1 + i % 3)],
+            "note": "晚餐" if i % 4 == 0 else None,
+            "eaten_at": (datetime.utcnow() - timedelta(hours=9 * i, microseconds=i)).isoformat(),
+        }
+        client.post("/api/v1/meals", json=payload, headers=headers)
+
+    for label, url, params in [
+        ("/meals", "/api/v1/meals", {"limit": 100}),
+        ("/meals?fields=iron,calcium", "/api/v1/meals", {"limit": 100, "fields": "iron,calcium"}),
+        ("/meals/summary", "/api/v1/meals/summary", {"days": 30}),
+    ]:
+        default, fast = both_paths(client, url, headers, params)
+        results.append(check(f"{label} 相同", default == fast and default[0] == 200))
+
+    profile = client.post("/api/v1/users/", headers=headers, json={
+        "name": f"Fast{uuid.uuid4().hex[:8]}", "age": 40, "gender": "female", "height_cm": 160.0, "weight_kg": 58.5})
+    add_health_records(profile.json()['id'])
+    default, fast = both_paths(client, "/api/v1/users/me/dashboard", headers)
+    dashboard = json.loads(default[1])
+    results.append(check("/users/me/dashboard 相同（3 筆歷史、含異常項目與 AI 報告）",
+                         default == fast and default[0] == 200 and len(dashboard['history']) == 3
+                         and dashboard['abnormal_items'] and dashboard['ai_report'] is not None))
+    search_same = all(
+        (lambda pair: pair[0] == pair[1] and pair[0][0] == 200)(
+            both_paths(client, "/api/v1/nutrition/search", params={"q": q, **extra}))
+        for q, extra in SEARCHES
+    )
+    results.append(check("/nutrition/search 相同", search_same))
+
+    print(f"\n⏱️  每 {BENCH_MEALS:,} 餐序列化時間（{ITEMS_PER_MEAL} 品項/餐，取 {ROUNDS} 次最佳）...")
+    catalog = alignment.catalog
+    bench = build_bench_meals(catalog)
+    empty = [{}] * ITEMS_PER_MEAL
+    bench_app = FastAPI()
+
+    @bench_app.get("/before", response_model=List[MealResponse])
+    def before():
+        return [meals._meal_response(meal, empty, {}) for meal in bench]
+
+    @bench_app.get("/after", response_model=List[MealResponse])
+    def after():
+        return FastJSONResponse([meals._meal_payload(meal, empty, {}) for meal in bench])
+
+    bench_client = TestClient(bench_app)
+    (slow, slow_response), (fast, fast_response) = best_of(bench_client, ["/before", "/after"])
+    print(f"   Pydantic 模型 + response_model 驗證 + json: {slow * 1000:.1f}ms")
+    print(f"   預先整理 dict + {'orjson' if responses.orjson is not None else 'json'}:          {fast * 1000:.1f}ms")
+    print(f"   加速 {slow / fast:.1f}x（僅供參考）")
+    results.append(check(f"{BENCH_MEALS:,} 餐輸出位元組相同", slow_response.content == fast_response.content
+                         and len(fast_response.json()) == BENCH_MEALS))
+
+    engine.dispose()
+    return report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+食物名稱對齊驗證測試
+====================
+驗證兩階段對齊（候選剪枝 + 重排）與逐筆掃描結果一致，
+以及 get_many 批次查詢的順序與查無結果處理
+
+成功指標：
+- 黃金集 Recall@5 = 100%（與逐筆掃描相同）
+- p99 對齊時間 < 1ms
+- get_many 回傳順序與輸入相同（含重複 id），每筆與 get_food_nutrients 及
+  CSV 原始值相同（空值為 0）；空字串、None 與不存在的 id 在原位置回傳 None
+
+執行方式：
+python test_food_alignment.py
+"""
+
+import sys
+import os
+import random
+import time
+
+import pandas as pd
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.food_alignment_service import FoodAlignmentService
+from app.services.food_catalog import CORE_NUTRIENTS
+from app.services.food_snapshot import default_csv_path
+
+
+# 黃金集：常見食物、拍照辨識常見輸出、錯字與長描述
+GOLDEN_QUERIES = [
+    '白飯', '糙米飯', '麵條', '吐司', '饅頭',
+    '雞胸肉', '雞蛋', '豆腐', '鮭魚', '豬肉',
+    '菠菜', '高麗菜', '花椰菜', '番茄', '紅蘿蔔',
+    '蘋果', '香蕉', '柳橙', '芭樂', '奇異果',
+    '滷肉飯', '牛肉麵', '珍珠奶茶', '燙青菜', '荷包蛋',
+    '烤雞腿', '炒高麗菜', '地瓜', '豆漿', '無糖優格',
+    '雞', '魚', '米', '蛋', '麵',
+    '蕃茄炒蛋', '青花菜', '三文魚', '鳳梨', '西瓜',
+    'Chicken breast', '白米 飯', '鮭魚(生)', '香蕉-熟', '牛奶/全脂',
+]
+MISSING_IDS = ['', None, 'NOT-A-FOOD', 'a0100101']
+
+
+def csv_records():
+    """整合編號 → 由 CSV 直接組成的每 100g 營養紀錄（空值為 0）"""
+    df = pd.read_csv(default_csv_path(), encoding="utf-8")
+    return {
+        str(row["整合編號"]): {
+            "food_id": str(row["整合編號"]),
+            "name": str(row["樣品名稱"]),
+            "category": str(row["食品分類"]),
+            "per_100g": {key: 0.0 if pd.isna(row[col]) else float(row[col]) for key, col in CORE_NUTRIENTS.items()},
+        }
+        for _, row in df.iterrows()
+    }
+
+
+def check_get_many(service):
+    """get_many 的順序、重複 id 與查無結果"""
+    expected = csv_records()
+    rng = random.Random(4)
+    food_ids = rng.sample(sorted(expected), 200)
+    food_ids += food_ids[:20]
+    rng.shuffle(food_ids)
+    batch = service.get_many(food_ids)
+    in_order = [r['food_id'] if r else None for r in batch] == food_ids
+    same_values = batch == [expected[fid] for fid in food_ids] == [service.get_food_nutrients(f) for f in food_ids]
+    print(f"   {len(food_ids)} 筆（含 20 筆重複）順序相同: {in_order}，與 CSV 相同: {same_values}")
+
+    mixed = food_ids[:3] + MISSING_IDS + food_ids[3:6]
+    got = service.get_many(mixed)
+    misses = ([fid for fid, r in zip(mixed, got) if r is None] == MISSING_IDS
+              and [r['food_id'] for r in got if r] == food_ids[:6])
+    print(f"   查無結果 {MISSING_IDS} 在原位置回傳 None: {misses}")
+    empty = service.get_many([]) == []
+    return in_order and same_values and misses and empty
+
+
+def main():
+    print("=" * 60)
+    print("食物名稱對齊驗證測試")
+    print("=" * 60)
+
+    service = FoodAlignmentService()
+    service.align('預熱')
+
+    # Recall@5
+    print("\n🔍 黃金集 Recall@5（對照逐筆掃描）...")
+    print("-" * 60)
+    hit = 0
+    total = 0
+    mismatches = []
+    for query in GOLDEN_QUERIES:
+        expected = [r['food_id'] for r in service._align_full_scan(query, limit=5)]
+        actual = [r['food_id'] for r in service.align(query, limit=5)]
+        hit += len(set(expected) & set(actual))
+        total += len(expected)
+        if expected != actual:
+            mismatches.append(query)
+    recall = hit / total * 100 if total else 100.0
+    print(f"   Recall@5: {recall:.1f}% ({hit}/{total})")
+    print(f"   排序完全一致: {len(GOLDEN_QUERIES) - len(mismatches)}/{len(GOLDEN_QUERIES)}")
+    for query in mismatches:
+        print(f"   ❌ {query}")
+
+    # 延遲
+    print("\n⏱️  對齊效能測試...")
+    timings = []
+    for _ in range(5):
+        for query in GOLDEN_QUERIES:
+            start = time.perf_counter()
+            service.align(query, limit=5)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p50 = timings[len(timings) // 2]
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"   p50: {p50:.3f}ms, p99: {p99:.3f}ms")
+
+    # 批次查詢
+    print("\n📦 get_many 批次查詢...")
+    batch_ok = check_get_many(service)
+
+    print("\n" + "=" * 60)
+    indicator1 = recall >= 100.0
+    indicator2 = p99 < 1.0
+    print(f"✓ 指標 1 - Recall@5: {recall:.1f}% {'✅ PASS' if indicator1 else '❌ FAIL'}")
+    print(f"✓ 指標 2 - p99 延遲: {p99:.3f}ms {'✅ PASS' if indicator2 else '❌ FAIL'}")
+    print(f"✓ 指標 3 - get_many 順序與查無結果 {'✅ PASS' if batch_ok else '❌ FAIL'}")
+    print("=" * 60)
+
+    return 0 if indicator1 and indicator2 and batch_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+食品目錄資料表型別化驗證測試
+============================
+驗證 apply_schema 型別化後的資料表與營養素矩陣與 pd.read_csv 的值完全相同，
+以及記憶體報告可正常產生
+
+成功指標：
+- 營養素欄位維持 float64，所有值（含空值位置）與 read_csv 相同
+- 文字欄位的值相同，食品分類為 category 型別；只捨棄未使用的文字欄位
+- 目錄的資料表只保留文字欄位（與 apply_schema(read_csv) 的文字欄位相同），營養素只存在矩陣中
+- 營養素矩陣與 read_csv 的值完全相同（空值為 0），搜尋輸出與來源值四捨五入一致
+- memory_report 各結構為非負整數，private_bytes 為各項總和
+
+執行方式：
+python test_food_catalog_schema.py
+"""
+
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.food_catalog import CATEGORY_COLUMNS, CORE_NUTRIENTS, TEXT_COLUMNS, apply_schema, get_food_catalog
+from app.services.food_snapshot import default_csv_path
+from app.services.nutrition_db_service import get_nutrition_service
+from meal_test_support import check, report
+
+
+def same_frame(left, right):
+    try:
+        pd.testing.assert_frame_equal(left, right, check_exact=True)
+        return True
+    except AssertionError as e:
+        print(f"      {str(e).splitlines()[0]}")
+        return False
+
+
+def main():
+    print("=" * 60)
+    print("食品目錄資料表型別化驗證測試")
+    print("=" * 60)
+
+    results = []
+    raw = pd.read_csv(default_csv_path(), encoding="utf-8")
+    typed = apply_schema(raw)
+    numeric = [col for col in raw.columns if pd.api.types.is_numeric_dtype(raw[col])]
+    text = [col for col in raw.columns if col not in numeric]
+
+    print("\n🔢 apply_schema...")
+    results.append(check(f"{len(numeric)} 個營養素欄位皆為 float64",
+                         all(typed[col].dtype == np.float64 for col in numeric)))
+    results.append(check("營養素數值與 read_csv 完全相同（含空值）", same_frame(typed[numeric], raw[numeric])))
+    kept = [col for col in text if col in TEXT_COLUMNS]
+    results.append(check("文字欄位的值相同，食品分類為 category",
+                         same_frame(typed[kept].astype(object), raw[kept].astype(object))
+                         and all(isinstance(typed[col].dtype, pd.CategoricalDtype) for col in CATEGORY_COLUMNS)))
+    results.append(check(f"只捨棄未使用的欄位: {sorted(set(raw.columns) - set(typed.columns))}",
+                         list(typed.columns) == [col for col in raw.columns if col in numeric or col in TEXT_COLUMNS]))
+
+    catalog = get_food_catalog()
+    results.append(check("目錄資料表只保留文字欄位，營養素只存在矩陣中",
+                         same_frame(catalog.df, typed[kept])
+                         and not set(catalog.df.columns) & set(catalog.nutrient_columns)))
+
+    print("\n🎯 營養素矩陣精度...")
+    expected = raw[catalog.nutrient_columns].fillna(0).to_numpy(dtype=np.float64)
+    mismatched = int((catalog.values(slice(None)) != expected).sum())
+    results.append(check(f"矩陣與 read_csv 完全相同（不符 {mismatched} 格）",
+                         catalog.nutrient_matrix.dtype == np.float64 and mismatched == 0))
+    source = raw[raw['樣品名稱'] == '台灣藜(紅)(帶殼)'].iloc[0]
+    hit = next(r for r in get_nutrition_service().search('台灣藜', limit=20) if r['name'] == '台灣藜(紅)(帶殼)')
+    print(f"   台灣藜(紅)(帶殼) 鉀: 來源 {source['鉀(mg)']} → 搜尋 {hit['per_100g']['potassium']}")
+    results.append(check("搜尋輸出與來源值四捨五入到 1 位相同", all(
+        hit['per_100g'][key] == round(float(source[col]), 1) for key, col in CORE_NUTRIENTS.items())))
+
+    print("\n🧮 記憶體報告...")
+    memory = get_nutrition_service().memory_report()
+    sections = {**memory['catalog'], **memory['search_index']}
+    for name, size in sections.items():
+        print(f"   {name:22s} {size / 1024:10.1f} KB")
+    results.append(check("各結構為非負整數", all(isinstance(v, int) and v >= 0 for v in sections.values())
+                         and memory['catalog']['dataframe'] > 0))
+    results.append(check("private_bytes 為各項總和", memory['private_bytes'] == sum(sections.values())))
+
+    return report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+食品資料庫熱更新驗證測試
+========================
+驗證不重啟即可替換食品資料庫：背景建立新目錄與索引後一次替換服務參考
+
+成功指標：
+- 內容變更後版本識別碼改變，新請求取得新資料；內容未變更時不替換
+- 已取得舊服務的請求在替換後仍以舊版本完成
+- 熱更新期間持續查詢不出錯，每筆結果皆來自完整的某一版本
+- 載入失敗時保留舊版本；檔案監看偵測到變更自動重新載入
+- 管理端點需權杖，/nutrition/health 回報版本；重新載入回報只涵蓋處理請求的 worker
+
+執行方式：
+python test_food_reload.py
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.api.v1.endpoints import nutrition
+from app.services.food_catalog import get_food_catalog
+from app.services.food_snapshot import default_csv_path
+from app.services.food_alignment_service import get_food_alignment_service
+from app.services.food_reload import FoodDatabaseWatcher, reload_food_database
+from app.services.nutrition_db_service import get_nutrition_service
+from meal_test_support import check, report
+
+
+def write_variant(source, target, calories):
+    """白飯熱量改為指定值（其餘資料不變）"""
+    df = pd.read_csv(source, encoding="utf-8")
+    df.loc[df['樣品名稱'] == '白飯', '熱量(kcal)'] = calories
+    # 先寫暫存檔再替換（部署更新資料檔時也應如此，避免監看讀到寫到一半的檔案）
+    df.to_csv(target + ".tmp", index=False, encoding="utf-8")
+    os.replace(target + ".tmp", target)
+
+
+def rice_calories(service):
+    return service.search('白飯', limit=1)[0]['per_100g']['calories']
+
+
+def main():
+    print("=" * 60)
+    print("食品資料庫熱更新驗證測試")
+    print("=" * 60)
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix="food_reload_")
+    csv_path = os.path.join(workdir, "foods.csv")
+    shutil.copyfile(default_csv_path(), csv_path)
+
+    try:
+        print("\n🔄 版本與替換...")
+        original = get_nutrition_service()
+        base_calories = rice_calories(original)
+        result = reload_food_database(csv_path)
+        results.append(check("內容相同時不替換", not result['changed'] and get_nutrition_service() is original))
+
+        write_variant(default_csv_path(), csv_path, 999)
+        result = reload_food_database(csv_path)
+        service = get_nutrition_service()
+        results.append(check("內容變更後版本改變", result['changed'] and service.catalog.version == result['version']))
+        results.append(check("新請求取得新資料", rice_calories(service) == 999))
+        results.append(check("舊服務參考仍回傳舊資料", rice_calories(original) == base_calories))
+        results.append(check("對齊服務與共用目錄一併替換",
+                             get_food_alignment_service().catalog is service.catalog is get_food_catalog()))
+        results.append(check("查詢統計延續", service.get_stats()['queries']['total_queries'] >= 3))
+
+        print("\n🧵 熱更新期間持續查詢...")
+        errors = []
+        seen = {}
+        stop = threading.Event()
+
+        def worker():
+            while not stop.is_set():
+                try:
+                    current = get_nutrition_service()
+                    calories = rice_calories(current)
+                    seen.setdefault(current.catalog.version, set()).add(calories)
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for calories in (111, 222, 333):
+            write_variant(default_csv_path(), csv_path, calories)
+            reload_food_database(csv_path)
+            time.sleep(0.05)
+        stop.set()
+        for t in threads:
+            t.join()
+        results.append(check("查詢不出錯", not errors))
+        results.append(check("每個版本只對應一種資料", all(len(v) == 1 for v in seen.values())))
+        print(f"   觀察到 {len(seen)} 個版本")
+
+        print("\n🛡️  載入失敗保留舊版本...")
+        version = get_nutrition_service().catalog.version
+        try:
+            reload_food_database(os.path.join(workdir, "missing.csv"))
+            failed = False
+        except ValueError:
+            failed = True
+        results.append(check("回報錯誤且版本不變", failed and get_nutrition_service().catalog.version == version))
+
+        print("\n👀 檔案監看...")
+        watcher = FoodDatabaseWatcher(csv_path, interval=0.05)
+        watcher.start()
+        write_variant(default_csv_path(), csv_path, 444)
+        deadline = time.time() + 30
+        while watcher.reloads == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        watcher.stop()
+        results.append(check("偵測到變更並重新載入", rice_calories(get_nutrition_service()) == 444))
+
+        print("\n🌐 API...")
+        app = FastAPI()
+        app.include_router(nutrition.router, prefix="/api/v1")
+        client = TestClient(app)
+        token = settings.ADMIN_API_TOKEN
+        settings.ADMIN_API_TOKEN = "secret"
+        try:
+            health = client.get("/api/v1/nutrition/health").json()
+            search = client.get("/api/v1/nutrition/search", params={"q": "白飯"}).json()
+            version = get_nutrition_service().catalog.version
+            results.append(check("health 與 search 回報版本",
+                                 health['catalog_version'] == search['catalog_version'] == version))
+            results.append(check("權杖錯誤回 401", client.post(
+                "/api/v1/nutrition/admin/reload", headers={"X-Admin-Token": "wrong"}).status_code == 401))
+            response = client.post("/api/v1/nutrition/admin/reload", params={"force": "true"},
+                                   headers={"X-Admin-Token": "secret"})
+            body = response.json()
+            results.append(check("權杖正確可強制重建", response.status_code == 200 and body['version'] == version))
+            results.append(check("回報範圍為處理請求的 worker",
+                                 body['scope'] == 'worker' and body['worker_pid'] == os.getpid()
+                                 and isinstance(body['shared_segment'], bool)))
+        finally:
+            settings.ADMIN_API_TOKEN = token
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
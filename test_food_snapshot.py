@@ -0,0 +1,200 @@
+"""
+食品資料庫二進位快照驗證測試
+============================
+驗證 CSV 編譯出的快照與 pd.read_csv 的資料表完全相同，
+以及 CSV 變更、快照損毀或版本不符時 load_food_table 退回讀取 CSV
+
+成功指標：
+- 快照 meta 記錄 CSV 的 SHA-256 與筆數
+- load_snapshot 的資料表（欄位、順序、型別、值、空值）與 read_csv 完全相同
+- 快照新鮮時 load_food_table 由快照載入
+- 食品目錄由快照載入時營養素矩陣維持唯讀 mmap（不複製）、不重新正規化名稱，
+  內容與讀取 CSV 建立的目錄完全相同（冷啟動耗時只列出供參考）
+- 修改 CSV 後快照過期，load_food_table 改讀 CSV 並取得修改後的值；重新編譯後恢復使用快照
+- 快照版本不符或檔案損毀時退回 CSV；只帶快照、不帶 CSV 時仍可載入
+
+執行方式：
+python test_food_snapshot.py
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import pandas as pd
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services import food_catalog, food_snapshot
+from app.services.food_catalog import FoodCatalog
+from app.services.food_snapshot import (
+    build_snapshot,
+    default_csv_path,
+    file_sha256,
+    is_snapshot_fresh,
+    load_food_table,
+    load_snapshot,
+    read_snapshot_meta,
+)
+from meal_test_support import check, report
+
+
+EDITED_FOOD = '台灣藜(紅)(帶殼)'
+EDITED_COLUMN = '鉀(mg)'
+
+
+def same_frame(left, right):
+    try:
+        pd.testing.assert_frame_equal(left, right, check_exact=True)
+        return True
+    except AssertionError as e:
+        print(f"      {str(e).splitlines()[0]}")
+        return False
+
+
+class SnapshotLoads:
+    """記錄 load_food_table 成功由快照載入的次數"""
+
+    def __init__(self):
+        self.count = 0
+        self._original = food_snapshot.load_snapshot
+
+    def __enter__(self):
+        def counted(path):
+            df = self._original(path)
+            self.count += 1
+            return df
+        food_snapshot.load_snapshot = counted
+        return self
+
+    def __exit__(self, *exc):
+        food_snapshot.load_snapshot = self._original
+
+
+def load(csv_path, snapshot_path):
+    """load_food_table 的結果與是否由快照載入"""
+    with SnapshotLoads() as loads:
+        df = load_food_table(csv_path, snapshot_path)
+    return df, loads.count == 1
+
+
+class NormalizeCalls:
+    """記錄食品目錄載入期間 normalize_name 的呼叫次數"""
+
+    def __init__(self):
+        self.count = 0
+        self._original = food_catalog.normalize_name
+
+    def __enter__(self):
+        def counted(text):
+            self.count += 1
+            return self._original(text)
+        food_catalog.normalize_name = counted
+        return self
+
+    def __exit__(self, *exc):
+        food_catalog.normalize_name = self._original
+
+
+def same_catalog(left, right):
+    """兩個目錄的文字、正規化名稱、營養素矩陣與版本相同"""
+    return (same_frame(left.df, right.df)
+            and (left.food_ids, left.names, left.aliases, left.name_norm, left.alias_norm, left.version)
+            == (right.food_ids, right.names, right.aliases, right.name_norm, right.alias_norm, right.version)
+            and left.nutrient_columns == right.nutrient_columns
+            and np.array_equal(left.nutrient_matrix, right.nutrient_matrix)
+            and np.array_equal(left.nutrient_missing, right.nutrient_missing))
+
+
+def edit_csv(csv_path, value):
+    """修改 CSV 中一筆食品的營養素值"""
+    df = pd.read_csv(csv_path, encoding="utf-8")
+    df.loc[df['樣品名稱'] == EDITED_FOOD, EDITED_COLUMN] = value
+    df.to_csv(csv_path, index=False, encoding="utf-8")
+
+
+def main():
+    print("=" * 60)
+    print("食品資料庫二進位快照驗證測試")
+    print("=" * 60)
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix="food_snapshot_")
+    try:
+        csv_path = os.path.join(workdir, "foods.csv")
+        snapshot_path = os.path.join(workdir, "foods.snapshot")
+        shutil.copyfile(default_csv_path(), csv_path)
+
+        print("\n📦 編譯快照...")
+        build_snapshot(csv_path, snapshot_path)
+        meta = read_snapshot_meta(snapshot_path)
+        expected = pd.read_csv(csv_path, encoding="utf-8")
+        results.append(check(f"meta 記錄 CSV 雜湊與筆數（{meta['rows']} 筆）",
+                             meta['csv_sha256'] == file_sha256(csv_path) and meta['rows'] == len(expected)))
+        results.append(check("快照資料表與 read_csv 完全相同", same_frame(load_snapshot(snapshot_path), expected)))
+        df, from_snapshot = load(csv_path, snapshot_path)
+        results.append(check("快照新鮮時由快照載入", from_snapshot and same_frame(df, expected)))
+
+        print("\n📚 食品目錄由快照載入...")
+        plain_csv = os.path.join(workdir, "plain.csv")
+        shutil.copyfile(csv_path, plain_csv)
+        started = time.perf_counter()
+        with NormalizeCalls() as calls:
+            catalog = FoodCatalog(csv_path)
+        snapshot_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        plain = FoodCatalog(plain_csv)
+        csv_ms = (time.perf_counter() - started) * 1000
+        print(f"   冷啟動: 快照 {snapshot_ms:.1f}ms / CSV {csv_ms:.1f}ms（僅供參考）")
+        matrix = catalog.nutrient_matrix
+        results.append(check("營養素矩陣與空值遮罩為唯讀 mmap（未複製）",
+                             isinstance(matrix.base, np.memmap) and not matrix.flags.writeable
+                             and isinstance(catalog.nutrient_missing.base, np.memmap)))
+        results.append(check(f"未重新正規化名稱（normalize_name 呼叫 {calls.count} 次）", calls.count == 0))
+        results.append(check("與讀取 CSV 建立的目錄相同", same_catalog(catalog, plain)))
+
+        print("\n✏️  修改 CSV...")
+        edit_csv(csv_path, 12345.6)
+        edited = pd.read_csv(csv_path, encoding="utf-8")
+        df, from_snapshot = load(csv_path, snapshot_path)
+        value = df.loc[df['樣品名稱'] == EDITED_FOOD, EDITED_COLUMN].iloc[0]
+        print(f"   {EDITED_FOOD} {EDITED_COLUMN}: {value}")
+        results.append(check("快照過期，改讀 CSV 並取得修改後的值",
+                             not is_snapshot_fresh(csv_path, snapshot_path) and not from_snapshot
+                             and value == 12345.6 and same_frame(df, edited)))
+
+        build_snapshot(csv_path, snapshot_path)
+        df, from_snapshot = load(csv_path, snapshot_path)
+        results.append(check("重新編譯後恢復使用快照且與新 CSV 相同", from_snapshot and same_frame(df, edited)))
+
+        print("\n🧱 快照不可用...")
+        meta_file = os.path.join(snapshot_path, "meta.json")
+        with open(meta_file, "w", encoding="utf-8") as f:
+            json.dump({**meta, "version": food_snapshot.SNAPSHOT_VERSION + 1,
+                       "csv_sha256": file_sha256(csv_path)}, f)
+        df, from_snapshot = load(csv_path, snapshot_path)
+        results.append(check("版本不符時改讀 CSV", not from_snapshot and same_frame(df, edited)))
+
+        build_snapshot(csv_path, snapshot_path)
+        os.remove(os.path.join(snapshot_path, "matrix.npy"))
+        df, from_snapshot = load(csv_path, snapshot_path)
+        results.append(check("快照檔案損毀時改讀 CSV", not from_snapshot and same_frame(df, edited)))
+
+        build_snapshot(csv_path, snapshot_path)
+        os.remove(csv_path)
+        df, from_snapshot = load(csv_path, snapshot_path)
+        results.append(check("只帶快照、不帶 CSV 時由快照載入", from_snapshot and same_frame(df, edited)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+替代食物建議驗證測試
+====================
+驗證營養素向量最近鄰與逐筆計算距離後完整排序的結果一致
+
+成功指標：
+- 抽樣食物的前 k 名與完整排序完全相同，且皆符合 lower 條件
+- p99 查詢時間 < 5ms
+
+執行方式：
+python test_food_substitution.py
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.food_substitution_service import FoodSubstitutionService
+
+
+def brute_force(service, food_id, k, lower):
+    """對照組：逐筆檢查條件、計算距離後完整排序"""
+    catalog = service.catalog
+    source = catalog.row_of(food_id)
+    features = service.features
+    ranked = []
+    for row in range(len(catalog)):
+        if row == source:
+            continue
+        ok = True
+        for key in lower:
+            values, missing = catalog.field_values(key)
+            if missing[row] or not values[row] < values[source]:
+                ok = False
+                break
+        if ok:
+            diff = features[row] - features[source]
+            ranked.append((float(np.sqrt(np.dot(diff, diff))), row))
+    ranked.sort()
+    return [catalog.food_ids[row] for _, row in ranked[:k]]
+
+
+def main():
+    print("=" * 60)
+    print("替代食物建議驗證測試")
+    print("=" * 60)
+
+    service = FoodSubstitutionService()
+    catalog = service.catalog
+    sample = catalog.food_ids[::50]
+    lower = ['sodium', 'potassium']
+
+    print(f"\n🔍 對照完整排序（{len(sample)} 個食物）...")
+    print("-" * 60)
+    mismatches = []
+    for food_id in sample:
+        expected = brute_force(service, food_id, 5, lower)
+        actual = [r['food_id'] for r in service.substitutes(food_id, k=5, lower=lower)['results']]
+        if actual != expected:
+            mismatches.append(food_id)
+    print(f"   一致: {len(sample) - len(mismatches)}/{len(sample)}")
+    for food_id in mismatches:
+        print(f"   ❌ {food_id}")
+
+    print("\n⏱️  查詢效能測試...")
+    timings = []
+    for food_id in catalog.food_ids[:500]:
+        start = time.perf_counter()
+        service.substitutes(food_id, k=5, lower=lower)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p50 = timings[len(timings) // 2]
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"   p50: {p50:.3f}ms, p99: {p99:.3f}ms")
+
+    print("\n" + "=" * 60)
+    indicator1 = not mismatches
+    indicator2 = p99 < 5.0
+    print(f"✓ 指標 1 - 結果一致: {len(sample) - len(mismatches)}/{len(sample)} {'✅ PASS' if indicator1 else '❌ FAIL'}")
+    print(f"✓ 指標 2 - p99 延遲: {p99:.3f}ms {'✅ PASS' if indicator2 else '❌ FAIL'}")
+    print("=" * 60)
+
+    return 0 if indicator1 and indicator2 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
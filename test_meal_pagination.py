@@ -0,0 +1,157 @@
+"""
+飲食紀錄分頁驗證測試
+====================
+驗證 GET /meals 以 (eaten_at, id) 做 keyset 分頁：回應標頭 X-Next-Cursor
+帶下一頁的 cursor，逐頁走完全部歷史不重複、不遺漏，深層分頁與前面的頁成本相同
+
+成功指標：
+- 逐頁取得的餐點與一次排序的結果完全相同（含 eaten_at 相同的餐點），最後一頁無 X-Next-Cursor
+- 快速輸出路徑（FAST_JSON_RESPONSES）的 cursor 相同
+- cursor 格式錯誤時回 400
+- 分頁查詢由 ix_meals_user_eaten_at_id 索引直接定位 cursor 位置（不掃過前面的頁）
+- 最深一頁與第 2 頁執行相同數量的查詢，且分頁查詢的 SQLite 虛擬機指令數相近
+  （1.2 倍內；OFFSET 分頁會隨頁數線性增加）；耗時只列出供參考
+
+執行方式：
+python test_meal_pagination.py
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 使用暫存資料庫（需在 import app 之前設定）
+from meal_test_support import use_temp_database
+_workdir = use_temp_database("meal_pages_")
+
+from sqlalchemy import text
+
+from app.api.v1.endpoints import meals
+from app.core.config import settings
+from app.db.session import SessionLocal, engine
+from app.services.food_alignment_service import get_food_alignment_service
+from meal_test_support import (
+    StatementRecorder, best_of, check, food_ids as aligned_food_ids, make_client, meal_rows, register, report,
+)
+
+
+FOODS = ['白飯', '雞胸肉', '高麗菜', '豆腐']
+HISTORY_MEALS = 2000
+PAGE = 100
+
+
+def page_query_steps(recorder, request):
+    """
+    執行請求，回傳 (查詢數, 分頁查詢的 SQLite 虛擬機指令數)
+
+    分頁查詢（讀取 meals 的那一個）在獨立連線重播並計數；
+    指令數與掃過的資料列數成正比，不受機器負載影響。
+    """
+    recorder.reset()
+    request()
+    statement, parameters = next(
+        (s, p) for s, p in zip(recorder.statements, recorder.parameters)
+        if "FROM meals" in s and "meal_items" not in s)
+    steps = [0]
+
+    def count():
+        steps[0] += 1
+        return 0
+
+    with engine.connect() as conn:
+        raw = conn.connection.driver_connection
+        raw.set_progress_handler(count, 1)
+        try:
+            raw.execute(statement, parameters).fetchall()
+        finally:
+            raw.set_progress_handler(None, 1)
+    return len(recorder.statements), steps[0]
+
+
+def walk(client, headers, limit):
+    """逐頁取得全部餐點，回傳 (餐點 id 列表, 每頁 cursor)"""
+    ids, cursors, cursor = [], [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/v1/meals", headers=headers, params=params)
+        ids.extend(meal['meal_id'] for meal in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids, cursors
+        cursors.append(cursor)
+
+
+def main():
+    print("=" * 60)
+    print("飲食紀錄分頁驗證測試")
+    print("=" * 60)
+
+    client = make_client()
+    recorder = StatementRecorder(engine)
+
+    results = []
+    catalog = get_food_alignment_service().catalog
+    rows = catalog.rows_of(aligned_food_ids(FOODS))
+    headers, user_id = register(client, "Pages")
+
+    print(f"\n📚 建立 {HISTORY_MEALS} 餐歷史（每 4 餐共用同一個 eaten_at）...")
+    now = datetime.utcnow().replace(microsecond=0)
+    with SessionLocal() as db:
+        for i in range(HISTORY_MEALS):
+            meals._insert_meal(db, *meal_rows(catalog, user_id, [rows[i % len(rows)]], [100.0],
+                                              now - timedelta(minutes=30 * (i // 4))))
+        expected = [meal_id for (meal_id,) in db.execute(text(
+            "SELECT id FROM meals WHERE user_id = :u ORDER BY eaten_at DESC, id DESC"), {"u": user_id})]
+
+    print("\n📄 逐頁取得...")
+    ids, cursors = walk(client, headers, PAGE)
+    results.append(check(f"{len(cursors) + 1} 頁、不重複不遺漏且順序正確", ids == expected))
+    odd_ids, _ = walk(client, headers, 7)
+    results.append(check("每頁 7 筆（跨越相同 eaten_at）結果相同", odd_ids == expected))
+
+    settings.FAST_JSON_RESPONSES = True
+    try:
+        fast = client.get("/api/v1/meals", headers=headers, params={"limit": PAGE, "cursor": cursors[0]})
+    finally:
+        settings.FAST_JSON_RESPONSES = False
+    results.append(check("快速輸出路徑的頁面與 cursor 相同",
+                         [m['meal_id'] for m in fast.json()] == expected[PAGE:2 * PAGE]
+                         and fast.headers.get("X-Next-Cursor") == cursors[1]))
+
+    invalid = [client.get("/api/v1/meals", headers=headers, params={"cursor": bad}).status_code
+               for bad in ("not-a-cursor", "W10", "WyJ4IiwxXQ")]
+    results.append(check("cursor 格式錯誤時回 400", invalid == [400, 400, 400]))
+
+    print("\n🔎 深層分頁...")
+    recorder.reset()
+    client.get("/api/v1/meals", headers=headers, params={"limit": PAGE, "cursor": cursors[-1]})
+    page_sql = next(s for s in recorder.statements if "FROM meals" in s and "meal_items" not in s)
+    with engine.connect() as conn:
+        plan = " ".join(str(row[-1]) for row in conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + page_sql,
+            ("x",) * page_sql.count("?")))
+    print(f"   查詢計畫: {plan}")
+    results.append(check("由 ix_meals_user_eaten_at_id 直接定位 (eaten_at, id)",
+                         "ix_meals_user_eaten_at_id" in plan and "(eaten_at,id)<" in plan))
+
+    second_page = lambda: client.get("/api/v1/meals", headers=headers, params={"limit": PAGE, "cursor": cursors[0]})
+    deepest_page = lambda: client.get("/api/v1/meals", headers=headers,
+                                      params={"limit": PAGE, "cursor": cursors[-2]})
+    second_queries, second_steps = page_query_steps(recorder, second_page)
+    deepest_queries, deepest_steps = page_query_steps(recorder, deepest_page)
+    print(f"   查詢數 / 分頁查詢虛擬機指令數: 第 2 頁 {second_queries} / {second_steps:,}，"
+          f"第 {len(cursors)} 頁 {deepest_queries} / {deepest_steps:,}")
+    print(f"   耗時（僅供參考）: 第 2 頁 {best_of(second_page) * 1000:.1f}ms / "
+          f"第 {len(cursors)} 頁 {best_of(deepest_page) * 1000:.1f}ms")
+    results.append(check("最深一頁與第 2 頁的查詢數相同、虛擬機指令數相近（1.2 倍內）",
+                         second_queries == deepest_queries and deepest_steps <= second_steps * 1.2))
+
+    engine.dispose()
+    return report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+飲食紀錄查詢數回歸測試
+======================
+驗證 GET /meals 與 GET /meals/summary/today 以一個查詢批次載入所有品項，
+查詢數不隨餐數增加（避免逐餐延遲載入的 N+1），且只讀取回應需要的欄位
+
+成功指標：
+- limit=1 與 limit=100 的 SELECT 數相同（含 fields= 額外營養素）
+- 今日 1 餐與 30 餐的 SELECT 數相同
+- 不讀取回應用不到的欄位（raw_text、created_at）
+- 回應的餐數、品項數與內容正確
+
+執行方式：
+python test_meal_query_count.py
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 使用暫存資料庫（需在 import app 之前設定）
+from meal_test_support import use_temp_database
+_workdir = use_temp_database("meal_queries_")
+
+from app.db.session import engine
+from meal_test_support import StatementRecorder, check, food_ids as aligned_food_ids, make_client, register, report
+
+
+ITEMS_PER_MEAL = 3
+
+
+def add_meals(client, headers, food_ids, count, eaten_at):
+    for i in range(count):
+        client.post("/api/v1/meals", headers=headers, json={
+            "items": [{"food_id": food_ids[(i + j) % len(food_ids)], "grams": 50 + 10 * j, "raw_text": "原文"}
+                      for j in range(ITEMS_PER_MEAL)],
+            "eaten_at": (eaten_at - timedelta(seconds=i)).isoformat(),
+        })
+
+
+def main():
+    print("=" * 60)
+    print("飲食紀錄查詢數回歸測試")
+    print("=" * 60)
+
+    client = make_client()
+    recorder = StatementRecorder(engine)
+
+    results = []
+    food_ids = aligned_food_ids()
+    now = datetime.utcnow()
+
+    print("\n📋 GET /meals（100 餐，每餐 3 個品項）...")
+    headers, _ = register(client, "Queries")
+    add_meals(client, headers, food_ids, 100, now - timedelta(days=1))
+    counts = {}
+    for limit in (1, 100):
+        for fields in (None, "iron"):
+            response, selects = recorder.run(lambda: client.get(
+                "/api/v1/meals", headers=headers, params={"limit": limit, "fields": fields}))
+            counts[(limit, fields)] = len(selects)
+            listed = response.json()
+    print(f"   SELECT 數: {counts}")
+    results.append(check("limit=1 與 limit=100 的查詢數相同",
+                         counts[(1, None)] == counts[(100, None)] and counts[(1, "iron")] == counts[(100, "iron")]))
+    results.append(check("未讀取 raw_text / created_at",
+                         not any("raw_text" in s or "created_at" in s for s in selects if "FROM meal" in s)))
+    results.append(check("回傳 100 餐且各 3 個品項（含 fields= 欄位）",
+                         len(listed) == 100 and all(len(m['items']) == ITEMS_PER_MEAL for m in listed)
+                         and all('iron' in item['nutrients'] for m in listed for item in m['items'])))
+
+    print("\n📅 GET /meals/summary/today...")
+    today_counts = {}
+    for meal_count in (1, 30):
+        headers, _ = register(client, "Queries")
+        add_meals(client, headers, food_ids, meal_count, now)
+        response, selects = recorder.run(lambda: client.get(
+            "/api/v1/meals/summary/today", headers=headers, params={"fields": "iron"}))
+        today_counts[meal_count] = len(selects)
+        today = response.json()
+    print(f"   SELECT 數: 1 餐 {today_counts[1]} / 30 餐 {today_counts[30]}")
+    results.append(check("1 餐與 30 餐的查詢數相同", today_counts[1] == today_counts[30]))
+    results.append(check("今日餐數與品項正確", today['total_meals'] == len(today['meals']) == 30
+                         and all(len(m['items']) == ITEMS_PER_MEAL for m in today['meals'])))
+
+    engine.dispose()
+    return report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
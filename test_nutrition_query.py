@@ -0,0 +1,115 @@
+"""
+營養素範圍查詢驗證測試
+======================
+驗證 /nutrition/query 的向量化查詢與 pandas 逐條件過濾結果一致
+
+成功指標：
+- 所有案例結果與 pandas 對照組完全相同（含排序與同值順序）
+- 查詢時間 p99 < 5ms
+
+執行方式：
+python test_nutrition_query.py
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.nutrition_db_service import NutritionDBService
+from app.services.food_catalog import parse_predicates
+from app.services.food_snapshot import default_csv_path
+
+
+# (filters, category, sort, order, limit)
+CASES = [
+    ("protein>=20,sodium<=100", "魚貝類", "protein", "desc", 20),
+    ("potassium<=150,sodium<=50", None, "protein/calories", "desc", 30),
+    ("calories<=50", None, "fiber", "desc", 50),
+    ("sodium<100", "蔬菜類", "potassium", "asc", 10),
+    ("protein>=10,fat<=5,carbs<=10", None, None, "desc", 20),
+    ("iron>=5", None, "calcium", "desc", 15),
+    ("fiber=0", "肉類", "fat", "asc", 5),
+    ("", "水果類", "calories", "asc", 200),
+]
+
+_OPS = {
+    ">=": lambda s, v: s >= v,
+    "<=": lambda s, v: s <= v,
+    ">": lambda s, v: s > v,
+    "<": lambda s, v: s < v,
+    "==": lambda s, v: s == v,
+}
+
+
+def reference_query(service, filters, category, sort, order, limit):
+    """pandas 對照組：逐條件過濾後穩定排序（直接讀取 CSV，目錄資料表不含營養素欄位）"""
+    catalog = service.catalog
+    df = pd.read_csv(default_csv_path(), encoding='utf-8')
+    mask = np.ones(len(df), dtype=bool)
+    if category:
+        mask &= df['食品分類'].fillna('').str.contains(category, regex=False).to_numpy()
+    for key, op, value in parse_predicates(filters):
+        column = df[catalog.field_columns[key]].round(4)
+        mask &= _OPS[op](column, value).to_numpy()
+    frame = df[mask]
+    if sort:
+        keys = sort.split("/")
+        key = frame[catalog.field_columns[keys[0]]].round(4)
+        if len(keys) == 2:
+            denom = frame[catalog.field_columns[keys[1]]].round(4)
+            key = (key / denom).where(denom > 0)
+        key = -key if order == "desc" else key
+        frame = frame.assign(_key=key.fillna(np.inf), _row=frame.index).sort_values(['_key', '_row'])
+    return int(mask.sum()), frame['整合編號'].astype(str).head(limit).tolist()
+
+
+def main():
+    print("=" * 60)
+    print("營養素範圍查詢驗證測試")
+    print("=" * 60)
+
+    service = NutritionDBService()
+    service.query("protein>=0", limit=1)
+
+    print("\n🔍 對照 pandas 過濾結果...")
+    print("-" * 60)
+    mismatches = 0
+    for filters, category, sort, order, limit in CASES:
+        result = service.query(filters, category=category, sort=sort, order=order, limit=limit)
+        actual = [r['food_id'] for r in result['results']]
+        expected_total, expected = reference_query(service, filters, category, sort, order, limit)
+        ok = actual == expected and result['total'] == expected_total
+        mismatches += 0 if ok else 1
+        status = "✅" if ok else "❌"
+        print(f"   {status} {filters or '(無條件)'} | {category or '全部'} | {sort or '-'} → {result['total']} 筆")
+
+    print("\n⏱️  查詢效能測試...")
+    timings = []
+    for _ in range(20):
+        for filters, category, sort, order, limit in CASES:
+            start = time.perf_counter()
+            service.query(filters, category=category, sort=sort, order=order, limit=limit)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p50 = timings[len(timings) // 2]
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"   p50: {p50:.3f}ms, p99: {p99:.3f}ms")
+
+    print("\n" + "=" * 60)
+    indicator1 = mismatches == 0
+    indicator2 = p99 < 5.0
+    print(f"✓ 指標 1 - 結果一致: {len(CASES) - mismatches}/{len(CASES)} {'✅ PASS' if indicator1 else '❌ FAIL'}")
+    print(f"✓ 指標 2 - p99 延遲: {p99:.3f}ms {'✅ PASS' if indicator2 else '❌ FAIL'}")
+    print("=" * 60)
+
+    return 0 if indicator1 and indicator2 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+相關度排序搜尋驗證測試
+======================
+驗證 ranked 搜尋（索引取候選 + 向量化評分）與逐筆 Python 評分全表掃描結果一致
+
+成功指標：
+- 所有查詢的前 k 名與全表掃描完全相同
+- 有精確名稱時排第一
+- 平均查詢時間 < 0.5ms（不含快取）
+
+執行方式：
+python test_nutrition_ranked.py
+"""
+
+import sys
+import os
+import time
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.nutrition_db_service import NutritionDBService
+from app.services.food_catalog import normalize_name
+from app.services.query_cache import QueryCache
+
+
+QUERIES = [
+    '雞', '雞胸肉', '白飯', '鮭魚', '三文魚', '牛肉麵', '蕃茄炒蛋', '蘋果',
+    '豆腐', '菠菜', '高麗菜', '香蕉', '紅蘿蔔', '米', '珍珠', '豬肉', 'XO',
+]
+
+
+def reference_ranked(service, query, limit, category=None):
+    """對照組：逐筆計算相同特徵與權重（全表掃描）"""
+    catalog = service.catalog
+    w = service.RANK_WEIGHTS
+    query_norm = normalize_name(query)
+    alias_terms = [a for a in service._alias_lookup.get(query, []) if a != query]
+    bigrams = [query[i:i+2] for i in range(len(query) - 1)]
+    alias_prefix_rows = {
+        service._alias_rows(t)[0]
+        for t in service._alias_lookup
+        if normalize_name(t).startswith(query_norm) and service._alias_rows(t)
+    }
+    scored = []
+    for row, name in enumerate(catalog.names):
+        if not name or (category and category not in catalog.categories[row]):
+            continue
+        norm = catalog.name_norm[row]
+        common = [normalize_name(c) for c in catalog.common_names[row]]
+        common_prefix = any(c.startswith(query_norm) for c in common if c)
+        alias_prefix = row in alias_prefix_rows
+        alias = common_prefix or alias_prefix or any(normalize_name(t) in norm for t in alias_terms if normalize_name(t))
+        contains = query_norm in norm
+        raw_hit = (
+            name == query or query in name
+            or any(a in name for a in alias_terms)
+            or any(b in name for b in bigrams)
+        )
+        if not (raw_hit or common_prefix or alias_prefix):
+            continue
+        match = 1.0 if contains else (sum(b in norm for b in bigrams) / len(bigrams) if bigrams else 0.0)
+        length = max(len(norm), 1)
+        score = (
+            w['exact'] * (norm == query_norm)
+            + w['prefix'] * norm.startswith(query_norm)
+            + w['contains'] * contains
+            + w['alias'] * alias
+            + w['match'] * match
+            + w['coverage'] * min(len(query_norm) / length, 1.0) * match
+            - w['length'] * length
+        )
+        scored.append((-score, row))
+    scored.sort()
+    return [row for _, row in scored[:limit]]
+
+
+def main():
+    print("=" * 60)
+    print("相關度排序搜尋驗證測試")
+    print("=" * 60)
+
+    service = NutritionDBService()
+    service._cache = QueryCache(maxsize=0)
+    service.search('預熱', ranked=True)
+
+    print("\n🔍 對照全表掃描...")
+    print("-" * 60)
+    mismatches = 0
+    for query in QUERIES:
+        for category in (None, '肉類'):
+            expected = reference_ranked(service, query, 5, category)
+            actual = service._ranked_rows(query, 5, category)
+            if actual != expected:
+                mismatches += 1
+                print(f"   ❌ {query} ({category or '全部'})")
+        top = [service.catalog.names[r] for r in service._ranked_rows(query, 3)]
+        print(f"   {query:6s} → {', '.join(top) or '無匹配'}")
+
+    exact_first = all(
+        service.search(name, limit=5, ranked=True)[0]['name'] == name
+        for name in ['白飯', '菠菜', '雞油', '嫩豆腐']
+    )
+
+    print("\n⏱️  查詢效能測試...")
+    start = time.perf_counter()
+    for _ in range(20):
+        for query in QUERIES:
+            service._ranked_rows(query, 5)
+    avg = (time.perf_counter() - start) / (20 * len(QUERIES)) * 1000
+    print(f"   平均查詢時間: {avg:.3f}ms")
+
+    print("\n" + "=" * 60)
+    indicator1 = mismatches == 0
+    indicator2 = exact_first
+    indicator3 = avg < 0.5
+    print(f"✓ 指標 1 - 與全表掃描一致: {'✅ PASS' if indicator1 else '❌ FAIL'}")
+    print(f"✓ 指標 2 - 精確名稱排第一: {'✅ PASS' if indicator2 else '❌ FAIL'}")
+    print(f"✓ 指標 3 - 平均查詢時間: {avg:.3f}ms {'✅ PASS' if indicator3 else '❌ FAIL'}")
+    print("=" * 60)
+
+    return 0 if indicator1 and indicator2 and indicator3 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+營養查詢快取與統計驗證測試
+==========================
+驗證 search / calculate 結果快取的正確性，以及查詢統計的執行緒安全
+
+成功指標：
+- 快取命中與未快取的結果完全相同；空白查詢回傳空結果且不快取
+- LRU 淘汰、TTL 過期、目錄重新載入清空皆正確計數；清空前開始計算的結果不寫回快取
+- 索引建立期間的查詢等候索引完成，不快取空結果
+- 重複查詢全部由快取回傳：命中數等於查詢數、未命中數不變、不再執行比對（耗時只列出供參考）
+- 多執行緒同時查詢時計數不遺失；各匹配階段皆有延遲紀錄
+
+執行方式：
+python test_query_cache.py
+"""
+
+import sys
+import os
+import threading
+import time
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.nutrition_db_service import NutritionDBService
+from app.services.query_cache import QueryCache
+from meal_test_support import check, report
+
+
+HOT_QUERIES = ['白飯', '雞蛋', '雞胸肉', '豆腐', '菠菜', '牛肉麵', '雞']
+
+
+def main():
+    print("=" * 60)
+    print("營養查詢快取與統計驗證測試")
+    print("=" * 60)
+
+    results = []
+
+    print("\n🧪 LRU / TTL 行為...")
+    cache = QueryCache(maxsize=2, ttl=0.05)
+    cache.get_or_compute('a', lambda: 1)
+    cache.get_or_compute('b', lambda: 2)
+    cache.get_or_compute('a', lambda: 0)      # 命中，a 變為最新
+    cache.get_or_compute('c', lambda: 3)      # 淘汰 b
+    stats = cache.get_stats()
+    results.append(check("命中 1、未命中 3、淘汰 1", (stats['hits'], stats['misses'], stats['evictions']) == (1, 3, 1)))
+    results.append(check("淘汰最久未使用的項目", cache.get_or_compute('a', lambda: -1) == 1))
+    time.sleep(0.06)
+    results.append(check("TTL 過期後重新計算", cache.get_or_compute('a', lambda: 9) == 9))
+    results.append(check("過期計數", cache.get_stats()['expirations'] == 1))
+    cache = QueryCache(maxsize=2)
+    stale = cache.get_or_compute('x', lambda: cache.clear() or 'old')
+    results.append(check("清空前開始計算的結果不寫回快取",
+                         stale == 'old' and cache.get_or_compute('x', lambda: 'new') == 'new'))
+
+    print("\n🔍 快取結果與未快取結果一致...")
+    cached = NutritionDBService()
+    uncached = NutritionDBService()
+    uncached._cache = QueryCache(maxsize=0)
+    same = True
+    for _ in range(2):
+        for query in HOT_QUERIES:
+            same &= cached.search(query, limit=5) == uncached.search(query, limit=5)
+            same &= cached.calculate_nutrients(query, 150) == uncached.calculate_nutrients(query, 150)
+    results.append(check("search / calculate 結果相同", same))
+    stats = cached.get_stats()
+    results.append(check("匹配率統計包含快取命中", stats['queries']['total_queries'] == 4 * len(HOT_QUERIES)))
+    results.append(check("第二輪全部命中", stats['cache']['hits'] == 2 * len(HOT_QUERIES)))
+
+    print("\n␣ 空白查詢...")
+    before = cached.get_stats()['cache']['size']
+    blank = [cached.search(q) for q in (' ', '　', '\t')] + [cached.calculate_nutrients(' ', 100)]
+    results.append(check("空白查詢不命中任何食物且不快取",
+                         blank == [[], [], [], None] and cached.get_stats()['cache']['size'] == before))
+    spaced = cached.search('雞 ')
+    results.append(check("查詢不去除前後空白（'雞 ' 與未快取前的比對結果相同）",
+                         spaced == cached._format_results(cached._search_rows('雞 ', 5), None)
+                         and spaced != cached.search('雞')))
+
+    cached.reload()
+    cached.search('白飯')
+    stats = cached.get_stats()['cache']
+    results.append(check("重新載入後清空快取", stats['invalidations'] == 1 and stats['size'] == 1))
+
+    print("\n🧵 索引建立期間查詢...")
+    building = NutritionDBService(catalog=cached.catalog)
+    entered = threading.Event()
+    build_search_index = building._build_search_index
+
+    def slow_build():
+        entered.set()
+        time.sleep(0.3)
+        build_search_index()
+
+    building._build_search_index = slow_build
+    builder = threading.Thread(target=lambda: building.simplified_df)
+    builder.start()
+    entered.wait(10)
+    during = building.search('白飯')
+    builder.join()
+    after = building.search('白飯')
+    stats = building.get_stats()['cache']
+    results.append(check("建立期間的查詢等候索引完成，快取的不是空結果",
+                         during == after == cached.search('白飯') and during != []
+                         and (stats['hits'], stats['size']) == (1, 1)))
+
+    print("\n🧵 查詢統計（多執行緒）...")
+    service = NutritionDBService()
+    service._cache = QueryCache(maxsize=0)
+    for query in ['白飯', '三文魚', '雞', '牛肉麵', 'qqq']:
+        service.search(query)
+    latency = service.get_stats()['latency']
+    results.append(check("exact / alias / partial / miss 皆有延遲紀錄",
+                         all(latency[s]['count'] > 0 for s in ('exact', 'alias', 'partial', 'miss'))))
+
+    def worker():
+        for _ in range(1000):
+            service.search('白飯')
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    queries = service.get_stats()['queries']
+    results.append(check("8 執行緒 × 1000 次查詢計數正確", queries['total_queries'] == 5 + 8000))
+    results.append(check("Prometheus 輸出含各階段直方圖",
+                         'nutrition_search_latency_seconds_bucket{stage="miss",le="+Inf"} 1' in service.prometheus_metrics()))
+
+    print("\n🎯 重複查詢命中...")
+    for query in HOT_QUERIES:
+        cached.search(query)
+    before = cached.get_stats()['cache']
+    lookups = []
+    search_rows = cached._search_rows
+    cached._search_rows = lambda *args: lookups.append(args) or search_rows(*args)
+    start = time.perf_counter()
+    for _ in range(1000):
+        for query in HOT_QUERIES:
+            cached.search(query)
+    avg = (time.perf_counter() - start) / (1000 * len(HOT_QUERIES)) * 1000
+    cached._search_rows = search_rows
+    after = cached.get_stats()['cache']
+    print(f"   命中 +{after['hits'] - before['hits']}，未命中 +{after['misses'] - before['misses']}，"
+          f"平均 {avg:.4f}ms（僅供參考）")
+    results.append(check(f"{1000 * len(HOT_QUERIES)} 次重複查詢全部命中且不再執行比對",
+                         after['hits'] - before['hits'] == 1000 * len(HOT_QUERIES)
+                         and after['misses'] == before['misses'] and not lookups))
+
+    return report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
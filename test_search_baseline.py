@@ -0,0 +1,216 @@
+"""
+搜尋結果與原始實作一致性測試
+============================
+以原本逐次掃描 DataFrame 的四階段搜尋（精確 → 別名 → 模糊 → 分詞，
+pandas str.contains 實作）為參考，驗證索引化的 search() 對同一批查詢
+回傳相同的食物、相同的順序與相同的營養素值
+
+成功指標：
+- 常見食物、別名、部分名稱、分詞命中與查無結果的查詢結果與參考實作完全相同
+- 隨機抽樣（固定種子）的食物名稱片段與跨名稱雙字元組合結果相同
+- 不同 limit 的結果相同
+- 快取命中時回傳的結果與首次查詢相同
+- 分類過濾（完整分類名稱、部分名稱、不存在的分類）的列集合與搜尋結果與
+  pandas str.contains 過濾相同
+- /nutrition/categories 與 /nutrition/categories/counts 與資料表的分類統計相同
+- 索引建立期間（如背景預熱）同時查詢，會等候索引完成並回傳完整結果
+
+執行方式：
+python test_search_baseline.py
+"""
+
+import sys
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.api.v1.endpoints import nutrition
+from app.services.food_snapshot import default_csv_path
+from app.services.nutrition_db_service import NutritionDBService, get_nutrition_service
+from meal_test_support import check, report
+
+
+FIXED_QUERIES = [
+    '白飯', '雞胸肉', '雞蛋', '豆腐', '鮭魚', '蘋果', '香蕉', '高麗菜', '菠菜', '番茄',
+    '米飯', '三文魚', '柳丁', '芭樂', '西蘭花', '土司', '麵', '蛋', '鮭', '胡蘿蔔',
+    '雞', '牛肉', '豬', '豆', '奶', '油', '米', '魚', '茶', '糖',
+    '雞胸肉片', '牛奶麵包', '烤雞腿', '炒高麗菜', '紅燒牛肉麵', '滷蛋飯',
+    '不存在的食物', 'abc', '🍎', '雞 ', ' 白飯',
+]
+PARTIAL_CATEGORIES = ['類', '魚', '肉', '果', '穀物', '及', '', '不存在的分類']
+SAMPLE_SIZE = 150
+SEED = 20240601
+
+
+def load_baseline_view():
+    """參考實作的精簡視圖：原始欄位改名、數值欄位空值補 0"""
+    df = pd.read_csv(default_csv_path(), encoding='utf-8')
+    view = df[list(NutritionDBService.CORE_FIELDS.keys())].rename(columns=NutritionDBService.CORE_FIELDS)
+    for col in ['calories', 'protein', 'carbs', 'fat', 'sodium', 'fiber', 'potassium']:
+        view[col] = pd.to_numeric(view[col], errors='coerce').fillna(0)
+    return view
+
+
+def baseline_expand_aliases(query):
+    aliases = [query]
+    for canonical, alias_list in NutritionDBService.FOOD_ALIASES.items():
+        if query == canonical or query in alias_list:
+            aliases.extend([canonical] + alias_list)
+            break
+    return list(set(aliases))
+
+
+def baseline_format(df):
+    return [
+        {
+            'name': row['name'],
+            'category': row['category'],
+            'per_100g': {
+                key: round(float(row[key]), 1)
+                for key in ['calories', 'protein', 'carbs', 'fat', 'sodium', 'fiber', 'potassium']
+            },
+        }
+        for _, row in df.iterrows()
+    ]
+
+
+def baseline_search(view, query, limit=5, category=None):
+    """參考實作：每次查詢以 str.contains 掃描整個資料表"""
+    df = view
+    if category:
+        df = df[df['category'].str.contains(category, na=False)]
+
+    exact_matches = df[df['name'] == query]
+    if not exact_matches.empty:
+        return baseline_format(exact_matches.head(limit))
+
+    for alias in baseline_expand_aliases(query):
+        alias_matches = df[df['name'].str.contains(alias, na=False, regex=False)]
+        if not alias_matches.empty:
+            return baseline_format(alias_matches.head(limit))
+
+    fuzzy_matches = df[df['name'].str.contains(query, na=False, regex=False)]
+    if not fuzzy_matches.empty:
+        return baseline_format(fuzzy_matches.head(limit))
+
+    if len(query) >= 2:
+        for i in range(len(query) - 1):
+            partial_matches = df[df['name'].str.contains(query[i:i+2], na=False, regex=False)]
+            if not partial_matches.empty:
+                return baseline_format(partial_matches.head(limit))
+    return []
+
+
+def sample_queries(names, rng):
+    """食物名稱的隨機片段，以及兩個不同名稱各取一字組成的雙字元查詢"""
+    queries = []
+    for name in rng.sample(names, SAMPLE_SIZE):
+        start = rng.randrange(len(name))
+        queries.append(name[start:start + rng.randint(1, 4)])
+    for _ in range(SAMPLE_SIZE // 3):
+        left, right = rng.sample(names, 2)
+        queries.append(rng.choice(left) + rng.choice(right))
+    return [q for q in dict.fromkeys(queries) if q.strip()]
+
+
+def search_during_build(catalog, query):
+    """新服務在背景執行緒建立索引（刻意放慢）時查詢，回傳查詢結果"""
+    service = NutritionDBService(catalog=catalog)
+    entered = threading.Event()
+    build_search_index = service._build_search_index
+
+    def slow_build():
+        entered.set()
+        time.sleep(0.3)
+        build_search_index()
+
+    service._build_search_index = slow_build
+    builder = threading.Thread(target=lambda: service.simplified_df)
+    builder.start()
+    entered.wait(10)
+    results = service.search(query)
+    builder.join()
+    return service, results
+
+
+def compare(service, view, queries, **kwargs):
+    """回傳與參考實作不同的查詢"""
+    return [q for q in queries if service.search(q, **kwargs) != baseline_search(view, q, **kwargs)]
+
+
+def main():
+    print("=" * 60)
+    print("搜尋結果與原始實作一致性測試")
+    print("=" * 60)
+
+    service = get_nutrition_service()
+    view = load_baseline_view()
+    names = [name for name in view['name'].dropna().tolist() if name]
+    results = []
+
+    print(f"\n📋 固定查詢（{len(FIXED_QUERIES)} 筆）...")
+    for query in FIXED_QUERIES[:6]:
+        print(f"   {query}: {[r['name'] for r in service.search(query)]}")
+    diff = compare(service, view, FIXED_QUERIES)
+    results.append(check(f"常見食物、別名、分詞與查無結果相同（不同: {diff}）", not diff))
+
+    rng = random.Random(SEED)
+    sampled = sample_queries(names, rng)
+    print(f"\n🎲 隨機抽樣（{len(sampled)} 筆，種子 {SEED}）...")
+    diff = compare(service, view, sampled)
+    results.append(check(f"名稱片段與雙字元組合相同（不同: {diff[:5]}）", not diff))
+
+    print("\n📏 不同 limit...")
+    diff = [(q, limit) for limit in (1, 20)
+            for q in compare(service, view, FIXED_QUERIES + sampled[:50], limit=limit)]
+    results.append(check(f"limit=1 / limit=20 相同（不同: {diff[:5]}）", not diff))
+
+    print("\n🗃️  快取命中...")
+    diff = compare(service, view, FIXED_QUERIES)
+    results.append(check("快取命中的結果與參考實作相同", not diff))
+
+    print("\n🗂️  分類過濾...")
+    counts = view['category'].value_counts()
+    categories = sorted(counts.index) + PARTIAL_CATEGORIES
+    catalog = service.catalog
+    diff = [c for c in categories if c and catalog.category_rows(c) != set(
+        np.flatnonzero(view['category'].str.contains(c, na=False).to_numpy()).tolist())]
+    results.append(check(f"{len(categories)} 個分類條件的列集合與 str.contains 相同（不同: {diff}）", not diff))
+    filtered_queries = FIXED_QUERIES + sampled[:30]
+    diff = [(q, c) for c in categories for q in compare(service, view, filtered_queries, category=c)]
+    print(f"   魚貝類 / 鮭: {[r['name'] for r in service.search('鮭', category='魚貝類')]}")
+    results.append(check(f"分類過濾後的搜尋結果相同（{len(filtered_queries)} 筆查詢 × {len(categories)} 個分類，"
+                         f"不同: {diff[:5]}）", not diff))
+
+    print("\n🧵 索引建立期間查詢...")
+    building, during = search_during_build(catalog, '白飯')
+    expected = baseline_search(view, '白飯')
+    print(f"   白飯: {[r['name'] for r in during]}")
+    results.append(check("建立期間的查詢等候索引完成並回傳完整結果",
+                         during == expected and building.search('白飯') == expected))
+
+    api = FastAPI()
+    api.include_router(nutrition.router, prefix="/api/v1")
+    client = TestClient(api)
+    listed = client.get("/api/v1/nutrition/categories").json()
+    counted = client.get("/api/v1/nutrition/categories/counts").json()
+    print(f"   分類筆數: {dict(list(counted.items())[:4])} ...")
+    results.append(check("/nutrition/categories 與資料表的分類相同", listed == sorted(counts.index)))
+    results.append(check("/nutrition/categories/counts 與 value_counts 相同且依名稱排序",
+                         counted == {c: int(counts[c]) for c in sorted(counts.index)}
+                         and list(counted) == listed and sum(counted.values()) == len(view)))
+
+    return report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+多 worker 共用食品資料段驗證測試
+================================
+驗證共用資料段（唯讀 mmap）附加後的目錄與名稱對齊索引與自行建立時完全相同，
+並比較多個 worker 程序的啟動時間與私有記憶體
+
+成功指標：
+- 附加後正規化名稱、營養素矩陣、空值遮罩、對齊結果與自行建立相同，且陣列唯讀
+- 回報每個 worker 建立目錄 + 對齊索引的 CPU 時間
+- 每個 worker 的私有記憶體（Private_Clean + Private_Dirty）減少
+- 發布可重複、可並行：已有完整資料段時不重寫；多個 worker 同時發布皆成功並附加；
+  同版本舊格式的資料段被取代，其他版本被移除
+
+執行方式：
+python test_shared_catalog.py
+"""
+
+import sys
+import os
+import json
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.food_catalog import FoodCatalog
+from app.services.food_alignment_service import FoodAlignmentService
+from app.services.food_snapshot import build_snapshot, default_csv_path
+from app.services.shared_catalog import SEGMENT_VERSION, build_segment, segment_path_for, segment_root_for
+from meal_test_support import check, report
+
+
+WORKERS = 4
+QUERIES = ['白飯', '雞胸', '三文魚', '牛肉麵', '蘋果汁', 'XO醬', '高麗菜', '地瓜葉']
+
+# 模擬一個 worker：載入目錄與對齊索引，回報耗時與記憶體
+WORKER_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+from app.services.food_catalog import FoodCatalog
+from app.services.food_alignment_service import FoodAlignmentService
+
+def private_kb():
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None
+    return sum(int(fields[k].split()[0]) for k in ('Private_Clean', 'Private_Dirty'))
+
+before = private_kb()
+start = time.process_time()
+catalog = FoodCatalog(sys.argv[2])
+FoodAlignmentService(catalog=catalog).align('白飯')
+elapsed = time.process_time() - start
+after = private_kb()
+print(json.dumps({'seconds': elapsed, 'shared': bool(catalog.shared),
+                  'private_kb': None if before is None else after - before}))
+"""
+
+
+# 模擬 worker 熱更新：同時載入目錄並發布 / 附加資料段
+PUBLISH_SCRIPT = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+from app.services.food_catalog import FoodCatalog
+from app.services.shared_catalog import ensure_segment
+
+catalog = FoodCatalog(sys.argv[2])
+print(json.dumps({'shared': ensure_segment(catalog)}))
+"""
+
+
+def run_workers(csv_path):
+    root = os.path.dirname(os.path.abspath(__file__))
+    procs = [
+        subprocess.Popen([sys.executable, "-c", WORKER_SCRIPT, root, csv_path],
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for _ in range(WORKERS)
+    ]
+    return [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+
+
+def run_publishers(csv_path):
+    root = os.path.dirname(os.path.abspath(__file__))
+    procs = [
+        subprocess.Popen([sys.executable, "-c", PUBLISH_SCRIPT, root, csv_path],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for _ in range(WORKERS)
+    ]
+    outputs = [p.communicate() for p in procs]
+    return [json.loads(out.strip().splitlines()[-1]) if out.strip() else {'error': err[-300:]}
+            for out, err in outputs]
+
+
+def main():
+    print("=" * 60)
+    print("多 worker 共用食品資料段驗證測試")
+    print("=" * 60)
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix="shared_catalog_")
+    private_csv = os.path.join(workdir, "private", "foods.csv")
+    shared_csv = os.path.join(workdir, "shared", "foods.csv")
+    for path in (private_csv, shared_csv):
+        os.makedirs(os.path.dirname(path))
+        shutil.copyfile(default_csv_path(), path)
+        build_snapshot(path)
+
+    try:
+        print("\n🔍 附加結果與自行建立一致...")
+        private = FoodCatalog(private_csv)
+        build_segment(FoodCatalog(shared_csv))
+        shared = FoodCatalog(shared_csv)
+        results.append(check("已附加共用資料段", bool(shared.shared) and not private.shared))
+        results.append(check("正規化名稱與別名相同",
+                             shared.name_norm == private.name_norm and shared.alias_norm == private.alias_norm))
+        results.append(check("營養素矩陣與空值遮罩相同",
+                             np.array_equal(shared.nutrient_matrix, private.nutrient_matrix)
+                             and np.array_equal(shared.nutrient_missing, private.nutrient_missing)))
+        results.append(check("每 100g 紀錄相同", shared.get_many(shared.food_ids) == private.get_many(private.food_ids)))
+        results.append(check("共用陣列唯讀", not shared.nutrient_matrix.flags.writeable))
+        aligned = FoodAlignmentService(catalog=shared).align_many(QUERIES)
+        results.append(check("名稱對齊結果相同", aligned == FoodAlignmentService(catalog=private).align_many(QUERIES)))
+
+        print("\n📦 發布資料段...")
+        catalog = FoodCatalog(shared_csv)
+        path = segment_path_for(shared_csv, catalog.version)
+        meta_file = os.path.join(path, "meta.json")
+        stamp = os.stat(meta_file).st_mtime_ns
+        results.append(check("已有完整資料段時不重寫", build_segment(catalog) == path
+                             and os.stat(meta_file).st_mtime_ns == stamp))
+
+        root = segment_root_for(shared_csv)
+        shutil.rmtree(path)
+        os.makedirs(os.path.join(root, "0ldversion0"))
+        os.makedirs(path)
+        with open(meta_file, "w", encoding="utf-8") as f:
+            json.dump({"segment_version": SEGMENT_VERSION - 1, "catalog_version": catalog.version}, f)
+        published = run_publishers(shared_csv)
+        print(f"   {published}")
+        results.append(check(f"{WORKERS} 個 worker 同時發布皆成功並附加", all(r.get('shared') for r in published)))
+        entries = [e for e in os.listdir(root) if not e.startswith(".")]
+        with open(meta_file, encoding="utf-8") as f:
+            results.append(check("舊格式資料段被取代、其他版本被移除",
+                                 entries == [catalog.version] and json.load(f)["segment_version"] == SEGMENT_VERSION))
+
+        print(f"\n⏱️  {WORKERS} 個 worker 同時啟動...")
+        without = run_workers(private_csv)
+        with_segment = run_workers(shared_csv)
+        results.append(check("worker 皆附加共用資料段", all(r['shared'] for r in with_segment)))
+        slow = sum(r['seconds'] for r in without) / WORKERS
+        fast = sum(r['seconds'] for r in with_segment) / WORKERS
+        # 耗時只回報、不作為通過條件（CI 機器負載不定）
+        print(f"   平均啟動 CPU 時間: 自行建立 {slow * 1000:.0f}ms → 共用 {fast * 1000:.0f}ms")
+
+        if without[0]['private_kb'] is not None:
+            slow_kb = sum(r['private_kb'] for r in without) / WORKERS
+            fast_kb = sum(r['private_kb'] for r in with_segment) / WORKERS
+            print(f"   平均私有記憶體: 自行建立 {slow_kb / 1024:.1f}MB → 共用 {fast_kb / 1024:.1f}MB")
+            results.append(check("私有記憶體減少", fast_kb < slow_kb))
+        else:
+            print("   （無 /proc/self/smaps_rollup，略過記憶體比較）")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+啟動預熱驗證測試
+================
+驗證 lifespan 預熱：依序載入食品目錄、建立搜尋與對齊索引、載入知識庫，
+完成後才回報就緒，並檢查預熱後第一個請求不再建立任何索引
+
+成功指標：
+- 所有階段成功並記錄耗時，完成後就緒；預熱中不就緒
+- 某階段失敗時後續階段仍執行；必要階段失敗時整體不就緒
+- 非必要階段（知識庫、替代食物特徵）失敗時為 degraded，仍回報就緒
+- 預熱後第一個搜尋 + 對齊請求不再建立目錄與索引、沿用預熱建立的服務（在新程序中檢查）；
+  未預熱時同一請求會建立全部元件。兩者耗時只列出供參考
+
+執行方式：
+python test_warmup.py
+"""
+
+import sys
+import os
+import json
+import subprocess
+import threading
+
+# 確保可以 import app 模組
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services import warmup
+from app.services.warmup import WARMUP_STAGES, Warmup, readiness
+from meal_test_support import check, report
+
+
+# 新程序中執行第一個請求（argv[2] == 'warm' 時先預熱），回報請求期間新建立的元件
+FIRST_REQUEST_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+from app.services import food_alignment_service, food_catalog, nutrition_db_service
+from app.services.food_alignment_service import get_food_alignment_service
+from app.services.nutrition_db_service import get_nutrition_service
+from app.services.warmup import Warmup
+
+def components():
+    nutrition = nutrition_db_service._nutrition_service
+    alignment = food_alignment_service._food_alignment_service
+    return {
+        'catalog': food_catalog._food_catalog,
+        'nutrition_service': nutrition,
+        'search_index': nutrition and nutrition._simplified_df,
+        'alignment_service': alignment,
+        'alignment_index': alignment and alignment._index,
+    }
+
+if sys.argv[2] == 'warm':
+    Warmup().run()
+before = components()
+start = time.perf_counter()
+get_nutrition_service().search('白飯')
+get_food_alignment_service().align('白飯')
+seconds = time.perf_counter() - start
+after = components()
+built = [name for name in after if before[name] is None and after[name] is not None]
+replaced = [name for name in after if before[name] is not None and after[name] is not before[name]]
+print(json.dumps({'seconds': seconds, 'built': built, 'replaced': replaced}))
+"""
+
+
+def first_request(mode):
+    root = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, "-c", FIRST_REQUEST_SCRIPT, root, mode],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    print("=" * 60)
+    print("啟動預熱驗證測試")
+    print("=" * 60)
+
+    results = []
+
+    print("\n🔥 依序執行各階段...")
+    results.append(check("未啟用預熱時直接就緒", readiness()['ready'] and readiness()['status'] == 'disabled'))
+    state = Warmup()
+    state.run()
+    status = state.report()
+    for stage in status['stages']:
+        print(f"   {stage['stage']:16s} {stage['elapsed_ms']:8.1f}ms  {stage.get('detail')}")
+    results.append(check("各階段依序完成並記錄耗時",
+                         [s['stage'] for s in status['stages']] == [name for name, _ in WARMUP_STAGES]
+                         and all(s['status'] == 'ok' and s['elapsed_ms'] >= 0 for s in status['stages'])))
+    results.append(check("完成後就緒", status['ready'] and status['status'] == 'ready'))
+    details = {s['stage']: s['detail'] for s in status['stages']}
+    results.append(check("目錄與知識庫已載入",
+                         details['catalog']['foods'] > 0 and details['knowledge_base']['documents'] > 0))
+
+    print("\n🛑 階段失敗...")
+
+    def broken():
+        raise RuntimeError("資料檔不存在")
+
+    ran = []
+    failed = Warmup(stages=[('broken', broken), ('after', lambda: ran.append(True) or {})])
+    failed.run()
+    status = failed.report()
+    results.append(check("後續階段仍執行", ran == [True] and status['stages'][1]['status'] == 'ok'))
+    results.append(check("整體不就緒並回報錯誤",
+                         not status['ready'] and status['status'] == 'failed'
+                         and status['stages'][0]['error'] == "資料檔不存在"))
+
+    degraded = Warmup(stages=[('catalog', lambda: {}), ('knowledge_base', broken)])
+    degraded.run()
+    status = degraded.report()
+    results.append(check("非必要階段失敗時降級但仍就緒",
+                         status['ready'] and status['status'] == 'degraded'
+                         and [s['optional'] for s in status['stages']] == [False, True]))
+
+    print("\n⏳ 背景預熱期間...")
+    gate = threading.Event()
+    background = Warmup(stages=[('slow', lambda: gate.wait(10) and {})])
+    warmup._warmup = background
+    try:
+        background.start()
+        during = readiness()
+        gate.set()
+        background.wait(10)
+        after = readiness()
+    finally:
+        warmup._warmup = None
+    results.append(check("預熱中不就緒", not during['ready'] and during['status'] == 'warming_up'))
+    results.append(check("預熱完成後就緒", after['ready'] and after['total_ms'] is not None))
+
+    print("\n⏱️  第一個搜尋 + 對齊請求（新程序）...")
+    cold = first_request('cold')
+    warm = first_request('warm')
+    print(f"   未預熱時建立: {cold['built']}")
+    print(f"   預熱後建立: {warm['built']}")
+    print(f"   未預熱 {cold['seconds'] * 1000:.1f}ms → 預熱後 {warm['seconds'] * 1000:.1f}ms（僅供參考）")
+    results.append(check("未預熱時第一個請求建立目錄、服務與索引",
+                         cold['built'] == ['catalog', 'nutrition_service', 'search_index',
+                                           'alignment_service', 'alignment_index']))
+    results.append(check("預熱後第一個請求不再建立任何元件且沿用預熱的服務",
+                         warm['built'] == [] and warm['replaced'] == []))
+
+    return report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())